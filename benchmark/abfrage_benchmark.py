@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# Vergleicht die SQL-Abfragen der Dashboard-Endpunkte auf einer großen Datenbank:
+#   vorher:  DATE(timestamp) = ... (kein Index nutzbar, Full Table Scan)
+#   nachher: timestamp >= ? AND timestamp < ? (Bereichssuche über idx_timestamp)
+# Gemessen wird die Zeit pro Aufruf (alle SQL-Abfragen eines Endpunkts zusammen).
+#
+#   python3 benchmark/testdatenbank.py /tmp/strom.sqlite --jahre 3
+#   python3 benchmark/abfrage_benchmark.py /tmp/strom.sqlite
+import argparse
+import sqlite3
+import statistics
+import time
+from datetime import date, timedelta
+
+HEUTE = date.today()
+GESTERN = HEUTE - timedelta(days=1)
+TAG = (HEUTE - timedelta(days=200)).isoformat()
+
+
+def bereich(tag):
+    return tag.isoformat(), (tag + timedelta(days=1)).isoformat()
+
+
+# Endpunkt -> Liste von (SQL, Parameter)
+VORHER = {
+    "/api/dashboard": [
+        ("SELECT MAX(bezug_kwh) - MIN(bezug_kwh) FROM messwerte WHERE DATE(timestamp) = DATE('now')", ()),
+        ("SELECT MAX(bezug_kwh) - MIN(bezug_kwh) FROM messwerte WHERE DATE(timestamp) = DATE('now', '-1 day')", ()),
+        ("SELECT MAX(wirkleistung_watt), MIN(wirkleistung_watt), AVG(wirkleistung_watt) FROM messwerte "
+         "WHERE DATE(timestamp) = DATE('now')", ()),
+        ("SELECT MAX(wirkleistung_watt), MIN(wirkleistung_watt), AVG(wirkleistung_watt) FROM messwerte "
+         "WHERE DATE(timestamp) = DATE('now', '-1 day')", ()),
+    ],
+    "/api/tagesverlauf": [
+        ("SELECT timestamp, wirkleistung_watt FROM messwerte WHERE DATE(timestamp) = DATE('now') "
+         "ORDER BY timestamp ASC", ()),
+    ],
+    "/api/tagesdaten": [
+        ("SELECT MAX(bezug_kwh) - MIN(bezug_kwh) FROM messwerte WHERE DATE(timestamp) = ?", (TAG,)),
+        ("SELECT MAX(bezug_kwh) FROM messwerte WHERE DATE(timestamp) = ?", (TAG,)),
+        ("SELECT timestamp, wirkleistung_watt FROM messwerte WHERE DATE(timestamp) = ? ORDER BY timestamp ASC", (TAG,)),
+    ],
+    "/api/verfuegbare-tage": [
+        ("SELECT DISTINCT DATE(timestamp) as datum FROM messwerte ORDER BY datum ASC", ()),
+    ],
+}
+
+NACHHER = {
+    "/api/dashboard": [
+        ("SELECT MAX(bezug_kwh) - MIN(bezug_kwh) FROM messwerte WHERE timestamp >= ? AND timestamp < ?",
+         bereich(HEUTE)),
+        ("SELECT MAX(bezug_kwh) - MIN(bezug_kwh) FROM messwerte WHERE timestamp >= ? AND timestamp < ?",
+         bereich(GESTERN)),
+        ("SELECT MAX(COALESCE(wirkleistung_max, wirkleistung_watt)), MIN(COALESCE(wirkleistung_min, wirkleistung_watt)), "
+         "AVG(COALESCE(wirkleistung_avg, wirkleistung_watt)) FROM messwerte WHERE timestamp >= ? AND timestamp < ?",
+         bereich(HEUTE)),
+        ("SELECT MAX(COALESCE(wirkleistung_max, wirkleistung_watt)), MIN(COALESCE(wirkleistung_min, wirkleistung_watt)), "
+         "AVG(COALESCE(wirkleistung_avg, wirkleistung_watt)) FROM messwerte WHERE timestamp >= ? AND timestamp < ?",
+         bereich(GESTERN)),
+    ],
+    "/api/tagesverlauf": [
+        ("SELECT timestamp, wirkleistung_watt FROM messwerte WHERE timestamp >= ? AND timestamp < ? "
+         "ORDER BY timestamp ASC", bereich(HEUTE)),
+    ],
+    "/api/tagesdaten": [
+        ("SELECT MAX(bezug_kwh) - MIN(bezug_kwh) FROM messwerte WHERE timestamp >= ? AND timestamp < ?",
+         bereich(date.fromisoformat(TAG))),
+        ("SELECT MAX(bezug_kwh) FROM messwerte WHERE timestamp >= ? AND timestamp < ?",
+         bereich(date.fromisoformat(TAG))),
+        ("SELECT timestamp, wirkleistung_watt FROM messwerte WHERE timestamp >= ? AND timestamp < ? "
+         "ORDER BY timestamp ASC", bereich(date.fromisoformat(TAG))),
+    ],
+    "/api/verfuegbare-tage": [
+        ("SELECT DISTINCT zeitraum as datum FROM tag ORDER BY datum ASC", ()),
+    ],
+}
+
+
+def messen(conn, abfragen, wiederholungen):
+    zeiten = []
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        for sql, parameter in abfragen:
+            conn.execute(sql, parameter).fetchall()
+        zeiten.append(time.perf_counter() - start)
+    return statistics.median(zeiten)
+
+
+def plan(conn, abfragen):
+    """Kurzform von EXPLAIN QUERY PLAN der ersten Abfrage."""
+    sql, parameter = abfragen[0]
+    return "; ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, parameter))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard-Abfragen vorher/nachher")
+    parser.add_argument("db")
+    parser.add_argument("--wiederholungen", type=int, default=5)
+    parser.add_argument("--plan", action="store_true", help="Abfragepläne ausgeben")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    anzahl = conn.execute("SELECT COUNT(*) FROM messwerte").fetchone()[0]
+    print(f"{anzahl} Messwerte, Median aus {args.wiederholungen} Aufrufen")
+    print(f"{'Endpunkt':<24}{'vorher':>12}{'nachher':>12}{'Faktor':>9}")
+    for endpunkt in VORHER:
+        vorher = messen(conn, VORHER[endpunkt], args.wiederholungen)
+        nachher = messen(conn, NACHHER[endpunkt], args.wiederholungen)
+        print(f"{endpunkt:<24}{vorher * 1000:9.1f} ms{nachher * 1000:9.1f} ms{vorher / nachher:8.0f}x")
+        if args.plan:
+            print(f"    vorher:  {plan(conn, VORHER[endpunkt])}")
+            print(f"    nachher: {plan(conn, NACHHER[endpunkt])}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# Prüft reader/aufbewahrung.py an einer Kopie einer Testdatenbank: vor und nach dem Verdichten
+# müssen Tagesverbrauch und Tagesendstand von /api/tagesdaten für jeden Tag gleich sein, ebenso
+# tag/monat/jahr nach einem vollständigen Neuaufbau (rollup.neu_aufbauen()). Dazu Dauer des
+# Verdichtens, belegter Platz, Zeilen je Stufe und Antwortzeiten von /api/tagesdaten für einen
+# alten Tag. Das Original bleibt unverändert. Benötigt Flask.
+#
+#   python3 benchmark/testdatenbank.py /tmp/strom.sqlite --jahre 1 --pv-kwp 6
+#   python3 benchmark/aufbewahrung_vergleich.py /tmp/strom.sqlite --roh-tage 30 --minuten-tage 90
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pool_benchmark import backend_laden  # noqa: E402
+import rollup  # noqa: E402
+
+READER = Path(__file__).resolve().parent.parent / "reader"
+
+
+def belegt(pfad):
+    conn = sqlite3.connect(pfad)
+    try:
+        seiten = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return seiten * conn.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def zeilen(pfad):
+    conn = sqlite3.connect(pfad)
+    try:
+        return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                for t in ("messwerte_v2", *rollup.STUFEN)}
+    finally:
+        conn.close()
+
+
+def verdichtete_tabellen(pfad):
+    conn = sqlite3.connect(pfad)
+    try:
+        return {t: conn.execute(f"SELECT * FROM {t} ORDER BY zaehler_id, zeitraum").fetchall()
+                for t in rollup.ZEITRAEUME}
+    finally:
+        conn.close()
+
+
+def tage(pfad):
+    conn = sqlite3.connect(pfad)
+    try:
+        return [tag for (tag,) in conn.execute("SELECT DISTINCT zeitraum FROM tag ORDER BY zeitraum")]
+    finally:
+        conn.close()
+
+
+def tagesdaten(client, tag, parameter=""):
+    antwort = client.get(f"/api/tagesdaten?datum={tag}{parameter}")
+    assert antwort.status_code == 200, antwort.status_code
+    return json.loads(antwort.get_data())
+
+
+def messen(client, tag, parameter, wiederholungen=20):
+    zeiten = []
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        daten = tagesdaten(client, tag, parameter)
+        zeiten.append((time.perf_counter() - start) * 1000)
+    return sorted(zeiten)[len(zeiten) // 2], len(daten["verlauf"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verdichten alter Rohdaten prüfen (Tagesverbrauch exakt)")
+    parser.add_argument("db", help="Datenbank mit messwerte_v2 (z. B. von testdatenbank.py), wird nur gelesen")
+    parser.add_argument("--roh-tage", type=int, default=30)
+    parser.add_argument("--minuten-tage", type=int, default=90)
+    parser.add_argument("--verzeichnis", help="Verzeichnis für die Kopie (Standard: temporär)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.verzeichnis) as verzeichnis:
+        pfad = os.path.join(verzeichnis, "strom.sqlite")
+        shutil.copyfile(args.db, pfad)
+        conn = sqlite3.connect(pfad)
+        rollup.schema_anlegen(conn)
+        conn.commit()
+        conn.close()
+        alle_tage = tage(pfad)
+        alter_tag = alle_tage[len(alle_tage) // 4]  # älter als --minuten-tage bei einem Jahr Daten
+        modul = backend_laden(pfad)
+        client = modul.app.test_client()
+
+        vorher = {tag: tagesdaten(client, tag, "&points=3") for tag in alle_tage}
+        zeiten_vorher = {p: messen(client, alter_tag, p) for p in ("", "&points=720")}
+        belegt_vorher, zeilen_vorher = belegt(pfad), zeilen(pfad)
+
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(READER / "aufbewahrung.py"), "--db", pfad, "--pause", "0",
+                        "--roh-tage", str(args.roh_tage), "--minuten-tage", str(args.minuten_tage)],
+                       check=True, capture_output=True)
+        dauer = time.perf_counter() - start
+        conn = sqlite3.connect(pfad)
+        conn.execute("VACUUM")
+        conn.close()
+
+        nachher = {tag: tagesdaten(client, tag, "&points=3") for tag in alle_tage}
+        zeiten_nachher = {p: messen(client, alter_tag, p) for p in ("", "&points=720")}
+        abweichend = [tag for tag in alle_tage
+                      if (vorher[tag]["verbrauch"], vorher[tag]["endstand"])
+                      != (nachher[tag]["verbrauch"], nachher[tag]["endstand"])]
+
+        rollups_vorher = verdichtete_tabellen(pfad)
+        conn = sqlite3.connect(pfad, isolation_level=None)
+        rollup.neu_aufbauen(conn)
+        conn.close()
+        rollups_gleich = verdichtete_tabellen(pfad) == rollups_vorher
+
+        print(f"Verdichten (--roh-tage {args.roh_tage} --minuten-tage {args.minuten_tage}): {dauer:.1f} s")
+        print(f"Belegt: {belegt_vorher / 1e6:.1f} MB -> {belegt(pfad) / 1e6:.1f} MB (nach VACUUM)")
+        for tabelle, anzahl in zeilen(pfad).items():
+            print(f"  {tabelle:<20}{zeilen_vorher[tabelle]:>10} -> {anzahl:>10} Zeilen")
+        print(f"Tagesverbrauch/-endstand: {len(alle_tage) - len(abweichend)} von {len(alle_tage)} Tagen gleich"
+              + (f", abweichend: {abweichend[:5]}" if abweichend else ""))
+        print(f"tag/monat/jahr nach Neuaufbau gleich: {'ja' if rollups_gleich else 'NEIN'}")
+        print(f"\n/api/tagesdaten {alter_tag}{'':<8}{'vorher':>18}{'nachher':>18}")
+        for parameter in zeiten_vorher:
+            (ms_vorher, n_vorher), (ms_nachher, n_nachher) = zeiten_vorher[parameter], zeiten_nachher[parameter]
+            print(f"  {parameter or 'alle Punkte':<22}{ms_vorher:8.2f} ms {n_vorher:>5} P.{ms_nachher:8.2f} ms {n_nachher:>5} P.")
+        if abweichend or not rollups_gleich:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
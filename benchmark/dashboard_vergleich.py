@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# Regressionsvergleich für /api/dashboard: die alte Berechnung (sieben Abfragen,
+# MAX() über die ganze Tabelle) auf dem alten Schema (messwerte: ISO-Text mit Mikrosekunden,
+# REAL) gegen den aktuellen Endpunkt auf messwerte_v2 mit denselben Messwerten.
+# Die JSON-Antworten müssen gleich sein, auch in den Typen (1234.0 ist nicht 1234).
+# Geprüft werden mehrere Testdatenbanken (leer, ohne Daten für heute, ältere Zeilen
+# ohne Intervall-Aggregate, mehrere Tage bis jetzt). Bewusste Abweichungen durch messwerte_v2:
+#   - kWh-Werte dürfen um weniger als 1 mWh abweichen (ganze mWh statt REAL),
+#   - Leistungen um höchstens 0,5 W (ganze W, betrifft die Mittelwerte der Intervalle),
+#   - timestamp hat keine Sekundenbruchteile mehr (ganze Sekunden, JJJJ-MM-TTTHH:MM:SS).
+# Benötigt Flask.
+#
+#   python3 benchmark/dashboard_vergleich.py
+import json
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pool_benchmark import backend_laden  # noqa: E402
+from testdatenbank import testdatenbank_erzeugen  # noqa: E402
+from speicher import SqliteSchreiber  # noqa: E402
+
+
+# Tabelle messwerte vor messwerte_v2 (reader/speicher.py bis dahin)
+ALTES_SCHEMA = """
+CREATE TABLE messwerte (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    zaehler_id INTEGER,
+    timestamp TEXT,
+    bezug_kwh REAL,
+    einspeisung_kwh REAL,
+    wirkleistung_watt REAL,
+    wirkleistung_min REAL,
+    wirkleistung_max REAL,
+    wirkleistung_avg REAL,
+    anzahl_telegramme INTEGER
+);
+CREATE INDEX idx_timestamp ON messwerte(timestamp);
+"""
+ALTE_SPALTEN = ("zaehler_id, timestamp, bezug_kwh, einspeisung_kwh, wirkleistung_watt, wirkleistung_min, "
+                "wirkleistung_max, wirkleistung_avg, anzahl_telegramme")
+KWH = ("bezug", "einspeisung", "verbrauchHeute", "verbrauchGestern")
+ZEITSTEMPEL = re.compile(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d")
+
+
+class BeideSchemata:
+    """
+    Schreibt dieselben Messwerte über SqliteSchreiber (messwerte_v2) und wie der alte
+    Reader in das alte Schema (Zeitpunkt mit Mikrosekunden, REAL).
+    :param neu: Pfad der Datenbank für den aktuellen Endpunkt.
+    :param alt: Pfad der Datenbank im alten Schema.
+    """
+    def __init__(self, neu, alt):
+        self.schreiber = SqliteSchreiber(str(neu))
+        self.alt = sqlite3.connect(alt)
+        self.alt.executescript(ALTES_SCHEMA)
+
+    def speichern(self, bezug, einspeisung, leistung, zeitpunkt, **aggregate):
+        self.schreiber.speichern("EMH-0000000001", "EMH", bezug, einspeisung, leistung,
+                                 timestamp=zeitpunkt.isoformat(), **aggregate)
+        self.alt.execute(f"INSERT INTO messwerte ({ALTE_SPALTEN}) VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (zeitpunkt.isoformat(), bezug, einspeisung, leistung, aggregate.get("wirkleistung_min"),
+                          aggregate.get("wirkleistung_max"), aggregate.get("wirkleistung_avg"),
+                          aggregate.get("anzahl_telegramme")))
+
+    def schliessen(self):
+        self.schreiber.schliessen()
+        self.alt.commit()
+        self.alt.close()
+
+
+def altes_schema_kopieren(neu, alt):
+    """Legt eine Datenbank im alten Schema mit den Messwerten aus messwerte_v2 an (über die Sicht messwerte)."""
+    conn = sqlite3.connect(alt)
+    conn.executescript(ALTES_SCHEMA)
+    conn.execute("ATTACH DATABASE ? AS neu", (str(neu),))
+    conn.execute(f"INSERT INTO messwerte ({ALTE_SPALTEN}) SELECT {ALTE_SPALTEN} FROM neu.messwerte")
+    conn.commit()
+    conn.close()
+
+
+def dashboard_vorher(conn):
+    """Alte Berechnung aus get_dashboard_data() (ohne Logging)."""
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    heute = date.today()
+    heute_bereich = (heute.isoformat(), (heute + timedelta(days=1)).isoformat())
+    gestern_bereich = ((heute - timedelta(days=1)).isoformat(), heute.isoformat())
+
+    leistung_row = cursor.execute(
+        "SELECT wirkleistung_watt, timestamp FROM messwerte ORDER BY timestamp DESC LIMIT 1").fetchone()
+    leistung = leistung_row["wirkleistung_watt"] if leistung_row else 0
+    letzter_timestamp = leistung_row["timestamp"] if leistung_row else None
+    bezug_row = cursor.execute("SELECT MAX(bezug_kwh) as bezug FROM messwerte").fetchone()
+    bezug = bezug_row["bezug"] if bezug_row and bezug_row["bezug"] is not None else 0
+    einspeisung_row = cursor.execute("SELECT MAX(einspeisung_kwh) as einspeisung FROM messwerte").fetchone()
+    einspeisung = einspeisung_row["einspeisung"] if einspeisung_row and einspeisung_row["einspeisung"] is not None else 0
+
+    def verbrauch(bereich):
+        row = cursor.execute("""
+            SELECT MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
+            FROM messwerte WHERE timestamp >= ? AND timestamp < ?
+        """, bereich).fetchone()
+        return row["verbrauch"] if row and row["verbrauch"] is not None else 0
+
+    def leistung_stats(bereich):
+        row = cursor.execute("""
+            SELECT MAX(COALESCE(wirkleistung_max, wirkleistung_watt)) as max_watt,
+                   MIN(COALESCE(wirkleistung_min, wirkleistung_watt)) as min_watt,
+                   AVG(COALESCE(wirkleistung_avg, wirkleistung_watt)) as avg_watt
+            FROM messwerte WHERE timestamp >= ? AND timestamp < ?
+        """, bereich).fetchone()
+        return (row["max_watt"] if row and row["max_watt"] is not None else 0,
+                row["min_watt"] if row and row["min_watt"] is not None else 0,
+                round(row["avg_watt"], 2) if row and row["avg_watt"] is not None else 0)
+
+    verbrauch_heute = verbrauch(heute_bereich)
+    verbrauch_gestern = verbrauch(gestern_bereich)
+
+    jetzt = datetime.now()
+    anteil_tag = (jetzt.hour * 60 + jetzt.minute) / (24 * 60) * 100
+    verbrauch_gestern_anteil = verbrauch_gestern * (anteil_tag / 100)
+    if abs(verbrauch_heute - verbrauch_gestern_anteil) <= verbrauch_gestern_anteil * 0.01:
+        tendenz = "gleich"
+    elif verbrauch_heute > verbrauch_gestern_anteil * 1.01 and verbrauch_heute <= verbrauch_gestern_anteil * 1.10:
+        tendenz = "mehr"
+    elif verbrauch_heute > verbrauch_gestern_anteil * 1.10:
+        tendenz = "viel mehr"
+    elif verbrauch_heute < verbrauch_gestern_anteil * 0.99 and verbrauch_heute >= verbrauch_gestern_anteil * 0.90:
+        tendenz = "weniger"
+    elif verbrauch_heute < verbrauch_gestern_anteil * 0.90:
+        tendenz = "viel weniger"
+    else:
+        tendenz = "unbekannt"
+
+    max_heute, min_heute, avg_heute = leistung_stats(heute_bereich)
+    max_gestern, min_gestern, avg_gestern = leistung_stats(gestern_bereich)
+    return {
+        "leistung": leistung, "timestamp": letzter_timestamp, "bezug": bezug, "einspeisung": einspeisung,
+        "verbrauchHeute": verbrauch_heute, "tendenz": tendenz, "verbrauchGestern": verbrauch_gestern,
+        "maxHeute": max_heute, "minHeute": min_heute, "avgHeute": avg_heute,
+        "maxGestern": max_gestern, "minGestern": min_gestern, "avgGestern": avg_gestern,
+    }
+
+
+def gleich(schluessel, alt, neu):
+    """
+    Vergleicht einen Wert samt JSON-Typ; kWh mit einer Toleranz von 1 mWh, Watt von 0,5 W,
+    timestamp ohne Sekundenbruchteile (siehe oben).
+    """
+    if schluessel == "timestamp" and alt is not None:
+        return isinstance(neu, str) and ZEITSTEMPEL.fullmatch(neu) is not None and neu == alt[:19]
+    if type(alt) is not type(neu):
+        return False
+    if isinstance(alt, float):
+        return abs(alt - neu) <= (1e-6 if schluessel in KWH else 0.5 + 1e-9)
+    return alt == neu
+
+
+def abweichungen(alt, neu):
+    """:return: Schlüssel, in denen sich die Antworten unterscheiden (siehe gleich())."""
+    alt = json.loads(json.dumps(alt))  # wie jsonify() beim alten Endpunkt
+    return sorted(schluessel for schluessel in set(alt) | set(neu)
+                  if schluessel not in alt or schluessel not in neu
+                  or not gleich(schluessel, alt[schluessel], neu[schluessel]))
+
+
+def testfaelle(verzeichnis):
+    """Erzeugt die Testdatenbanken und liefert (Name, Pfad neu, Pfad altes Schema)."""
+    jetzt = datetime.now().replace(microsecond=123456)  # der alte Reader schrieb datetime.now().isoformat()
+
+    leer = BeideSchemata(verzeichnis / "leer.sqlite", verzeichnis / "leer_alt.sqlite")
+    leer.schliessen()
+    yield "leer", verzeichnis / "leer.sqlite", verzeichnis / "leer_alt.sqlite"
+
+    alt = BeideSchemata(verzeichnis / "alt.sqlite", verzeichnis / "alt_alt.sqlite")
+    for minute in range(0, 3 * 24 * 60, 7):
+        zeitpunkt = jetzt - timedelta(days=6, minutes=-minute)
+        alt.speichern(1000 + minute / 100, 2.0, minute % 900, zeitpunkt)
+    alt.schliessen()
+    yield "ohne heute/gestern", verzeichnis / "alt.sqlite", verzeichnis / "alt_alt.sqlite"
+
+    ohne_aggregate = BeideSchemata(verzeichnis / "ohne_aggregate.sqlite", verzeichnis / "ohne_aggregate_alt.sqlite")
+    for minute in range(0, 2 * 24 * 60, 3):
+        zeitpunkt = jetzt - timedelta(days=2, minutes=-minute)
+        aggregate = {} if minute % 2 else {"wirkleistung_min": minute % 500, "wirkleistung_max": 3000 + minute % 7,
+                                           "wirkleistung_avg": 700.5, "anzahl_telegramme": 60}
+        ohne_aggregate.speichern(2000 + minute / 50, minute / 1000, minute % 1200, zeitpunkt, **aggregate)
+    ohne_aggregate.schliessen()
+    yield "gemischt (alte Zeilen)", verzeichnis / "ohne_aggregate.sqlite", verzeichnis / "ohne_aggregate_alt.sqlite"
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        verzeichnis = Path(tmp)
+        faelle = list(testfaelle(verzeichnis))
+        mehrjahr = verzeichnis / "mehrjahr.sqlite"
+        testdatenbank_erzeugen(mehrjahr, jahre=1, intervall=60)
+        altes_schema_kopieren(mehrjahr, verzeichnis / "mehrjahr_alt.sqlite")
+        faelle.append(("1 Jahr bis jetzt", mehrjahr, verzeichnis / "mehrjahr_alt.sqlite"))
+
+        fehler = 0
+        for name, pfad, pfad_alt in faelle:
+            modul = backend_laden(pfad)
+            client = modul.app.test_client()
+            client.get("/api/dashboard")  # Pool-Verbindung öffnen (Antwort-Cache ist abgeschaltet)
+            start = time.perf_counter()
+            neu = client.get("/api/dashboard").get_json()
+            dauer_neu = time.perf_counter() - start
+            conn = sqlite3.connect(pfad_alt)
+            dashboard_vorher(conn)
+            start = time.perf_counter()
+            alt = dashboard_vorher(conn)
+            dauer_alt = time.perf_counter() - start
+            conn.close()
+            abweichend = abweichungen(alt, neu)
+            ok = not abweichend
+            fehler += not ok
+            print(f"{'OK    ' if ok else 'FEHLER'} {name:<26} vorher {dauer_alt * 1000:7.1f} ms, "
+                  f"nachher {dauer_neu * 1000:7.1f} ms")
+            if not ok:
+                for schluessel in abweichend:
+                    print(f"       {schluessel}: vorher {alt.get(schluessel)!r}, nachher {neu.get(schluessel)!r}")
+        sys.exit(1 if fehler else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Vergleicht die CPU-Zeit pro Telegramm für das Dekodieren:
+#   vorher:      5x find() + feste EMH-Offsets + .hex()/int(..., 16) (alter strom_reader.py)
+#   decoder:     sml_dekodieren() (ein Durchlauf über das Telegramm)
+#   layoutcache: LayoutCache.dekodieren() (Prüfbytes + ein unpack_from())
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "reader"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "fake-reader"))
+
+from sml_decoder import LayoutCache, sml_dekodieren  # noqa: E402
+from sml_beispiel import telegramm  # noqa: E402
+
+# (OBIS-Code inkl. TL, Offset Wert, Länge Wert, Offset Skala, Offset Einheit) aus der alten EMH-Konfiguration
+ALTE_OFFSETS = [
+    (b"\x07\x01\x00\x60\x32\x01\x01", 11, 4, None, None),
+    (b"\x07\x01\x00\x60\x01\x00\xff", 11, 11, None, None),
+    (b"\x07\x01\x00\x01\x08\x00\xff", 24, 8, 22, 19),
+    (b"\x07\x01\x00\x02\x08\x00\xff", 21, 8, 19, 16),
+    (b"\x07\x01\x00\x10\x07\x00\xff", 21, 4, 19, 16),
+]
+
+
+def vorher(sml_data):
+    """Alte Dekodierung (ohne Logging)."""
+    werte = []
+    for code, wert_offset, wert_laenge, skala_offset, einheit_offset in ALTE_OFFSETS:
+        start = sml_data.find(code)
+        wert = sml_data[start + wert_offset:start + wert_offset + wert_laenge]
+        if skala_offset is None:
+            werte.append(wert.hex())
+            continue
+        skala = int.from_bytes(sml_data[start + skala_offset:start + skala_offset + 1], byteorder="big", signed=True)
+        einheit = sml_data[start + einheit_offset:start + einheit_offset + 2]
+        werte.append((int(wert.hex(), 16) * (10 ** skala), einheit))
+    return werte
+
+
+def decoder(sml_data):
+    return sml_dekodieren(sml_data)
+
+
+def messen(funktion, telegramme):
+    start = time.process_time()
+    for t in telegramme:
+        funktion(t)
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU pro Telegramm beim Dekodieren")
+    parser.add_argument("--telegramme", type=int, default=5000)
+    args = parser.parse_args()
+
+    telegramme = [telegramm(bezug_wh=10000000 + i, leistung_w=i % 3000, sekunde=i) for i in range(args.telegramme)]
+    ansichten = [memoryview(t) for t in telegramme]
+    cache = LayoutCache()
+    laeufe = (
+        ("vorher (find/Offsets)", vorher, telegramme),
+        ("decoder (TLV)", decoder, ansichten),
+        ("layoutcache", cache.dekodieren, ansichten),
+    )
+    print(f"{args.telegramme} Telegramme, {len(telegramme[0])} Bytes/Telegramm")
+    for name, funktion, daten in laeufe:
+        dauer = messen(funktion, daten)
+        print(f"{name:<22} {dauer / len(daten) * 1e6:9.1f} µs CPU/Telegramm")
+    print(f"layoutcache: {cache.treffer} Treffer / {cache.fehlschlaege} Fehlschläge")
+
+
+if __name__ == "__main__":
+    main()
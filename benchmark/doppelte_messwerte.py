@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Prüft, dass SqliteSchreiber.flush() Messwerte, die INSERT OR IGNORE überspringt (gleicher
+# Zähler und Zeitpunkt, z. B. nach einem Neustart oder beim Wiedereinspielen), nicht noch
+# einmal in tag/monat/jahr einrechnet: derselbe Messwert zweimal geschrieben (in zwei
+# Commits und doppelt im selben Commit) muss dieselben verdichteten Werte ergeben wie einmal.
+# Beendet sich mit Status 1 bei einer Abweichung.
+#
+#   python3 benchmark/doppelte_messwerte.py
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "reader"))
+
+import rollup  # noqa: E402
+from speicher import SqliteSchreiber  # noqa: E402
+
+
+def messwerte(anzahl=5):
+    """
+    :return: Liste von Messwerten als Argumente für SqliteSchreiber.speichern().
+    """
+    beginn = datetime(2025, 4, 16, 12, 0, 0)
+    return [("1ESY1160000000", "ESY", 1000.0 + i * 0.25, 10.0 + i * 0.01, 500.0 + i,
+             (beginn + timedelta(minutes=i)).isoformat()) for i in range(anzahl)]
+
+
+def verdichtet(pfad):
+    """
+    :return: Inhalt von tag, monat und jahr, sortiert.
+    """
+    conn = sqlite3.connect(pfad)
+    try:
+        return {tabelle: conn.execute(f"SELECT * FROM {tabelle} ORDER BY zaehler_id, zeitraum").fetchall()
+                for tabelle in rollup.ZEITRAEUME}
+    finally:
+        conn.close()
+
+
+def schreiben(pfad, durchlaeufe):
+    """
+    Schreibt die Messwerte; jeder Durchlauf ist eine Liste von Wiederholungen je Commit.
+    :param pfad: Pfad zur SQLite-Datei.
+    :param durchlaeufe: z. B. [1, 1] = zwei Commits mit je einmal allen Messwerten.
+    :return: verdichtet(pfad)
+    """
+    schreiber = SqliteSchreiber(pfad, max_zeilen=10 ** 6)
+    for wiederholungen in durchlaeufe:
+        for _ in range(wiederholungen):
+            for seriennummer, hersteller, bezug, einspeisung, watt, timestamp in messwerte():
+                schreiber.speichern(seriennummer, hersteller, bezug, einspeisung, watt, timestamp=timestamp)
+        schreiber.flush()
+    schreiber.schliessen()
+    return verdichtet(pfad)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        erwartet = schreiben(Path(verzeichnis) / "einmal.sqlite", [1])
+        fehler = 0
+        for name, durchlaeufe in (("zweimal in zwei Commits", [1, 1]), ("zweimal in einem Commit", [2])):
+            ergebnis = schreiben(Path(verzeichnis) / f"{len(durchlaeufe)}.sqlite", durchlaeufe)
+            ok = ergebnis == erwartet and erwartet["tag"]
+            print(f"{'OK' if ok else 'FEHLER':6} {name}")
+            if not ok:
+                fehler += 1
+                for tabelle in rollup.ZEITRAEUME:
+                    if ergebnis[tabelle] != erwartet[tabelle]:
+                        print(f"       {tabelle}: einmal {erwartet[tabelle]}, {name} {ergebnis[tabelle]}")
+    sys.exit(1 if fehler else 0)
+
+
+if __name__ == "__main__":
+    main()
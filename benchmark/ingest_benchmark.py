@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# Vergleicht die CPU-Zeit pro Telegramm für das Einlesen/Framing vom seriellen Port:
+#   vorher:  ser.read(1) + buffer += raw + "sml_ende in buffer" pro Byte
+#   nachher: blockweises readinto() in den RingPuffer + inkrementelle Suche
+#   scanner: RingPuffer + SmlScanner (Start/Ende-Synchronisation, ohne CRC)
+# Der serielle Port wird simuliert (liefert die Bytes in Blöcken wie ein USB-Seriell-Adapter).
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "reader"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "fake-reader"))
+
+from sml_puffer import RingPuffer  # noqa: E402
+from sml_scanner import SmlScanner  # noqa: E402
+from sml_beispiel import telegramm  # noqa: E402
+
+SML_ENDE = b"\x1b\x1b\x1b\x1a"
+
+
+class SimulierterPort:
+    """
+    Simuliert einen seriellen Port, der die Daten in Blöcken bereitstellt.
+    :param daten: Der komplette Bytestrom.
+    :param block: Anzahl Bytes, die pro "Empfang" im Treiberpuffer landen.
+    """
+    def __init__(self, daten, block=64):
+        self.daten = daten
+        self.pos = 0
+        self.block = block
+        self._wartend = 0
+
+    @property
+    def in_waiting(self):
+        if self._wartend == 0:
+            self._wartend = min(self.block, len(self.daten) - self.pos)
+        return self._wartend
+
+    def read(self, anzahl=1):
+        anzahl = min(anzahl, len(self.daten) - self.pos)
+        stueck = self.daten[self.pos:self.pos + anzahl]
+        self.pos += anzahl
+        self._wartend = max(0, self._wartend - anzahl)
+        return stueck
+
+    def readinto(self, ziel):
+        stueck = self.read(len(ziel))
+        ziel[:len(stueck)] = stueck
+        return len(stueck)
+
+
+def vorher(port):
+    """Alte Schleife aus strom_reader.py (ohne Dekodierung)."""
+    telegramme = 0
+    buffer = b""
+    while port.pos < len(port.daten):
+        raw = port.read(1)
+        if not raw:
+            continue
+        buffer += raw
+        if SML_ENDE in buffer:
+            idx = buffer.find(SML_ENDE)
+            if idx == -1 or len(buffer) < idx + 4 + 3:
+                continue
+            sml_data = buffer[:idx + 5]  # noqa: F841
+            telegramme += 1
+            buffer = buffer[idx + 7:]
+    return telegramme
+
+
+def nachher(port):
+    """Neue Schleife mit RingPuffer (ohne Dekodierung)."""
+    telegramme = 0
+    puffer = RingPuffer(kapazitaet=4096)
+    suchpos = 0
+    while port.pos < len(port.daten):
+        if not puffer.einlesen(port):
+            continue
+        while True:
+            idx = puffer.finden(SML_ENDE, suchpos)
+            if idx == -1:
+                suchpos = max(0, len(puffer) - len(SML_ENDE) + 1)
+                break
+            if len(puffer) < idx + 7:
+                suchpos = idx
+                break
+            telegramm_ansicht = puffer.ansicht(0, idx + 7)
+            sml_data = telegramm_ansicht[:idx + 5]  # noqa: F841
+            telegramme += 1
+            puffer.verwerfen(idx + 7)
+            suchpos = 0
+    return telegramme
+
+
+def scanner(port):
+    """RingPuffer + SmlScanner wie in strom_reader.py (ohne CRC und Dekodierung)."""
+    telegramme = 0
+    puffer = RingPuffer(kapazitaet=4096)
+    sml_scanner = SmlScanner(puffer)
+    while port.pos < len(port.daten):
+        if not puffer.einlesen(port):
+            continue
+        for _ in sml_scanner.telegramme_lesen():
+            telegramme += 1
+    return telegramme
+
+
+def messen(funktion, daten, block):
+    port = SimulierterPort(daten, block)
+    start = time.process_time()
+    anzahl = funktion(port)
+    dauer = time.process_time() - start
+    return anzahl, dauer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU pro Telegramm beim Einlesen")
+    parser.add_argument("--telegramme", type=int, default=2000)
+    parser.add_argument("--block", type=int, default=64, help="Bytes pro Treiberblock")
+    args = parser.parse_args()
+
+    daten = b"".join(telegramm(bezug_wh=10000000 + i, sekunde=i) for i in range(args.telegramme))
+    print(f"{args.telegramme} Telegramme, {len(daten) / args.telegramme:.0f} Bytes/Telegramm, Block {args.block} Bytes")
+    for name, funktion in (("vorher (read(1))", vorher), ("nachher (RingPuffer)", nachher), ("scanner (SmlScanner)", scanner)):
+        anzahl, dauer = messen(funktion, daten, args.block)
+        print(f"{name:<22} {anzahl:>6} Telegramme  {dauer / max(anzahl, 1) * 1e6:9.1f} µs CPU/Telegramm")
+
+
+if __name__ == "__main__":
+    main()
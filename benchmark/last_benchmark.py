@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# Last- und Latenztest für alle /api/*-Endpunkte von dashboard-backend.py:
+#   1. einzeln über den Flask-Testclient: p50/p95/p99, SQL-Abfragen und SQLite-VM-Schritte pro Anfrage
+#   2. gleichzeitig über echtes HTTP (Werkzeug-Server mit Threads): p50/p95/p99 und Anfragen/s
+# Der Antwort-Cache ist abgeschaltet (außer mit --mit-cache), damit jede Anfrage die
+# Datenbank liest. Mit --json wird das Ergebnis gespeichert, mit --vergleich gegen ein
+# früheres Ergebnis (z. B. eines anderen Commits) verglichen. Benötigt Flask.
+#
+#   python3 benchmark/testdatenbank.py /tmp/strom.sqlite --jahre 3 --pv-kwp 6 --luecken 20
+#   python3 benchmark/last_benchmark.py /tmp/strom.sqlite --json /tmp/vorher.json
+#   python3 benchmark/last_benchmark.py /tmp/strom.sqlite --vergleich /tmp/vorher.json
+import argparse
+import http.client
+import json
+import logging
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from pool_benchmark import WURZEL, backend_laden, perzentil  # noqa: E402
+
+VM_SCHRITTE = 1000  # Progress-Handler alle n SQLite-VM-Anweisungen
+
+
+class Zaehler:
+    """Zählt SQL-Abfragen und VM-Schritte aller Verbindungen des Backends."""
+    def __init__(self):
+        self.abfragen = 0
+        self.schritte = 0
+
+    def verbindungen_zaehlen(self, modul):
+        oeffnen = modul.lese_verbindung_oeffnen
+
+        def gezaehlt(db_pfad):
+            conn = oeffnen(db_pfad)
+            conn.set_trace_callback(self._abfrage)
+            conn.set_progress_handler(self._schritt, VM_SCHRITTE)
+            return conn
+        modul.lese_verbindung_oeffnen = gezaehlt
+
+    def _abfrage(self, sql):
+        if not sql.lstrip().upper().startswith("PRAGMA"):
+            self.abfragen += 1
+
+    def _schritt(self):
+        self.schritte += VM_SCHRITTE
+        return 0  # 0 = weiterlaufen
+
+
+def endpunkte(db_pfad):
+    """Alle GET-Endpunkte mit Parametern passend zu den Daten der Datenbank (ohne /api/live)."""
+    conn = sqlite3.connect(f"file:{db_pfad}?mode=ro", uri=True)
+    erster, letzter = conn.execute("SELECT MIN(zeitraum), MAX(zeitraum) FROM tag").fetchone()
+    conn.close()
+    heute = date.today()
+    if erster:
+        erster, letzter = date.fromisoformat(erster), date.fromisoformat(letzter)
+        tag = erster + (letzter - erster) / 2
+    else:
+        tag = heute - timedelta(days=1)
+    return [
+        "/api/dashboard",
+        "/api/tagesverlauf",
+        "/api/tagesverlauf?points=720",
+        f"/api/tagesdaten?datum={tag}",
+        f"/api/tagesdaten?datum={tag}&points=720",
+        f"/api/wochenstatistik?datum={tag}",
+        "/api/monatsstatistik",
+        "/api/jahresstatistik",
+        "/api/verfuegbare-tage",
+        "/api/statistik",
+        f"/api/export?from={tag}&to={tag + timedelta(days=1)}",
+        f"/api/export?from={heute}&format=ndjson",
+    ]
+
+
+def einzeln(modul, zaehler, urls, anfragen):
+    """Jede URL `anfragen` mal nacheinander über den Testclient."""
+    client = modul.app.test_client()
+    ergebnis = {}
+    for url in urls:
+        client.get(url).get_data()  # Verbindung öffnen, Seiten-Cache füllen
+        zeiten = []
+        abfragen = schritte = 0
+        for _ in range(anfragen):
+            vorher = (zaehler.abfragen, zaehler.schritte)
+            start = time.perf_counter()
+            antwort = client.get(url)
+            antwort.get_data()  # gestreamte Antworten vollständig lesen
+            zeiten.append(time.perf_counter() - start)
+            abfragen += zaehler.abfragen - vorher[0]
+            schritte += zaehler.schritte - vorher[1]
+            if antwort.status_code != 200:
+                raise RuntimeError(f"{url}: Status {antwort.status_code}")
+        ergebnis[url] = {
+            "p50": perzentil(zeiten, 0.5), "p95": perzentil(zeiten, 0.95), "p99": perzentil(zeiten, 0.99),
+            "abfragen": abfragen / anfragen, "schritte": schritte / anfragen,
+        }
+    return ergebnis
+
+
+def http_last(modul, urls, threads, anfragen):
+    """Alle Threads rufen die URLs reihum über HTTP auf (eine Verbindung pro Anfrage)."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # kein Zugriffslog pro Anfrage
+    server = make_server("127.0.0.1", 0, modul.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    zeiten = {url: [] for url in urls}
+    fehler = []
+
+    def arbeiter(nummer):
+        for i in range(anfragen):
+            url = urls[(nummer + i) % len(urls)]
+            start = time.perf_counter()
+            verbindung = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=60)
+            try:
+                verbindung.request("GET", url)
+                antwort = verbindung.getresponse()
+                antwort.read()
+                if antwort.status != 200:
+                    fehler.append((url, antwort.status))
+            finally:
+                verbindung.close()
+            zeiten[url].append(time.perf_counter() - start)
+
+    gestartet = time.perf_counter()
+    alle = [threading.Thread(target=arbeiter, args=(n,)) for n in range(threads)]
+    for t in alle:
+        t.start()
+    for t in alle:
+        t.join()
+    dauer = time.perf_counter() - gestartet
+    server.shutdown()
+    if fehler:
+        raise RuntimeError(f"{len(fehler)} Fehler: {fehler[:3]}")
+    alle_zeiten = [z for werte in zeiten.values() for z in werte]
+    return {
+        "threads": threads,
+        "anfragen_pro_s": len(alle_zeiten) / dauer,
+        "gesamt": {"p50": perzentil(alle_zeiten, 0.5), "p95": perzentil(alle_zeiten, 0.95),
+                   "p99": perzentil(alle_zeiten, 0.99)},
+        "endpunkte": {url: {"p50": perzentil(w, 0.5), "p95": perzentil(w, 0.95), "p99": perzentil(w, 0.99)}
+                      for url, w in zeiten.items() if w},
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "-C", str(WURZEL), "describe", "--always", "--dirty"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ms(sekunden):
+    return f"{sekunden * 1000:8.1f} ms"
+
+
+def ausgeben(ergebnis, alt=None):
+    print(f"Commit {ergebnis['commit']}, {ergebnis['messwerte']} Messwerte, "
+          f"Antwort-Cache {'an' if ergebnis['mit_cache'] else 'aus'}")
+    print(f"\n{'Endpunkt (einzeln)':<48}{'p50':>11}{'p95':>11}{'p99':>11}{'Abfragen':>10}{'VM-Schritte':>13}"
+          + (f"{'p50 vorher':>14}{'Faktor':>8}" if alt else ""))
+    for url, werte in ergebnis["einzeln"].items():
+        zeile = (f"{url:<48}{ms(werte['p50'])}{ms(werte['p95'])}{ms(werte['p99'])}"
+                 f"{werte['abfragen']:10.1f}{werte['schritte']:13.0f}")
+        vorher = alt["einzeln"].get(url) if alt else None
+        if vorher:
+            zeile += f"{ms(vorher['p50']):>14}{vorher['p50'] / werte['p50']:7.1f}x"
+        print(zeile)
+
+    last = ergebnis.get("http")
+    if last:
+        print(f"\nHTTP, {last['threads']} Threads: {last['anfragen_pro_s']:.0f} Anfragen/s, "
+              f"p50 {ms(last['gesamt']['p50']).strip()}, p95 {ms(last['gesamt']['p95']).strip()}, "
+              f"p99 {ms(last['gesamt']['p99']).strip()}")
+        if alt and alt.get("http"):
+            print(f"  vorher ({alt['commit']}): {alt['http']['anfragen_pro_s']:.0f} Anfragen/s, "
+                  f"p95 {ms(alt['http']['gesamt']['p95']).strip()}")
+        for url, werte in last["endpunkte"].items():
+            print(f"  {url:<46}{ms(werte['p50'])}{ms(werte['p95'])}{ms(werte['p99'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Last- und Latenztest für alle Dashboard-Endpunkte")
+    parser.add_argument("db", help="Datenbank (z. B. aus testdatenbank.py), wird nur gelesen")
+    parser.add_argument("--anfragen", type=int, default=20, help="Anfragen pro Endpunkt (einzeln)")
+    parser.add_argument("--threads", type=int, default=8, help="gleichzeitige HTTP-Clients, 0 = kein HTTP-Test")
+    parser.add_argument("--http-anfragen", type=int, default=50, help="Anfragen pro HTTP-Client")
+    parser.add_argument("--mit-cache", action="store_true", help="Antwort-Cache eingeschaltet lassen")
+    parser.add_argument("--json", help="Ergebnis als JSON speichern")
+    parser.add_argument("--vergleich", help="früheres Ergebnis (JSON) zum Vergleich")
+    args = parser.parse_args()
+
+    modul = backend_laden(args.db)
+    if args.mit_cache:
+        modul.antwort_cache.max_eintraege = 256
+    zaehler = Zaehler()
+    zaehler.verbindungen_zaehlen(modul)
+    urls = endpunkte(args.db)
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    messwerte = conn.execute("SELECT COUNT(*) FROM messwerte").fetchone()[0]
+    conn.close()
+
+    ergebnis = {
+        "commit": commit(),
+        "zeitpunkt": datetime.now().isoformat(timespec="seconds"),
+        "messwerte": messwerte,
+        "mit_cache": args.mit_cache,
+        "einzeln": einzeln(modul, zaehler, urls, args.anfragen),
+    }
+    if args.threads:
+        ergebnis["http"] = http_last(modul, urls, args.threads, args.http_anfragen)
+
+    alt = None
+    if args.vergleich:
+        with open(args.vergleich, encoding="utf-8") as f:
+            alt = json.load(f)
+    ausgeben(ergebnis, alt)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(ergebnis, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Speicher und CPU des Readers pro zusätzlichem Zähler:
+#   ein Prozess: strom_reader.py mit ZAEHLER=<port1>,<port2>,... (ein Selektor für alle Ports)
+#   getrennt:    ein strom_reader.py pro Zähler (wie bisher ein Container pro Zähler)
+# Jeder Zähler ist ein Fake-Reader (fake-reader/fake_reader.py) mit eigener Seriennummer.
+# Gemessen werden RSS (VmRSS) und CPU-Zeit (utime + stime) der Reader-Prozesse nach
+# einer Aufwärmzeit, geschrieben wird in eine gemeinsame SQLite-Datenbank (nur Linux).
+#
+#   python3 benchmark/mehrzaehler_benchmark.py --zaehler 1 2 4 8 --rate 1 --dauer 30
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+WURZEL = Path(__file__).resolve().parent.parent
+TAKT = os.sysconf("SC_CLK_TCK")
+
+
+def cpu_sekunden(pid):
+    """:return: Verbrauchte CPU-Zeit (user + system) des Prozesses in Sekunden."""
+    with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+        felder = f.read().rsplit(")", 1)[1].split()
+    return (int(felder[11]) + int(felder[12])) / TAKT
+
+
+def rss_mb(pid):
+    """:return: Resident Set Size des Prozesses in MB."""
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        for zeile in f:
+            if zeile.startswith("VmRSS:"):
+                return int(zeile.split()[1]) / 1024
+    return 0.0
+
+
+def fake_reader_starten(verzeichnis, anzahl, rate):
+    """
+    :return: (Prozesse, Ports) für `anzahl` Fake-Reader mit unterschiedlichen Seriennummern.
+    """
+    prozesse, ports = [], []
+    for nummer in range(anzahl):
+        port = os.path.join(verzeichnis, f"tty{nummer}")
+        prozesse.append(subprocess.Popen(
+            [sys.executable, str(WURZEL / "fake-reader" / "fake_reader.py"), "--link", port, "--rate", str(rate),
+             "--seriennummer", str(0x100000 + nummer), "--seed", str(nummer + 1), "--statistik", "3600"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        ports.append(port)
+    while not all(os.path.exists(port) for port in ports):
+        time.sleep(0.05)
+    return prozesse, ports
+
+
+def messen(ports, getrennt, verzeichnis, aufwaermen, dauer, wait_timer):
+    """
+    Startet die Reader, wartet `aufwaermen` Sekunden und misst dann `dauer` Sekunden.
+    :return: (RSS gesamt in MB, CPU-Sekunden gesamt im Messzeitraum, Anzahl Prozesse)
+    """
+    umgebung = dict(os.environ, DATA_PATH=verzeichnis, OUTPUT="sqlite", WAIT_TIMER=str(wait_timer),
+                    STATISTIK_SEKUNDEN="3600")
+    gruppen = [[port] for port in ports] if getrennt else [ports]
+    reader = [subprocess.Popen([sys.executable, str(WURZEL / "reader" / "strom_reader.py")],
+                               env=dict(umgebung, ZAEHLER=",".join(gruppe)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for gruppe in gruppen]
+    try:
+        time.sleep(aufwaermen)
+        cpu_start = sum(cpu_sekunden(p.pid) for p in reader)
+        time.sleep(dauer)
+        cpu = sum(cpu_sekunden(p.pid) for p in reader) - cpu_start
+        rss = sum(rss_mb(p.pid) for p in reader)
+    finally:
+        for p in reader:
+            p.terminate()
+        for p in reader:
+            p.wait(timeout=30)
+    return rss, cpu, len(reader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speicher und CPU pro Zähler: ein Prozess gegen einen pro Zähler")
+    parser.add_argument("--zaehler", type=int, nargs="+", default=[1, 2, 4, 8], help="Anzahl Zähler je Messung")
+    parser.add_argument("--rate", type=float, default=1.0, help="Telegramme pro Sekunde und Zähler (Zähler: 1)")
+    parser.add_argument("--dauer", type=float, default=30.0, help="Messzeit in Sekunden")
+    parser.add_argument("--aufwaermen", type=float, default=5.0, help="Sekunden bis zur ersten Messung")
+    parser.add_argument("--wait-timer", type=int, default=60, help="WAIT_TIMER der Reader")
+    args = parser.parse_args()
+
+    print(f"{'Zähler':>6}  {'Art':<12}{'Prozesse':>9}{'RSS':>10}{'RSS/Zähler':>12}{'CPU':>9}{'CPU/Zähler':>12}")
+    for anzahl in args.zaehler:
+        for getrennt in (False, True):
+            with tempfile.TemporaryDirectory() as verzeichnis:
+                fake, ports = fake_reader_starten(verzeichnis, anzahl, args.rate)
+                try:
+                    rss, cpu, prozesse = messen(ports, getrennt, verzeichnis, args.aufwaermen, args.dauer,
+                                                args.wait_timer)
+                finally:
+                    for p in fake:
+                        p.terminate()
+                        p.wait()
+            anteil = cpu / args.dauer * 100
+            print(f"{anzahl:>6}  {'getrennt' if getrennt else 'ein Prozess':<12}{prozesse:>9}{rss:>7.1f} MB"
+                  f"{rss / anzahl:>9.1f} MB{anteil:>8.2f}%{anteil / anzahl:>11.3f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# Latenz der Dashboard-Endpunkte bei gleichzeitigen Anfragen:
+#   vorher:  get_db_connection() öffnet pro Anfrage eine neue Verbindung und schließt sie wieder
+#   nachher: LesePool mit wiederverwendeten Nur-Lese-Verbindungen (mode=ro, cache_size, mmap_size)
+# Der Antwort-Cache ist abgeschaltet, damit jede Anfrage die Datenbank liest. Parallel
+# schreibt ein SqliteSchreiber wie der Reader (ein Commit pro --schreibabstand).
+# Benötigt Flask (pip install flask).
+#
+#   python3 benchmark/pool_benchmark.py /tmp/strom.sqlite --threads 8 --anfragen 50
+import argparse
+import importlib.util
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+WURZEL = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(WURZEL / "reader"))
+
+from speicher import SqliteSchreiber  # noqa: E402
+
+
+def backend_laden(db_pfad):
+    """Lädt dashboard-backend.py als Modul mit DB_PATH = db_pfad."""
+    os.environ["DB_PATH"] = str(db_pfad)
+    spec = importlib.util.spec_from_file_location(
+        "dashboard_backend", WURZEL / "dashboard" / "dashboard-backend" / "dashboard-backend.py")
+    modul = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modul)
+    modul.logger.setLevel("WARNING")
+    modul.antwort_cache.max_eintraege = 0  # jede Anfrage geht an die Datenbank
+    return modul
+
+
+def alte_verbindungen(modul):
+    """Ersetzt den Pool durch die alte Verbindung pro Anfrage."""
+    def get_db_connection():
+        conn = sqlite3.connect(modul.DB_PATH)
+        conn.row_factory = sqlite3.Row
+        return conn
+    modul.get_db_connection = get_db_connection
+    modul.release_db_connection = lambda conn: conn.close()
+
+
+def schreiben(db_pfad, stopp, abstand):
+    schreiber = SqliteSchreiber(str(db_pfad), max_zeilen=1)
+    bezug = 50000.0
+    while not stopp.is_set():
+        bezug += 0.01
+        schreiber.speichern("EMH-0000000001", "EMH", bezug, 0.0, 500)
+        time.sleep(abstand)
+    schreiber.schliessen()
+
+
+def lauf(modul, urls, threads, anfragen):
+    client = modul.app.test_client()
+    zeiten = []
+    fehler = []
+
+    def arbeiter(nummer):
+        for i in range(anfragen):
+            url = urls[(nummer + i) % len(urls)]
+            start = time.perf_counter()
+            antwort = client.get(url)
+            zeiten.append(time.perf_counter() - start)
+            if antwort.status_code != 200:
+                fehler.append((url, antwort.status_code))
+
+    gestartet = time.perf_counter()
+    alle = [threading.Thread(target=arbeiter, args=(n,)) for n in range(threads)]
+    for t in alle:
+        t.start()
+    for t in alle:
+        t.join()
+    return zeiten, time.perf_counter() - gestartet, fehler
+
+
+def perzentil(werte, p):
+    werte = sorted(werte)
+    return werte[min(len(werte) - 1, int(len(werte) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard-Latenz: neue Verbindung pro Anfrage gegen LesePool")
+    parser.add_argument("db", help="Datenbank (wird kopiert, z. B. aus testdatenbank.py)")
+    parser.add_argument("--threads", type=int, default=8, help="gleichzeitige Clients (zusätzlich wird mit 1 gemessen)")
+    parser.add_argument("--anfragen", type=int, default=50, help="Anfragen pro Thread")
+    parser.add_argument("--schreibabstand", type=float, default=0.1, help="Sekunden zwischen zwei Commits")
+    args = parser.parse_args()
+
+    tag = (date.today() - timedelta(days=3)).isoformat()
+    urls = ["/api/tagesverlauf", f"/api/tagesdaten?datum={tag}", "/api/statistik",
+            f"/api/wochenstatistik?datum={tag}", "/api/monatsstatistik"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "strom.sqlite"
+        shutil.copy(args.db, db)
+        print(f"{args.anfragen} Anfragen pro Thread, Commit alle {args.schreibabstand} s")
+        print(f"{'':<20}{'p50':>10}{'p95':>10}{'p99':>10}{'Anfragen/s':>12}")
+        for threads, name in ((t, n) for t in sorted({1, args.threads}) for n in ("vorher", "nachher")):
+            modul = backend_laden(db)
+            if name == "vorher":
+                alte_verbindungen(modul)
+            stopp = threading.Event()
+            schreiber = threading.Thread(target=schreiben, args=(db, stopp, args.schreibabstand))
+            schreiber.start()
+            try:
+                zeiten, dauer, fehler = lauf(modul, urls, threads, args.anfragen)
+            finally:
+                stopp.set()
+                schreiber.join()
+            print(f"{name + f' ({threads} Thr.)':<20}{perzentil(zeiten, 0.5) * 1000:7.1f} ms{perzentil(zeiten, 0.95) * 1000:7.1f} ms"
+                  f"{perzentil(zeiten, 0.99) * 1000:7.1f} ms{len(zeiten) / dauer:12.0f}"
+                  + (f"  {len(fehler)} Fehler: {fehler[:3]}" if fehler else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# Vergleicht das alte Schema (messwerte: ISO-Text, REAL kWh, rowid + Indizes) mit
+# messwerte_v2 (WITHOUT ROWID, Primärschlüssel (zaehler_id, ts), ganze Zahlen):
+#   - Dateigröße, Bytes pro Messwert, Größe von Tabelle und Indizes (dbstat)
+#   - gelesene Seiten und Zeit für Tages- und Monatsabfragen mit kaltem Seiten-Cache
+# Die alte Datenbank wird kopiert und mit reader/migration_v2.py umgestellt (mit VACUUM),
+# das Original bleibt unverändert. Gelesene Seiten werden über /proc/self/io (rchar)
+# gezählt, ohne Memory-Mapped I/O und mit kleinem Seiten-Cache (nur Linux).
+#
+#   git worktree add /tmp/vorher <commit vor messwerte_v2>
+#   python3 /tmp/vorher/benchmark/testdatenbank.py /tmp/strom_v1.sqlite --jahre 1 --pv-kwp 6 --luecken 20
+#   python3 benchmark/schema_benchmark.py /tmp/strom_v1.sqlite
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+READER = Path(__file__).resolve().parent.parent / "reader"
+
+# (Name, SQL altes Schema, SQL neues Schema); Parameter sind Tagesgrenzen (alt: ISO, neu: Sekunden)
+ABFRAGEN = [
+    ("Tagesverbrauch",
+     "SELECT MAX(bezug_kwh) - MIN(bezug_kwh) FROM messwerte WHERE timestamp >= ? AND timestamp < ?",
+     "SELECT (MAX(bezug_mwh) - MIN(bezug_mwh)) / 1e6 FROM messwerte_v2 "
+     "WHERE zaehler_id IN (SELECT id FROM zaehler) AND ts >= ? AND ts < ?"),
+    ("Tagesverlauf",
+     "SELECT timestamp, wirkleistung_watt FROM messwerte WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+     "SELECT ts, leistung_w FROM messwerte_v2 "
+     "WHERE zaehler_id IN (SELECT id FROM zaehler) AND ts >= ? AND ts < ? ORDER BY ts"),
+    ("Letzter Messwert",
+     "SELECT timestamp, bezug_kwh FROM messwerte ORDER BY timestamp DESC LIMIT 1",
+     "SELECT MAX((SELECT MAX(ts) FROM messwerte_v2 WHERE zaehler_id = z.id)) FROM zaehler z"),
+]
+ZEITRAEUME = {"Tag": 1, "Monat": 30}
+
+
+def gelesen():
+    """:return: Bisher gelesene Bytes dieses Prozesses (rchar)."""
+    with open("/proc/self/io", encoding="ascii") as f:
+        for zeile in f:
+            if zeile.startswith("rchar:"):
+                return int(zeile.split()[1])
+    return 0
+
+
+def groessen(pfad):
+    """
+    :return: (Dateigröße, Anzahl Messwerte, {Tabelle/Index: Bytes}) für messwerte bzw. messwerte_v2.
+    """
+    conn = sqlite3.connect(f"file:{pfad}?mode=ro", uri=True)
+    try:
+        tabelle = "messwerte_v2" if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messwerte_v2'").fetchone() else "messwerte"
+        anzahl = conn.execute(f"SELECT COUNT(*) FROM {tabelle}").fetchone()[0]
+        objekte = {name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name = ? AND type IN ('table', 'index')", (tabelle,))}
+        objekte.add(f"sqlite_autoindex_{tabelle}_1")
+        belegt = {name: groesse for name, groesse in conn.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name") if name in objekte}
+    finally:
+        conn.close()
+    return os.path.getsize(pfad), anzahl, belegt
+
+
+def kalt_messen(pfad, sql, parameter, wiederholungen):
+    """
+    Führt die Abfrage jeweils mit einer frischen Verbindung aus (leerer Seiten-Cache von SQLite;
+    der Seiten-Cache des Betriebssystems bleibt, gemessen werden die Seitenzugriffe).
+    :return: (gelesene Seiten, Millisekunden) als Median.
+    """
+    seiten, zeiten = [], []
+    for _ in range(wiederholungen):
+        conn = sqlite3.connect(f"file:{pfad}?mode=ro", uri=True)
+        conn.execute("PRAGMA mmap_size=0")
+        conn.execute("PRAGMA cache_size=-64")
+        seitengroesse = conn.execute("PRAGMA page_size").fetchone()[0]
+        conn.execute("SELECT 1 FROM sqlite_master").fetchall()  # Schema laden
+        vorher = gelesen()
+        start = time.perf_counter()
+        conn.execute(sql, parameter).fetchall()
+        zeiten.append((time.perf_counter() - start) * 1000)
+        seiten.append((gelesen() - vorher) / seitengroesse)
+        conn.close()
+    return sorted(seiten)[len(seiten) // 2], sorted(zeiten)[len(zeiten) // 2]
+
+
+def grenzen(tag, tage, neu):
+    ende = tag + timedelta(days=tage)
+    if not neu:
+        return tag.isoformat(), ende.isoformat()
+    return tuple(int(datetime.combine(t, datetime.min.time()).timestamp()) for t in (tag, ende))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Altes Schema gegen messwerte_v2 (Größe, gelesene Seiten)")
+    parser.add_argument("db", help="Datenbank im alten Schema (z. B. testdatenbank.py vor messwerte_v2), wird nur gelesen")
+    parser.add_argument("--datum", help="Tag für die Abfragen (YYYY-MM-DD, Standard: Mitte der Daten)")
+    parser.add_argument("--wiederholungen", type=int, default=5)
+    parser.add_argument("--verzeichnis", help="Verzeichnis für die migrierte Kopie (Standard: temporär)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messwerte'").fetchone():
+        parser.error(f"{args.db} enthält keine Tabelle messwerte im alten Schema")
+    erster, letzter = conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM messwerte").fetchone()
+    conn.close()
+    if args.datum:
+        tag = date.fromisoformat(args.datum)
+    else:
+        erster, letzter = date.fromisoformat(erster[:10]), date.fromisoformat(letzter[:10])
+        tag = erster + (letzter - erster) / 2
+
+    with tempfile.TemporaryDirectory(dir=args.verzeichnis) as verzeichnis:
+        neu = os.path.join(verzeichnis, "strom_v2.sqlite")
+        shutil.copyfile(args.db, neu)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(READER / "migration_v2.py"), "--db", neu, "--pause", "0", "--vacuum"],
+                       check=True, capture_output=True)
+        print(f"Migration mit VACUUM: {time.perf_counter() - start:.1f} s\n")
+
+        alt_groesse, anzahl, alt_belegt = groessen(args.db)
+        neu_groesse, _, neu_belegt = groessen(neu)
+        print(f"{'':<30}{'alt':>14}{'neu':>14}{'Faktor':>9}")
+        print(f"{'Datei':<30}{alt_groesse / 1e6:11.1f} MB{neu_groesse / 1e6:11.1f} MB{alt_groesse / neu_groesse:8.1f}x")
+        alt_mw, neu_mw = sum(alt_belegt.values()), sum(neu_belegt.values())
+        print(f"{'Messwerte + Indizes':<30}{alt_mw / 1e6:11.1f} MB{neu_mw / 1e6:11.1f} MB{alt_mw / neu_mw:8.1f}x")
+        print(f"{'Bytes pro Messwert':<30}{alt_mw / anzahl:14.1f}{neu_mw / anzahl:14.1f}")
+        for name, groesse in sorted(alt_belegt.items()) + sorted(neu_belegt.items()):
+            print(f"  {name:<28}{groesse / 1e6:11.1f} MB")
+
+        print(f"\n{'Abfrage (' + tag.isoformat() + ')':<30}{'Seiten alt':>12}{'Seiten neu':>12}"
+              f"{'ms alt':>10}{'ms neu':>10}")
+        for name, sql_alt, sql_neu in ABFRAGEN:
+            for zeitraum, tage in ZEITRAEUME.items() if "?" in sql_alt else [("", 0)]:
+                parameter_alt = grenzen(tag, tage, False) if tage else ()
+                parameter_neu = grenzen(tag, tage, True) if tage else ()
+                seiten_alt, ms_alt = kalt_messen(args.db, sql_alt, parameter_alt, args.wiederholungen)
+                seiten_neu, ms_neu = kalt_messen(neu, sql_neu, parameter_neu, args.wiederholungen)
+                print(f"{(name + ' ' + zeitraum).strip():<30}{seiten_alt:12.0f}{seiten_neu:12.0f}"
+                      f"{ms_alt:10.2f}{ms_neu:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Vergleicht das Schreiben der Messwerte in SQLite:
+#   vorher:  save_to_sqlite() öffnet pro Messwert eine Verbindung (Rollback-Journal, synchronous=FULL)
+#   WAL:     SqliteSchreiber, Commit pro Messwert (WAL, synchronous=NORMAL)
+#   WAL+Batch: SqliteSchreiber, ein Commit pro --batch Messwerten
+# Gemessen wird die Schreiblatenz pro Messwert. Die fsyncs pro Stunde werden aus dem
+# SQLite-Verhalten abgeschätzt (Rollback-Journal/FULL: 3 fsyncs pro Commit,
+# WAL/NORMAL: keine fsyncs pro Commit, 2 fsyncs pro Checkpoint alle 1000 WAL-Seiten).
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "reader"))
+
+from speicher import SqliteSchreiber  # noqa: E402
+
+FSYNC_PRO_COMMIT_ROLLBACK = 3
+FSYNC_PRO_CHECKPOINT = 2
+WAL_AUTOCHECKPOINT = 1000
+
+# Schema zur Zeit von save_to_sqlite() (Rollback-Journal, rowid-Tabelle mit Index auf timestamp)
+ALTES_SCHEMA = """
+    CREATE TABLE zaehler (id INTEGER PRIMARY KEY AUTOINCREMENT, seriennummer TEXT UNIQUE, hersteller TEXT, name TEXT);
+    CREATE TABLE messwerte (id INTEGER PRIMARY KEY AUTOINCREMENT, zaehler_id INTEGER, timestamp TEXT,
+                            bezug_kwh REAL, einspeisung_kwh REAL, wirkleistung_watt REAL);
+    CREATE INDEX idx_timestamp ON messwerte(timestamp);
+"""
+
+
+def save_to_sqlite(db_pfad, seriennummer, hersteller, bezug_kwh, einspeisung_kwh, wirkleistung_watt):
+    """Alte Funktion aus strom_reader.py (ohne Logging)."""
+    conn = sqlite3.connect(db_pfad)
+    c = conn.cursor()
+    c.execute("SELECT id FROM zaehler WHERE seriennummer = ?", (seriennummer,))
+    row = c.fetchone()
+    if row:
+        zaehler_id = row[0]
+    else:
+        c.execute("INSERT INTO zaehler (seriennummer, hersteller) VALUES (?, ?)", (seriennummer, hersteller))
+        zaehler_id = c.lastrowid
+    timestamp = datetime.now().isoformat()
+    c.execute("""
+        INSERT INTO messwerte (zaehler_id, timestamp, bezug_kwh, einspeisung_kwh, wirkleistung_watt)
+        VALUES (?, ?, ?, ?, ?)
+    """, (zaehler_id, timestamp, bezug_kwh, einspeisung_kwh, wirkleistung_watt))
+    conn.commit()
+    conn.close()
+
+
+def wal_seiten(db_pfad):
+    """Anzahl der Seiten, die seit dem Öffnen in das WAL geschrieben wurden."""
+    wal = Path(str(db_pfad) + "-wal")
+    if not wal.exists():
+        return 0
+    seitengroesse = sqlite3.connect(db_pfad).execute("PRAGMA page_size").fetchone()[0]
+    return max(0, (wal.stat().st_size - 32) // (seitengroesse + 24))
+
+
+def bericht(name, latenzen, commits, anzahl, pro_stunde, fsyncs_pro_lauf):
+    latenzen = sorted(latenzen)
+    p95 = latenzen[int(len(latenzen) * 0.95) - 1]
+    fsyncs_h = fsyncs_pro_lauf / anzahl * pro_stunde
+    print(f"{name:<12} Ø {statistics.mean(latenzen) * 1000:7.3f} ms  p95 {p95 * 1000:7.3f} ms  "
+          f"{commits:>5} Commits  ≈ {fsyncs_h:8.1f} fsyncs/h")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schreiblatenz und fsyncs/h für SQLite")
+    parser.add_argument("--messwerte", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=60, help="Messwerte pro Commit für WAL+Batch")
+    parser.add_argument("--wait-timer", type=int, default=1, help="Sekunden zwischen zwei Messwerten (WAIT_TIMER)")
+    parser.add_argument("--verzeichnis", default=None, help="Verzeichnis für die Testdatenbanken (z. B. auf der SD-Karte)")
+    args = parser.parse_args()
+    pro_stunde = 3600 / args.wait_timer
+
+    with tempfile.TemporaryDirectory(dir=args.verzeichnis) as tmp:
+        print(f"{args.messwerte} Messwerte, WAIT_TIMER {args.wait_timer} s ({pro_stunde:.0f} Messwerte/h), Verzeichnis {tmp}")
+
+        # vorher
+        db = os.path.join(tmp, "vorher.sqlite")
+        sqlite3.connect(db).executescript(ALTES_SCHEMA).close()
+        latenzen = []
+        for i in range(args.messwerte):
+            start = time.perf_counter()
+            save_to_sqlite(db, "EMH-0000123456", "EMH", 1000 + i / 1000, 10.0, 500)
+            latenzen.append(time.perf_counter() - start)
+        bericht("vorher", latenzen, args.messwerte, args.messwerte, pro_stunde,
+                args.messwerte * FSYNC_PRO_COMMIT_ROLLBACK)
+
+        # nachher
+        for name, batch in (("WAL", 1), ("WAL+Batch", args.batch)):
+            db = os.path.join(tmp, f"{name}.sqlite")
+            schreiber = SqliteSchreiber(db, max_wartezeit=3600, max_zeilen=batch)
+            schreiber.conn.execute("PRAGMA wal_autocheckpoint=0")  # Seiten zählen, Checkpoints rechnerisch
+            latenzen = []
+            beginn = datetime.now().replace(microsecond=0)
+            for i in range(args.messwerte):
+                # Zeitpunkte wie beim Reader im Abstand WAIT_TIMER (eine Zeile pro Sekunde und Zähler)
+                zeitpunkt = (beginn + timedelta(seconds=i * args.wait_timer)).isoformat()
+                start = time.perf_counter()
+                schreiber.speichern("EMH-0000123456", "EMH", 1000 + i / 1000, 10.0, 500, timestamp=zeitpunkt)
+                latenzen.append(time.perf_counter() - start)
+            schreiber.flush()
+            seiten = wal_seiten(db)
+            commits = schreiber.commits
+            schreiber.schliessen()
+            bericht(name, latenzen, commits, args.messwerte, pro_stunde,
+                    seiten / WAL_AUTOCHECKPOINT * FSYNC_PRO_CHECKPOINT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# Erzeugt eine synthetische strom.sqlite mit mehreren Jahren Messwerten
+# (Schema wie der Reader: messwerte_v2 und verdichtete Tabellen tag/monat/jahr).
+# Die Zählerstände laufen nur vorwärts; optional mit PV-Einspeisung und Ausfällen
+# des Readers (Lücken, in denen der Zähler weiterzählt, aber nichts gespeichert wird).
+#
+#   python3 benchmark/testdatenbank.py /tmp/strom.sqlite --jahre 3 --intervall 60
+#   python3 benchmark/testdatenbank.py /tmp/strom_1s.sqlite --jahre 0.1 --intervall 1 --pv-kwp 6 --luecken 20
+import argparse
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "reader"))
+
+# Lokale Zeit der Testdaten wie bei Reader und Backend (TZ=Europe/Berlin), sonst passen die
+# Tage der Testdatenbank nicht zu den Tagesgrenzen, die das Backend rechnet
+os.environ.setdefault("TZ", "Europe/Berlin")
+time.tzset()
+
+import rollup  # noqa: E402
+from speicher import SqliteSchreiber, zeile_v2  # noqa: E402
+
+BLOCK = 50000  # Zeilen pro executemany(), der Speicherbedarf bleibt konstant
+
+
+def leistung(zeitpunkt, zufall):
+    """Einfaches Lastprofil: Grundlast, Tagesgang, zufällige Spitzen (W)."""
+    stunde = zeitpunkt.hour + zeitpunkt.minute / 60
+    tagesgang = 250 * (1 + math.sin((stunde - 6) / 24 * 2 * math.pi))
+    spitze = zufall.choice((0, 0, 0, 0, 1500, 2500)) if 7 <= stunde <= 22 else 0
+    return round(150 + tagesgang + spitze + zufall.uniform(-50, 50))
+
+
+def pv_leistung(zeitpunkt, kwp, zufall):
+    """PV-Erzeugung (W): Sonnenbogen je nach Jahreszeit, zufällige Bewölkung."""
+    if not kwp:
+        return 0
+    jahreszeit = math.cos((zeitpunkt.timetuple().tm_yday - 172) / 365 * 2 * math.pi)  # 1 = Juni, -1 = Dezember
+    tageslaenge = 12 + 4 * jahreszeit
+    stunde = zeitpunkt.hour + zeitpunkt.minute / 60 - (12 - tageslaenge / 2)
+    if not 0 < stunde < tageslaenge:
+        return 0
+    sonne = math.sin(stunde / tageslaenge * math.pi) * (0.6 + 0.4 * jahreszeit)
+    return round(kwp * 1000 * 0.8 * sonne * zufall.uniform(0.3, 1.0))
+
+
+def luecken_erzeugen(beginn, ende, anzahl, zufall):
+    """
+    Zufällige Ausfälle des Readers zwischen 5 Minuten und 12 Stunden.
+    :return: Sortierte Liste von (von, bis).
+    """
+    dauer = (ende - beginn).total_seconds()
+    luecken = []
+    for _ in range(anzahl):
+        von = beginn + timedelta(seconds=zufall.uniform(0, dauer))
+        luecken.append((von, von + timedelta(minutes=zufall.uniform(5, 12 * 60))))
+    return sorted(luecken)
+
+
+def messwerte(beginn, ende, intervall, zaehler_id=1, seed=1, pv_kwp=0.0, luecken=0):
+    """
+    Erzeugt Zeilen, wie SqliteSchreiber.speichern() sie sammelt (siehe speicher.zeile_v2()).
+    :param pv_kwp: Leistung einer PV-Anlage (kWp), 0 = keine Einspeisung.
+    :param luecken: Anzahl Ausfälle pro Jahr.
+    """
+    zufall = random.Random(seed)
+    ausfaelle = luecken_erzeugen(beginn, ende, round(luecken * (ende - beginn).days / 365), zufall)
+    bezug = 10000.0
+    einspeisung = 0.0
+    zeitpunkt = beginn
+    schritt = timedelta(seconds=intervall)
+    while zeitpunkt < ende:
+        watt = leistung(zeitpunkt, zufall) - pv_leistung(zeitpunkt, pv_kwp, zufall)
+        if watt >= 0:
+            bezug += watt * intervall / 3600 / 1000
+        else:
+            einspeisung -= watt * intervall / 3600 / 1000
+        while ausfaelle and ausfaelle[0][1] <= zeitpunkt:
+            ausfaelle.pop(0)
+        if not (ausfaelle and ausfaelle[0][0] <= zeitpunkt):
+            spitze = watt + zufall.randint(0, 800)
+            yield (zaehler_id, zeitpunkt.isoformat(), round(bezug, 4), round(einspeisung, 4), watt,
+                   watt - 100, spitze, watt, intervall)
+        zeitpunkt += schritt
+
+
+def testdatenbank_erzeugen(pfad, jahre=3, intervall=60, ende=None, zaehler=1, pv_kwp=0.0, luecken=0):
+    """
+    Legt die Datenbank an und füllt sie bis `ende` (Standard: jetzt).
+    :return: Anzahl der Messwerte.
+    """
+    ende = ende or datetime.now().replace(microsecond=0)
+    beginn = ende - timedelta(days=365 * jahre)
+    schreiber = SqliteSchreiber(str(pfad))
+    conn = schreiber.conn
+    anzahl = 0
+    for nummer in range(1, zaehler + 1):
+        zaehler_id = schreiber.zaehler_id(f"EMH-{nummer:010d}", "EMH")
+        zeilen = messwerte(beginn, ende, intervall, zaehler_id=zaehler_id, seed=nummer,
+                           pv_kwp=pv_kwp, luecken=luecken)
+        conn.execute("BEGIN")
+        while True:
+            block = list(itertools.islice(zeilen, BLOCK))
+            if not block:
+                break
+            conn.executemany(SqliteSchreiber.INSERT_MESSWERT, map(zeile_v2, block))
+            anzahl += len(block)
+        conn.execute("COMMIT")
+    rollup.neu_aufbauen(conn)
+    schreiber.schliessen()
+    return anzahl
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetische strom.sqlite erzeugen")
+    parser.add_argument("pfad")
+    parser.add_argument("--jahre", type=float, default=3)
+    parser.add_argument("--intervall", type=int, default=60, help="Sekunden zwischen zwei Messwerten (WAIT_TIMER)")
+    parser.add_argument("--zaehler", type=int, default=1)
+    parser.add_argument("--pv-kwp", type=float, default=0.0, help="PV-Anlage in kWp (Einspeisung), 0 = keine")
+    parser.add_argument("--luecken", type=int, default=0, help="Ausfälle des Readers pro Jahr (5 min bis 12 h)")
+    args = parser.parse_args()
+    if Path(args.pfad).exists():
+        parser.error(f"{args.pfad} existiert bereits")
+    start = time.perf_counter()
+    anzahl = testdatenbank_erzeugen(args.pfad, args.jahre, args.intervall, zaehler=args.zaehler,
+                                    pv_kwp=args.pv_kwp, luecken=args.luecken)
+    print(f"{anzahl} Messwerte in {time.perf_counter() - start:.1f} s nach {args.pfad} geschrieben")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
-from flask import Flask, jsonify, request
-from datetime import datetime
+from flask import Flask, Response, jsonify, request
+from datetime import date, datetime, timedelta, timezone
+from collections import OrderedDict
+from functools import wraps
+from werkzeug.http import is_resource_modified
+import csv
+import hashlib
+import io
+import json
 import sqlite3
 import logging
+import os
+import queue
+import threading
+import time
+
+# Lokale Zeit (Tagesgrenzen, Zeitstempel, 'localtime' in SQLite) wie beim Reader, der tag/monat/jahr
+# mit TZ=Europe/Berlin verdichtet; ohne TZ liefe das Image in UTC und alle Tage wären verschoben
+os.environ.setdefault("TZ", "Europe/Berlin")
+time.tzset()
 
 app = Flask(__name__)
-DB_PATH = "/app/data/strom.sqlite"
+DB_PATH = os.getenv("DB_PATH", "/app/data/strom.sqlite")
 
 # === Logging einrichten ===
 logging.basicConfig(
@@ -14,64 +30,565 @@ logging.basicConfig(
 )
 logger = logging.getLogger("dashboard-backend")
 
-def get_db_connection():
-    logger.debug("🔌 Verbindung zur SQLite-Datenbank herstellen...")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Damit die Ergebnisse als Dictionary zurückgegeben werden
-    logger.debug("✅ Verbindung erfolgreich hergestellt.")
+def lese_verbindung_oeffnen(db_pfad):
+    """
+    Öffnet eine Nur-Lese-Verbindung (mode=ro, query_only). Im WAL-Modus blockieren
+    Leser den Reader nicht und werden von ihm nicht blockiert; busy_timeout überbrückt
+    die kurzen Sperren beim Checkpoint.
+    :param db_pfad: Pfad zur SQLite-Datenbank.
+    :return: sqlite3.Connection
+    """
+    conn = sqlite3.connect(f"file:{db_pfad}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=%d" % -int(os.getenv("SQLITE_CACHE_KB", 16384)))  # negativ = KiB
+    conn.execute("PRAGMA mmap_size=%d" % (int(os.getenv("SQLITE_MMAP_MB", 256)) * 1024 * 1024))
     return conn
 
+class LesePool:
+    """
+    Pool wiederverwendbarer Nur-Lese-Verbindungen. Jede Verbindung wird immer nur
+    von einem Thread gleichzeitig benutzt und nach der Anfrage zurückgegeben,
+    damit Schema und Seiten-Cache erhalten bleiben.
+    :param db_pfad: Pfad zur SQLite-Datenbank.
+    :param max_verbindungen: Maximale Anzahl gleichzeitig offener Verbindungen.
+    """
+    def __init__(self, db_pfad, max_verbindungen=4):
+        self.db_pfad = db_pfad
+        self.max_verbindungen = max_verbindungen
+        self._frei = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.geoeffnet = 0
+
+    def holen(self):
+        try:
+            return self._frei.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            neu = self.geoeffnet < self.max_verbindungen
+            if neu:
+                self.geoeffnet += 1
+        if not neu:
+            # Alle Verbindungen in Benutzung -> auf eine freie warten
+            return self._frei.get()
+        try:
+            conn = lese_verbindung_oeffnen(self.db_pfad)
+        except Exception:
+            with self._lock:
+                self.geoeffnet -= 1
+            raise
+        conn.row_factory = sqlite3.Row  # Damit die Ergebnisse als Dictionary zurückgegeben werden
+        logger.debug("🔌 Neue Nur-Lese-Verbindung %d/%d geöffnet.", self.geoeffnet, self.max_verbindungen)
+        return conn
+
+    def zurueckgeben(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._frei.put(conn)
+
+lese_pool = LesePool(DB_PATH, max_verbindungen=int(os.getenv("SQLITE_VERBINDUNGEN", 4)))
+
+def get_db_connection():
+    logger.debug("🔌 Verbindung aus dem Pool holen...")
+    return lese_pool.holen()
+
+def release_db_connection(conn):
+    lese_pool.zurueckgeben(conn)
+    logger.debug("🔓 Verbindung an den Pool zurückgegeben.")
+
+# Messwerte stehen in messwerte_v2 (siehe reader/speicher.py): ts in Sekunden seit 1970 (UTC),
+# Zählerstände in mWh, Leistung in W, Primärschlüssel (zaehler_id, ts). Mit ALLE_ZAEHLER
+# sucht SQLite einen Zeitraum pro Zähler direkt im Primärschlüssel.
+ALLE_ZAEHLER = "zaehler_id IN (SELECT id FROM zaehler)"
+ZEITSTEMPEL = "strftime('%Y-%m-%dT%H:%M:%S', ts, 'unixepoch', 'localtime')"
+
+def tagesgrenzen(tag, tage=1):
+    """
+    Liefert Beginn und Ende eines Zeitraums als halboffenes Intervall
+    für `zeitraum >= ? AND zeitraum < ?` in den verdichteten Tabellen.
+    :param tag: Der erste Tag (date).
+    :param tage: Anzahl der Tage.
+    :return: (beginn, ende) als ISO-Strings, z. B. ('2025-04-16', '2025-04-17').
+    """
+    return tag.isoformat(), (tag + timedelta(days=tage)).isoformat()
+
+def sekunden(zeitpunkt):
+    """
+    :param zeitpunkt: date (lokale Mitternacht) oder datetime (ohne Zeitzone = lokale Zeit).
+    :return: Sekunden seit 1970, vergleichbar mit ts in messwerte_v2.
+    """
+    if not isinstance(zeitpunkt, datetime):
+        zeitpunkt = datetime.combine(zeitpunkt, datetime.min.time())
+    return int(zeitpunkt.timestamp())
+
+def zeitgrenzen(tag, tage=1):
+    """
+    Wie tagesgrenzen(), aber für `ts >= ? AND ts < ?` in messwerte_v2.
+    :return: (beginn, ende) in Sekunden seit 1970, lokale Mitternacht (auch an Tagen mit 23 oder 25 Stunden).
+    """
+    return sekunden(tag), sekunden(tag + timedelta(days=tage))
+
+def zeitstempel(ts):
+    """
+    :param ts: Sekunden seit 1970 oder None.
+    :return: Lokale Zeit als ISO-String wie früher in messwerte.timestamp, z. B. '2025-04-16T14:30:00'.
+    """
+    return datetime.fromtimestamp(ts).isoformat() if ts is not None else None
+
+# Ältere Zeiträume (siehe reader/aufbewahrung.py): Rohdaten vor der Grenze 'roh' sind zu
+# Minuten- und Stundenwerten verdichtet, Minutenwerte vor der Grenze 'minute' gelöscht.
+# ts ist der Beginn der Minute bzw. der lokalen Stunde, Leistung ist der Mittelwert.
+MITTELWERT = "CAST(ROUND(leistung_summe_w * 1.0 / anzahl) AS INTEGER)"
+# Tabelle -> (Leistung, Bezug am Anfang, Bezug am Ende)
+STUFEN = {
+    "messwerte_v2": ("leistung_w", "bezug_mwh", "bezug_mwh"),
+    "messwerte_minute": (MITTELWERT, "bezug_anfang_mwh", "bezug_ende_mwh"),
+    "messwerte_stunde": (MITTELWERT, "bezug_anfang_mwh", "bezug_ende_mwh"),
+}
+
+def stufen_grenzen(conn):
+    """
+    :param conn: sqlite3.Connection oder Cursor.
+    :return: (roh, minute) als Sekunden seit 1970, jeweils None, solange nichts verdichtet bzw. gelöscht wurde.
+    """
+    grenzen = {row[0]: row[1] for row in conn.execute("SELECT stufe, grenze FROM aufbewahrung")}
+    return grenzen.get("roh"), grenzen.get("minute")
+
+def stufen_waehlen(grenzen, beginn, ende, aufloesung=None):
+    """
+    Teilt einen Zeitraum auf die Stufen auf: ab der Grenze 'roh' messwerte_v2, davor die
+    gröbste Stufe, deren Auflösung noch reicht und die den Zeitraum noch enthält.
+    :param grenzen: (roh, minute) von stufen_grenzen().
+    :param beginn: Sekunden seit 1970 (inklusive).
+    :param ende: Sekunden seit 1970 (exklusive).
+    :param aufloesung: Benötigte Sekunden pro Wert oder None (so fein wie vorhanden).
+    :return: Liste von (tabelle, beginn, ende), zeitlich aufsteigend und ohne Überschneidung.
+    """
+    roh, minute = grenzen
+    if roh is None or roh <= beginn:
+        return [("messwerte_v2", beginn, ende)]
+    alt_ende = min(ende, roh)
+    if aufloesung is not None and aufloesung >= 3600:
+        minute = alt_ende  # Stundenwerte reichen für den ganzen Teil
+    teile = []
+    if minute is not None and beginn < minute:
+        teile.append(("messwerte_stunde", beginn, min(alt_ende, minute)))
+    if minute is None or minute < alt_ende:
+        teile.append(("messwerte_minute", max(beginn, minute or beginn), alt_ende))
+    if roh < ende:
+        teile.append(("messwerte_v2", roh, ende))
+    return teile
+
+def bereichsstand(conn, beginn, ende):
+    """
+    Fingerabdruck der Messwerte eines Zeitraums: Anzahl, erster und letzter Zeitpunkt je Stufe.
+    Ändert sich, wenn im Zeitraum Messwerte nachgetragen (data-migration, spät geschriebene
+    Commits des Readers) oder verdichtet werden, aber nicht durch neue Messwerte danach.
+    Je Zähler und Stufe eine Suche im Primärschlüssel.
+    :param conn: sqlite3.Connection oder Cursor.
+    :param beginn: Sekunden seit 1970 (inklusive).
+    :param ende: Sekunden seit 1970 (exklusive).
+    :return: Tupel aus (Anzahl, erster ts, letzter ts) je Stufe.
+    """
+    return tuple(tuple(conn.execute(f"""
+        SELECT COUNT(*), MIN(ts), MAX(ts) FROM {tabelle} WHERE {ALLE_ZAEHLER} AND ts >= ? AND ts < ?
+    """, (beginn, ende)).fetchone()) for tabelle in STUFEN)
+
+# Der Reader sammelt Messwerte bis zu SQLITE_BATCH_SEKUNDEN, bevor er sie schreibt (gleicher Wert
+# wie dort), dazu etwas Reserve für die Schreib-Warteschlange. Erst so lange nach seinem Ende
+# gilt ein Zeitraum als abgeschlossen.
+NACHLAUF_SEKUNDEN = int(os.getenv("SQLITE_BATCH_SEKUNDEN", 60)) + 60
+
+def abgeschlossen(ende):
+    """
+    :param ende: Sekunden seit 1970.
+    :return: True, wenn vor `ende` keine Messwerte des Readers mehr ausstehen.
+    """
+    return ende <= time.time() - NACHLAUF_SEKUNDEN
+
+def datum_lesen(text):
+    """
+    Wandelt den Query-Parameter `datum` (YYYY-MM-DD) in ein date um.
+    :param text: Der Parameter.
+    :return: date oder None, wenn das Datum ungültig ist.
+    """
+    try:
+        return date.fromisoformat(text)
+    except (TypeError, ValueError):
+        return None
+
+VERLAUF_METHODEN = ("lttb", "minmax")
+
+def punkte_lesen(args):
+    """
+    Liest die optionalen Query-Parameter `points` (Anzahl Punkte, mindestens 3)
+    und `methode` (`lttb` oder `minmax`, Standard: `lttb`).
+    :param args: request.args
+    :return: (punkte, methode); punkte ist None ohne Ausdünnung.
+    :raises ValueError: Bei ungültigen Werten.
+    """
+    text = args.get('points')
+    methode = args.get('methode', VERLAUF_METHODEN[0])
+    if methode not in VERLAUF_METHODEN:
+        raise ValueError(f"Ungültige Methode: {methode}")
+    if text is None:
+        return None, methode
+    punkte = int(text)
+    if punkte < 3:
+        raise ValueError(f"Ungültige Anzahl Punkte: {punkte}")
+    return punkte, methode
+
+def lttb(x, y, punkte):
+    """
+    Largest-Triangle-Three-Buckets: teilt die Reihe in `punkte - 2` Eimer und wählt
+    aus jedem den Punkt, der mit dem zuvor gewählten Punkt und dem Mittelwert des
+    nächsten Eimers das größte Dreieck bildet. Erster und letzter Punkt bleiben,
+    Spitzen bleiben sichtbar.
+    :param x: Zeitachse (aufsteigend, numerisch).
+    :param y: Werte (ohne None).
+    :param punkte: Anzahl der Punkte im Ergebnis.
+    :return: Liste der gewählten Indizes (aufsteigend).
+    """
+    n = len(x)
+    if punkte >= n:
+        return list(range(n))
+    breite = (n - 2) / (punkte - 2)
+    indizes = [0]
+    a = 0
+    for eimer in range(punkte - 2):
+        beginn = int(eimer * breite) + 1
+        ende = int((eimer + 1) * breite) + 1
+        naechstes_ende = min(int((eimer + 2) * breite) + 1, n)
+        # Mittelwert des nächsten Eimers (für den letzten Eimer: der letzte Punkt)
+        anzahl = naechstes_ende - ende
+        mittel_x = sum(x[ende:naechstes_ende]) / anzahl
+        mittel_y = sum(y[ende:naechstes_ende]) / anzahl
+        ax, ay = x[a], y[a]
+        dx, dy = ax - mittel_x, mittel_y - ay
+        # Doppelte Dreiecksfläche; der konstante Anteil ist für alle Kandidaten gleich
+        flaechen = [abs(dx * (yi - ay) - (ax - xi) * dy) for xi, yi in zip(x[beginn:ende], y[beginn:ende])]
+        a = beginn + flaechen.index(max(flaechen))
+        indizes.append(a)
+    indizes.append(n - 1)
+    return indizes
+
+def minmax_eimer(y, punkte):
+    """
+    Teilt die Reihe in `punkte // 2` Eimer und behält aus jedem Minimum und Maximum
+    (in zeitlicher Reihenfolge).
+    :param y: Werte (ohne None).
+    :param punkte: Maximale Anzahl der Punkte im Ergebnis.
+    :return: Liste der gewählten Indizes (aufsteigend).
+    """
+    n = len(y)
+    if punkte >= n:
+        return list(range(n))
+    eimer_anzahl = punkte // 2
+    indizes = []
+    for eimer in range(eimer_anzahl):
+        beginn = eimer * n // eimer_anzahl
+        ende = (eimer + 1) * n // eimer_anzahl
+        werte = y[beginn:ende]
+        kleinster = beginn + werte.index(min(werte))
+        groesster = beginn + werte.index(max(werte))
+        indizes.extend(sorted({kleinster, groesster}))
+    return indizes
+
+def verlauf_lesen(cursor, bereich, punkte=None, methode="lttb"):
+    """
+    Liest den Leistungsverlauf eines Zeitraums in einem Durchlauf über den Cursor
+    und dünnt ihn bei Bedarf auf `punkte` Punkte aus. Ältere Zeiträume kommen aus der
+    gröbsten Stufe, die für `punkte` noch fein genug ist (siehe stufen_waehlen()).
+    :param cursor: sqlite3.Cursor
+    :param bereich: (beginn, ende) wie von zeitgrenzen().
+    :param punkte: Anzahl Punkte oder None für alle Messwerte.
+    :param methode: `lttb` oder `minmax`.
+    :return: Liste von {"timestamp", "leistung"}.
+    """
+    aufloesung = (bereich[1] - bereich[0]) / punkte if punkte is not None else None
+    teile = stufen_waehlen(stufen_grenzen(cursor), *bereich, aufloesung)
+    if punkte is None:
+        verlauf = []
+        for tabelle, beginn, ende in teile:
+            cursor.execute(f"""
+                SELECT {ZEITSTEMPEL} AS timestamp, {STUFEN[tabelle][0]} AS leistung
+                FROM {tabelle}
+                WHERE {ALLE_ZAEHLER} AND ts >= ? AND ts < ?
+                ORDER BY ts ASC
+            """, (beginn, ende))
+            verlauf.extend({"timestamp": row["timestamp"], "leistung": row["leistung"]} for row in cursor)
+        return verlauf
+
+    # ts ist schon die Zahl für die x-Achse, Zeilen ohne Leistung fallen weg;
+    # formatiert werden nur die Punkte, die übrig bleiben
+    x, y = [], []
+    for tabelle, beginn, ende in teile:
+        leistung = STUFEN[tabelle][0]
+        cursor.execute(f"""
+            SELECT ts, {leistung}
+            FROM {tabelle}
+            WHERE {ALLE_ZAEHLER} AND ts >= ? AND ts < ? AND {leistung} IS NOT NULL
+            ORDER BY ts ASC
+        """, (beginn, ende))
+        for row in cursor:
+            x.append(row[0])
+            y.append(row[1])
+
+    if methode == "minmax":
+        indizes = minmax_eimer(y, punkte)
+    else:
+        indizes = lttb(x, y, punkte)
+    logger.debug("📉 Verlauf ausgedünnt (%s): %d -> %d Punkte", methode, len(y), len(indizes))
+    return [{"timestamp": zeitstempel(x[i]), "leistung": y[i]} for i in indizes]
+
+class AntwortCache:
+    """
+    Zwischenspeicher für API-Antworten, Schlüssel ist Endpunkt + Query-Parameter.
+    Eine Antwort gilt, solange sich der Datenstand nicht geändert hat: `PRAGMA data_version`
+    einer dauerhaft offenen Verbindung (ändert sich bei jedem Commit einer anderen
+    Verbindung, z. B. des Readers oder von rollup.py), der letzte Messwert und das aktuelle Datum.
+    Für abgeschlossene Zeiträume ist der Stand der Fingerabdruck des Zeitraums (bereichsstand()),
+    solche Einträge überstehen neue Messwerte und gelten bis zum nächsten Nachtragen.
+    Bei mehr als `max_eintraege` Einträgen wird der am längsten nicht genutzte verdrängt.
+    :param db_pfad: Pfad zur SQLite-Datenbank.
+    :param max_eintraege: Maximale Anzahl Antworten im Speicher.
+    """
+    def __init__(self, db_pfad, max_eintraege=256):
+        self.db_pfad = db_pfad
+        self.max_eintraege = max_eintraege
+        self._eintraege = OrderedDict()
+        self._lock = threading.Lock()
+        self._waechter = None
+        # Statistik
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self.verdraengt = 0
+
+    def datenstand(self):
+        """
+        :return: Tupel, das sich ändert, sobald neue Daten geschrieben wurden.
+        """
+        with self._lock:
+            if self._waechter is None:
+                self._waechter = lese_verbindung_oeffnen(self.db_pfad)
+            data_version = self._waechter.execute("PRAGMA data_version").fetchone()[0]
+            # Pro Zähler eine Suche im Primärschlüssel
+            letzter_ts = self._waechter.execute("""
+                SELECT MAX((SELECT MAX(ts) FROM messwerte_v2 WHERE zaehler_id = z.id)) FROM zaehler z
+            """).fetchone()[0]
+        return date.today().isoformat(), data_version, letzter_ts, zeitstempel(letzter_ts)
+
+    def bereichsstand(self, beginn, ende):
+        """
+        :param beginn: Sekunden seit 1970 (inklusive).
+        :param ende: Sekunden seit 1970 (exklusive).
+        :return: bereichsstand() des Zeitraums oder None, wenn er (noch) keine Messwerte hat.
+        """
+        with self._lock:
+            if self._waechter is None:
+                self._waechter = lese_verbindung_oeffnen(self.db_pfad)
+            stand = bereichsstand(self._waechter, beginn, ende)
+        return stand if any(anzahl for anzahl, _, _ in stand) else None
+
+    def holen(self, schluessel, stand):
+        """
+        :param schluessel: Endpunkt + Query-Parameter.
+        :param stand: Aktueller Datenstand (datenstand() oder bereichsstand()).
+        :return: Die gespeicherte Antwort (bytes) oder None.
+        """
+        with self._lock:
+            eintrag = self._eintraege.get(schluessel)
+            if eintrag is not None and eintrag[0] == stand:
+                self._eintraege.move_to_end(schluessel)
+                self.treffer += 1
+                return eintrag[1]
+            if eintrag is not None:
+                del self._eintraege[schluessel]
+            self.fehlschlaege += 1
+            return None
+
+    def ablegen(self, schluessel, stand, daten):
+        """
+        :param schluessel: Endpunkt + Query-Parameter.
+        :param stand: Datenstand, zu dem die Antwort berechnet wurde.
+        :param daten: Die Antwort (bytes).
+        """
+        with self._lock:
+            self._eintraege[schluessel] = (stand, daten)
+            self._eintraege.move_to_end(schluessel)
+            while len(self._eintraege) > self.max_eintraege:
+                self._eintraege.popitem(last=False)
+                self.verdraengt += 1
+
+    def statistik(self):
+        with self._lock:
+            anfragen = self.treffer + self.fehlschlaege
+            return {
+                "eintraege": len(self._eintraege),
+                "maxEintraege": self.max_eintraege,
+                "treffer": self.treffer,
+                "fehlschlaege": self.fehlschlaege,
+                "verdraengt": self.verdraengt,
+                "trefferquote": round(self.treffer / anfragen, 3) if anfragen else None
+            }
+
+antwort_cache = AntwortCache(DB_PATH, max_eintraege=int(os.getenv("CACHE_EINTRAEGE", 256)))
+
+PROZESS_START = datetime.now().isoformat()  # data_version beginnt nach einem Neustart von vorn
+DAUERHAFT_MAX_AGE = int(os.getenv("DAUERHAFT_MAX_AGE", 30 * 24 * 3600))  # Sekunden
+
+def validatoren(schluessel, stand, dauerhaft):
+    """
+    Berechnet ETag und Last-Modified einer Antwort aus dem Datenstand, ohne die Antwort
+    selbst zu kennen. Dauerhafte Antworten behalten ihr ETag auch über Neustarts hinweg,
+    bis im Zeitraum Messwerte nachgetragen werden (der Fingerabdruck gehört zum ETag).
+    :param schluessel: Endpunkt + Query-Parameter.
+    :param stand: AntwortCache.datenstand() oder bei dauerhaften Antworten AntwortCache.bereichsstand().
+    :param dauerhaft: True für abgeschlossene Zeiträume.
+    :return: (etag, last_modified); last_modified ist ein datetime oder None.
+    """
+    quelle = repr((schluessel, stand, None if dauerhaft else PROZESS_START))
+    etag = hashlib.sha1(quelle.encode("utf-8")).hexdigest()[:20]
+    last_modified = None
+    if not dauerhaft and stand[3]:
+        try:
+            # Frühestens Mitternacht: um 0 Uhr ändern sich "heute"/"gestern" auch ohne neuen Messwert
+            mitternacht = datetime.combine(date.fromisoformat(stand[0]), datetime.min.time())
+            last_modified = max(datetime.fromisoformat(stand[3]).astimezone(timezone.utc),
+                                mitternacht.astimezone(timezone.utc))
+        except ValueError:
+            pass
+    return etag, last_modified
+
+def validatoren_setzen(antwort, etag, last_modified, dauerhaft):
+    """
+    Setzt ETag, Last-Modified und Cache-Control. Aktuelle Daten müssen immer neu geprüft
+    werden (no-cache, danach 304), abgeschlossene Tage dürfen Browser und Nginx lange behalten.
+    """
+    antwort.set_etag(etag)
+    if last_modified is not None:
+        antwort.last_modified = last_modified
+    if dauerhaft:
+        antwort.cache_control.public = True
+        antwort.cache_control.max_age = DAUERHAFT_MAX_AGE
+    else:
+        antwort.cache_control.no_cache = True
+    return antwort
+
+def zwischenspeichern(dauerhaft=None):
+    """
+    Dekorator für Endpunkte: beantwortet bedingte Anfragen (If-None-Match/If-Modified-Since)
+    mit 304, bevor eine Abfrage läuft, und liefert sonst die gespeicherte Antwort, solange
+    sich der Datenstand nicht geändert hat. Gespeichert werden nur erfolgreiche Antworten (Status 200).
+    :param dauerhaft: Optionale Funktion (request.args) -> (beginn, ende) oder None. Ein Zeitraum
+        bedeutet: die Antwort hängt nur von den Messwerten darin ab und ändert sich nicht mehr.
+        Dauerhaft gespeichert und gesendet wird sie nur, wenn der Zeitraum Messwerte hat.
+    """
+    def dekorator(funktion):
+        @wraps(funktion)
+        def wrapper(*args, **kwargs):
+            schluessel = (request.path, tuple(sorted(request.args.items(multi=True))))
+            try:
+                bereich = dauerhaft(request.args) if dauerhaft else None
+                stand = antwort_cache.bereichsstand(*bereich) if bereich else None
+                fest = stand is not None
+                if not fest:
+                    stand = antwort_cache.datenstand()
+            except Exception as e:
+                logger.warning("⚠️ Datenstand nicht lesbar, Cache umgangen: %s", str(e))
+                return funktion(*args, **kwargs)
+
+            etag, last_modified = validatoren(schluessel, stand, fest)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                logger.debug("♻️ Nicht geändert (304): %s", schluessel)
+                return validatoren_setzen(app.response_class(status=304), etag, last_modified, fest)
+
+            daten = antwort_cache.holen(schluessel, stand)
+            if daten is not None:
+                logger.debug("♻️ Antwort aus dem Cache: %s", schluessel)
+                antwort = app.response_class(daten, mimetype="application/json")
+                return validatoren_setzen(antwort, etag, last_modified, fest)
+
+            antwort = funktion(*args, **kwargs)
+            if not isinstance(antwort, tuple) and antwort.status_code == 200:
+                antwort_cache.ablegen(schluessel, stand, antwort.get_data())
+                validatoren_setzen(antwort, etag, last_modified, fest)
+            return antwort
+        return wrapper
+    return dekorator
+
+def abgeschlossener_tag(args):
+    """
+    :return: zeitgrenzen() von `datum`, wenn der Tag abgeschlossen ist (der Reader hat alle
+             Messwerte davon geschrieben, siehe abgeschlossen()), sonst None.
+    """
+    tag = datum_lesen(args.get('datum'))
+    if tag is None:
+        return None
+    bereich = zeitgrenzen(tag)
+    return bereich if abgeschlossen(bereich[1]) else None
+
 @app.route('/api/dashboard', methods=['GET'])
+@zwischenspeichern()
 def get_dashboard_data():
     logger.debug("📊 API-Aufruf: /api/dashboard")
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        # Momentanverbrauch
-        logger.debug("🔍 Abfrage: Momentanverbrauch")
-        leistung_row = cursor.execute("""
-            SELECT wirkleistung_watt, timestamp
-            FROM messwerte
-            ORDER BY timestamp DESC
+        heute = date.today()
+        heute_beginn, heute_ende = zeitgrenzen(heute)
+        gestern_beginn, _ = zeitgrenzen(heute - timedelta(days=1))
+
+        # Momentanverbrauch und Zählerstände aus dem letzten Messwert
+        # (die Zähler laufen nur vorwärts, der letzte Stand ist der höchste).
+        # Leistungen als REAL wie früher in messwerte (JSON 1234.0, nicht 1234)
+        logger.debug("🔍 Abfrage: Letzter Messwert")
+        letzte_row = cursor.execute("""
+            SELECT CAST(m.leistung_w AS REAL) AS leistung_w, m.ts, m.bezug_mwh / 1e6 AS bezug_kwh, m.einspeisung_mwh / 1e6 AS einspeisung_kwh
+            FROM zaehler z
+            JOIN messwerte_v2 m ON m.zaehler_id = z.id
+                AND m.ts = (SELECT MAX(ts) FROM messwerte_v2 WHERE zaehler_id = z.id)
+            ORDER BY m.ts DESC
             LIMIT 1
         """).fetchone()
-        leistung = leistung_row["wirkleistung_watt"] if leistung_row else 0
-        letzter_timestamp = leistung_row["timestamp"] if leistung_row else None
-
-        # Bezug gesamt
-        logger.debug("🔍 Abfrage: Bezug gesamt")
-        bezug_row = cursor.execute("""
-            SELECT MAX(bezug_kwh) as bezug
-            FROM messwerte
-        """).fetchone()
-        bezug = bezug_row["bezug"] if bezug_row and bezug_row["bezug"] is not None else 0
-
-        # Einspeisung gesamt
-        logger.debug("🔍 Abfrage: Einspeisung gesamt")
-        einspeisung_row = cursor.execute("""
-            SELECT MAX(einspeisung_kwh) as einspeisung
-            FROM messwerte
-        """).fetchone()
-        einspeisung = einspeisung_row["einspeisung"] if einspeisung_row and einspeisung_row["einspeisung"] is not None else 0
-
-        # Verbrauch heute
-        logger.debug("🔍 Abfrage: Verbrauch heute")
-        verbrauch_heute_row = cursor.execute("""
-            SELECT MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
-            FROM messwerte
-            WHERE DATE(timestamp) = DATE('now')
-        """).fetchone()
-        verbrauch_heute = verbrauch_heute_row["verbrauch"] if verbrauch_heute_row and verbrauch_heute_row["verbrauch"] is not None else 0
-
-        # Verbrauch gestern
-        logger.debug("🔍 Abfrage: Verbrauch gestern")
-        verbrauch_gestern_row = cursor.execute("""
-            SELECT MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
-            FROM messwerte
-            WHERE DATE(timestamp) = DATE('now', '-1 day')
-        """).fetchone()
-        verbrauch_gestern = verbrauch_gestern_row["verbrauch"] if verbrauch_gestern_row and verbrauch_gestern_row["verbrauch"] is not None else 0
+        leistung = letzte_row["leistung_w"] if letzte_row else 0
+        letzter_timestamp = zeitstempel(letzte_row["ts"]) if letzte_row else None
+        bezug = letzte_row["bezug_kwh"] if letzte_row and letzte_row["bezug_kwh"] is not None else 0
+        einspeisung = letzte_row["einspeisung_kwh"] if letzte_row and letzte_row["einspeisung_kwh"] is not None else 0
+
+        # Verbrauch und Leistung (Max, Min, Durchschnitt) für heute und gestern in einem Durchlauf
+        # über beide Tage; die Leistung kommt aus den Intervall-Aggregaten des Readers,
+        # ältere Zeilen haben nur wirkleistung_watt
+        logger.debug("🔍 Abfrage: Verbrauch und Leistung für heute und gestern")
+        tage = cursor.execute(f"""
+            SELECT
+                (MAX(CASE WHEN ts >= :heute THEN bezug_mwh END)
+                    - MIN(CASE WHEN ts >= :heute THEN bezug_mwh END)) / 1e6 as verbrauch_heute,
+                (MAX(CASE WHEN ts < :heute THEN bezug_mwh END)
+                    - MIN(CASE WHEN ts < :heute THEN bezug_mwh END)) / 1e6 as verbrauch_gestern,
+                CAST(MAX(CASE WHEN ts >= :heute THEN COALESCE(leistung_max_w, leistung_w) END) AS REAL) as max_heute,
+                CAST(MIN(CASE WHEN ts >= :heute THEN COALESCE(leistung_min_w, leistung_w) END) AS REAL) as min_heute,
+                AVG(CASE WHEN ts >= :heute THEN COALESCE(leistung_avg_w, leistung_w) END) as avg_heute,
+                CAST(MAX(CASE WHEN ts < :heute THEN COALESCE(leistung_max_w, leistung_w) END) AS REAL) as max_gestern,
+                CAST(MIN(CASE WHEN ts < :heute THEN COALESCE(leistung_min_w, leistung_w) END) AS REAL) as min_gestern,
+                AVG(CASE WHEN ts < :heute THEN COALESCE(leistung_avg_w, leistung_w) END) as avg_gestern
+            FROM messwerte_v2
+            WHERE {ALLE_ZAEHLER} AND ts >= :gestern AND ts < :morgen
+        """, {"gestern": gestern_beginn, "heute": heute_beginn, "morgen": heute_ende}).fetchone()
+
+        def wert(spalte):
+            return tage[spalte] if tage[spalte] is not None else 0
+
+        verbrauch_heute = wert("verbrauch_heute")
+        verbrauch_gestern = wert("verbrauch_gestern")
+        max_heute = wert("max_heute")
+        min_heute = wert("min_heute")
+        avg_heute = round(tage["avg_heute"], 2) if tage["avg_heute"] is not None else 0
+        max_gestern = wert("max_gestern")
+        min_gestern = wert("min_gestern")
+        avg_gestern = round(tage["avg_gestern"], 2) if tage["avg_gestern"] is not None else 0
 
         # Tendenz berechnen
         logger.debug("🔍 Abfrage: Tendenz")
@@ -102,37 +619,6 @@ def get_dashboard_data():
             tendenz = "unbekannt"  # Fallback für unerwartete Fälle
 
         logger.debug("🔍 Tendenz: %s", tendenz)
-        
-        
-        # Max, Min und Durchschnitt für heute
-        logger.debug("🔍 Abfrage: Max, Min und Durchschnitt für heute")
-        heute_stats = cursor.execute("""
-            SELECT 
-                MAX(wirkleistung_watt) as max_watt,
-                MIN(wirkleistung_watt) as min_watt,
-                AVG(wirkleistung_watt) as avg_watt
-            FROM messwerte
-            WHERE DATE(timestamp) = DATE('now')
-        """).fetchone()
-
-        max_heute = heute_stats["max_watt"] if heute_stats and heute_stats["max_watt"] is not None else 0
-        min_heute = heute_stats["min_watt"] if heute_stats and heute_stats["min_watt"] is not None else 0
-        avg_heute = round(heute_stats["avg_watt"], 2) if heute_stats and heute_stats["avg_watt"] is not None else 0
-
-        # Max, Min und Durchschnitt für gestern
-        logger.debug("🔍 Abfrage: Max, Min und Durchschnitt für gestern")
-        gestern_stats = cursor.execute("""
-            SELECT 
-                MAX(wirkleistung_watt) as max_watt,
-                MIN(wirkleistung_watt) as min_watt,
-                AVG(wirkleistung_watt) as avg_watt
-            FROM messwerte
-            WHERE DATE(timestamp) = DATE('now', '-1 day')
-        """).fetchone()
-
-        max_gestern = gestern_stats["max_watt"] if gestern_stats and gestern_stats["max_watt"] is not None else 0
-        min_gestern = gestern_stats["min_watt"] if gestern_stats and gestern_stats["min_watt"] is not None else 0
-        avg_gestern = round(gestern_stats["avg_watt"], 2) if gestern_stats and gestern_stats["avg_watt"] is not None else 0
 
         # Daten als JSON zurückgeben
         response = {
@@ -158,26 +644,24 @@ def get_dashboard_data():
         return jsonify({"error": "Fehler beim Abrufen der Daten"}), 500
 
     finally:
-        conn.close()
-        logger.debug("🔒 Verbindung zur SQLite-Datenbank geschlossen.")
+        release_db_connection(conn)
 
 @app.route('/api/tagesverlauf', methods=['GET'])
+@zwischenspeichern()
 def get_tagesverlauf():
     logger.debug("📊 API-Aufruf: /api/tagesverlauf")
+    try:
+        punkte, methode = punkte_lesen(request.args)
+    except ValueError as e:
+        logger.error("❌ %s", str(e))
+        return jsonify({"error": "Ungültiger Wert für points oder methode"}), 400
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        # Tagesverlauf-Daten abrufen
-        verlauf = cursor.execute("""
-            SELECT timestamp, wirkleistung_watt 
-            FROM messwerte 
-            WHERE DATE(timestamp) = DATE('now')
-            ORDER BY timestamp ASC
-        """).fetchall()
-
-        # Daten in ein JSON-kompatibles Format umwandeln
-        verlauf_data = [{"timestamp": row["timestamp"], "leistung": row["wirkleistung_watt"]} for row in verlauf]
+        # Tagesverlauf-Daten abrufen (optional ausgedünnt)
+        verlauf_data = verlauf_lesen(cursor, zeitgrenzen(date.today()), punkte, methode)
         logger.debug("📊 Tagesverlauf-Daten in Watt: %s", verlauf_data)
         return jsonify(verlauf_data)
 
@@ -186,16 +670,20 @@ def get_tagesverlauf():
         return jsonify({"error": "Fehler beim Abrufen des Tagesverlaufs"}), 500
 
     finally:
-        conn.close()
-        logger.debug("🔒 Verbindung zur SQLite-Datenbank geschlossen.")
+        release_db_connection(conn)
 
 @app.route('/api/wochenstatistik', methods=['GET'])
+@zwischenspeichern()
 def get_wochenstatistik():
     logger.debug("📊 API-Aufruf: /api/wochenstatistik")
     datum = request.args.get('datum')  # Startdatum aus den Query-Parametern abrufen
     if not datum:
         logger.error("❌ Kein Datum angegeben.")
         return jsonify({"error": "Kein Datum angegeben"}), 400
+    start = datum_lesen(datum)
+    if start is None:
+        logger.error("❌ Ungültiges Datum: %s", datum)
+        return jsonify({"error": "Ungültiges Datum"}), 400
 
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -204,13 +692,13 @@ def get_wochenstatistik():
         # Wochenstatistik-Daten abrufen (Startdatum + 6 Tage)
         logger.debug("🔍 Abfrage: Wochenstatistik ab %s", datum)
         statistik = cursor.execute("""
-            SELECT DATE(timestamp) as datum, 
-                   MAX(bezug_kwh) - MIN(bezug_kwh) as tagesverbrauch
-            FROM messwerte
-            WHERE DATE(timestamp) BETWEEN DATE(?) AND DATE(?, '+6 days')
-            GROUP BY DATE(timestamp)
+            SELECT zeitraum as datum,
+                   SUM(verbrauch_kwh) as tagesverbrauch
+            FROM tag
+            WHERE zeitraum >= ? AND zeitraum < ?
+            GROUP BY zeitraum
             ORDER BY datum ASC
-        """, (datum, datum)).fetchall()
+        """, tagesgrenzen(start, tage=7)).fetchall()
 
         # Daten in ein JSON-kompatibles Format umwandeln
         statistik_data = [{"datum": row["datum"], "verbrauch": row["tagesverbrauch"]} for row in statistik]
@@ -222,49 +710,51 @@ def get_wochenstatistik():
         return jsonify({"error": "Fehler beim Abrufen der Wochenstatistik"}), 500
 
     finally:
-        conn.close()
-        logger.debug("🔒 Verbindung zur SQLite-Datenbank geschlossen.")
+        release_db_connection(conn)
 
 @app.route('/api/tagesdaten', methods=['GET'])
+@zwischenspeichern(dauerhaft=abgeschlossener_tag)
 def get_tagesdaten():
     logger.debug("📊 API-Aufruf: /api/tagesdaten")
     datum = request.args.get('datum')  # Datum aus den Query-Parametern abrufen
     if not datum:
         logger.error("❌ Kein Datum angegeben.")
         return jsonify({"error": "Kein Datum angegeben"}), 400
+    tag = datum_lesen(datum)
+    if tag is None:
+        logger.error("❌ Ungültiges Datum: %s", datum)
+        return jsonify({"error": "Ungültiges Datum"}), 400
+    bereich = zeitgrenzen(tag)
+    try:
+        punkte, methode = punkte_lesen(request.args)
+    except ValueError as e:
+        logger.error("❌ %s", str(e))
+        return jsonify({"error": "Ungültiger Wert für points oder methode"}), 400
 
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        # Tagesverbrauch berechnen (max - min Bezug)
-        logger.debug("🔍 Abfrage: Tagesverbrauch für %s", datum)
-        verbrauch_row = cursor.execute("""
-            SELECT MAX(bezug_kwh) - MIN(bezug_kwh) AS verbrauch
-            FROM messwerte
-            WHERE DATE(timestamp) = ?
-        """, (datum,)).fetchone()
-        verbrauch = verbrauch_row["verbrauch"] if verbrauch_row and verbrauch_row["verbrauch"] is not None else 0
-
-        # Tagesendstand abrufen (max Bezug)
-        logger.debug("🔍 Abfrage: Tagesendstand für %s", datum)
-        endstand_row = cursor.execute("""
-            SELECT MAX(bezug_kwh) AS endstand
-            FROM messwerte
-            WHERE DATE(timestamp) = ?
-        """, (datum,)).fetchone()
-        endstand = endstand_row["endstand"] if endstand_row and endstand_row["endstand"] is not None else 0
+        # Tagesverbrauch (max - min Bezug) und Tagesendstand (max Bezug) in einem Durchlauf je Stufe;
+        # für die Zählerstände reichen Stundenwerte (sie reichen nie über eine Tagesgrenze)
+        logger.debug("🔍 Abfrage: Tagesverbrauch und Tagesendstand für %s", datum)
+        anfaenge, enden = [], []
+        for tabelle, beginn, ende in stufen_waehlen(stufen_grenzen(cursor), *bereich, aufloesung=3600):
+            _, anfang, ende_spalte = STUFEN[tabelle]
+            bezug_row = cursor.execute(f"""
+                SELECT MIN({anfang}), MAX({ende_spalte})
+                FROM {tabelle}
+                WHERE {ALLE_ZAEHLER} AND ts >= ? AND ts < ?
+            """, (beginn, ende)).fetchone()
+            if bezug_row[0] is not None:
+                anfaenge.append(bezug_row[0])
+                enden.append(bezug_row[1])
+        verbrauch = (max(enden) - min(anfaenge)) / 1e6 if anfaenge else 0
+        endstand = max(enden) / 1e6 if enden else 0
 
         # Tagesverlauf abrufen (Leistung über den Tag)
         logger.debug("🔍 Abfrage: Tagesverlauf für %s", datum)
-        verlauf = cursor.execute("""
-            SELECT timestamp, wirkleistung_watt
-            FROM messwerte
-            WHERE DATE(timestamp) = ?
-            ORDER BY timestamp ASC
-        """, (datum,)).fetchall()
-
-        verlauf_data = [{"timestamp": row["timestamp"], "leistung": row["wirkleistung_watt"]} for row in verlauf]
+        verlauf_data = verlauf_lesen(cursor, bereich, punkte, methode)
 
         # API-Antwort erstellen
         response = {
@@ -280,10 +770,10 @@ def get_tagesdaten():
         return jsonify({"error": "Fehler beim Abrufen der Tagesdaten"}), 500
 
     finally:
-        conn.close()
-        logger.debug("🔒 Verbindung zur SQLite-Datenbank geschlossen.")
+        release_db_connection(conn)
 
 @app.route('/api/monatsstatistik', methods=['GET'])
+@zwischenspeichern()
 def get_monatsstatistik():
     logger.debug("📊 API-Aufruf: /api/monatsstatistik")
     conn = get_db_connection()
@@ -292,14 +782,15 @@ def get_monatsstatistik():
     try:
         # Verbrauchsdaten der letzten 12 Monate berechnen
         logger.debug("🔍 Abfrage: Monatsstatistik der letzten 12 Monate")
+        heute = date.today()
         statistik = cursor.execute("""
-            SELECT strftime('%Y-%m', timestamp) as monat,
-                   MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
-            FROM messwerte
-            WHERE timestamp >= DATE('now', '-12 months')
-            GROUP BY strftime('%Y-%m', timestamp)
+            SELECT zeitraum as monat,
+                   SUM(verbrauch_kwh) as verbrauch
+            FROM monat
+            WHERE zeitraum >= ?
+            GROUP BY zeitraum
             ORDER BY monat ASC
-        """).fetchall()
+        """, (f"{heute.year - 1}-{heute.month:02d}",)).fetchall()
 
         # Daten in ein JSON-kompatibles Format umwandeln
         statistik_data = [{"monat": row["monat"], "verbrauch": row["verbrauch"]} for row in statistik]
@@ -311,10 +802,10 @@ def get_monatsstatistik():
         return jsonify({"error": "Fehler beim Abrufen der Monatsstatistik"}), 500
 
     finally:
-        conn.close()
-        logger.debug("🔒 Verbindung zur SQLite-Datenbank geschlossen.")
+        release_db_connection(conn)
 
 @app.route('/api/jahresstatistik', methods=['GET'])
+@zwischenspeichern()
 def get_jahresstatistik():
     logger.debug("📊 API-Aufruf: /api/jahresstatistik")
     conn = get_db_connection()
@@ -324,13 +815,13 @@ def get_jahresstatistik():
         # Verbrauchsdaten der letzten 5 Jahre berechnen
         logger.debug("🔍 Abfrage: Jahresstatistik der letzten 5 Jahre")
         statistik = cursor.execute("""
-            SELECT strftime('%Y', timestamp) as jahr,
-                   MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
-            FROM messwerte
-            WHERE timestamp >= DATE('now', '-5 years')
-            GROUP BY strftime('%Y', timestamp)
+            SELECT zeitraum as jahr,
+                   SUM(verbrauch_kwh) as verbrauch
+            FROM jahr
+            WHERE zeitraum >= ?
+            GROUP BY zeitraum
             ORDER BY jahr ASC
-        """).fetchall()
+        """, (str(date.today().year - 5),)).fetchall()
 
         # Daten in ein JSON-kompatibles Format umwandeln
         statistik_data = [{"jahr": row["jahr"], "verbrauch": row["verbrauch"]} for row in statistik]
@@ -342,10 +833,10 @@ def get_jahresstatistik():
         return jsonify({"error": "Fehler beim Abrufen der Jahresstatistik"}), 500
 
     finally:
-        conn.close()
-        logger.debug("🔒 Verbindung zur SQLite-Datenbank geschlossen.")
+        release_db_connection(conn)
         
 @app.route('/api/verfuegbare-tage', methods=['GET'])
+@zwischenspeichern()
 def get_verfuegbare_tage():
     logger.debug("📊 API-Aufruf: /api/verfuegbare-tage")
     conn = get_db_connection()
@@ -355,8 +846,8 @@ def get_verfuegbare_tage():
         # Abrufen der Tage, für die Messwerte vorhanden sind
         logger.debug("🔍 Abfrage: Verfügbare Tage mit Messwerten")
         tage = cursor.execute("""
-            SELECT DISTINCT DATE(timestamp) as datum
-            FROM messwerte
+            SELECT DISTINCT zeitraum as datum
+            FROM tag
             ORDER BY datum ASC
         """).fetchall()
 
@@ -370,23 +861,27 @@ def get_verfuegbare_tage():
         return jsonify({"error": "Fehler beim Abrufen der verfügbaren Tage"}), 500
 
     finally:
-        conn.close()
-        logger.debug("🔒 Verbindung zur SQLite-Datenbank geschlossen.")
+        release_db_connection(conn)
 
 @app.route('/api/statistik', methods=['GET'])
+@zwischenspeichern()
 def get_statistik():
     logger.debug("📊 API-Aufruf: /api/statistik")
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
+        heute = date.today().isoformat()
+
+        # Alle Abfragen laufen über die verdichteten Tabellen tag und monat
+        # (eine Zeile pro Zähler und Tag bzw. Monat, vom Reader laufend aktualisiert)
+
         # Tag mit höchstem Verbrauch
         logger.debug("🔍 Abfrage: Tag mit höchstem Verbrauch")
         max_tag_row = cursor.execute("""
-            SELECT DATE(timestamp) as datum, 
-                   MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
-            FROM messwerte
-            GROUP BY DATE(timestamp)
+            SELECT zeitraum as datum, SUM(verbrauch_kwh) as verbrauch
+            FROM tag
+            GROUP BY zeitraum
             ORDER BY verbrauch DESC
             LIMIT 1
         """).fetchone()
@@ -395,14 +890,13 @@ def get_statistik():
         # Tag mit niedrigstem Verbrauch
         logger.debug("🔍 Abfrage: Tag mit niedrigstem Verbrauch")
         min_tag_row = cursor.execute("""
-            SELECT DATE(timestamp) as datum, 
-                MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
-            FROM messwerte
-            WHERE DATE(timestamp) != DATE('now')  -- Aktuellen Tag ausschließen
-            GROUP BY DATE(timestamp)
+            SELECT zeitraum as datum, SUM(verbrauch_kwh) as verbrauch
+            FROM tag
+            WHERE zeitraum != ?  -- Aktuellen Tag ausschließen
+            GROUP BY zeitraum
             ORDER BY verbrauch ASC
             LIMIT 1
-        """).fetchone()
+        """, (heute,)).fetchone()
         min_tag = {"datum": min_tag_row["datum"], "verbrauch": min_tag_row["verbrauch"]} if min_tag_row else None
 
         # Durchschnittlicher täglicher Verbrauch
@@ -410,21 +904,20 @@ def get_statistik():
         avg_tag_row = cursor.execute("""
             SELECT AVG(tagesverbrauch) as avg_verbrauch
             FROM (
-                SELECT MAX(bezug_kwh) - MIN(bezug_kwh) as tagesverbrauch
-                FROM messwerte
-                WHERE DATE(timestamp) != DATE('now')  -- Aktuellen Tag ausschließen
-                GROUP BY DATE(timestamp)
+                SELECT SUM(verbrauch_kwh) as tagesverbrauch
+                FROM tag
+                WHERE zeitraum != ?  -- Aktuellen Tag ausschließen
+                GROUP BY zeitraum
             )
-        """).fetchone()
+        """, (heute,)).fetchone()
         avg_tag = avg_tag_row["avg_verbrauch"] if avg_tag_row else 0
 
         # Monat mit höchstem Verbrauch
         logger.debug("🔍 Abfrage: Monat mit höchstem Verbrauch")
         max_monat_row = cursor.execute("""
-            SELECT strftime('%Y-%m', timestamp) as monat, 
-                   MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
-            FROM messwerte
-            GROUP BY strftime('%Y-%m', timestamp)
+            SELECT zeitraum as monat, SUM(verbrauch_kwh) as verbrauch
+            FROM monat
+            GROUP BY zeitraum
             ORDER BY verbrauch DESC
             LIMIT 1
         """).fetchone()
@@ -433,10 +926,9 @@ def get_statistik():
         # Monat mit niedrigstem Verbrauch
         logger.debug("🔍 Abfrage: Monat mit niedrigstem Verbrauch")
         min_monat_row = cursor.execute("""
-            SELECT strftime('%Y-%m', timestamp) as monat, 
-                   MAX(bezug_kwh) - MIN(bezug_kwh) as verbrauch
-            FROM messwerte
-            GROUP BY strftime('%Y-%m', timestamp)
+            SELECT zeitraum as monat, SUM(verbrauch_kwh) as verbrauch
+            FROM monat
+            GROUP BY zeitraum
             ORDER BY verbrauch ASC
             LIMIT 1
         """).fetchone()
@@ -447,9 +939,9 @@ def get_statistik():
         avg_monat_row = cursor.execute("""
             SELECT AVG(monatsverbrauch) as avg_verbrauch
             FROM (
-                SELECT MAX(bezug_kwh) - MIN(bezug_kwh) as monatsverbrauch
-                FROM messwerte
-                GROUP BY strftime('%Y-%m', timestamp)
+                SELECT SUM(verbrauch_kwh) as monatsverbrauch
+                FROM monat
+                GROUP BY zeitraum
             )
         """).fetchone()
         avg_monat = avg_monat_row["avg_verbrauch"] if avg_monat_row else 0
@@ -470,9 +962,298 @@ def get_statistik():
         logger.error("❌ Fehler beim Abrufen der Statistik: %s", str(e))
         return jsonify({"error": "Fehler beim Abrufen der Statistik"}), 500
 
+    finally:
+        release_db_connection(conn)
+
+EXPORT_SPALTEN = ("zaehler", "timestamp", "bezug_kwh", "einspeisung_kwh", "wirkleistung_watt",
+                  "wirkleistung_min", "wirkleistung_max", "wirkleistung_avg", "anzahl_telegramme")
+EXPORT_FORMATE = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+EXPORT_BLOCK = int(os.getenv("EXPORT_BLOCK", 1000))  # Zeilen pro fetchmany()
+
+def zeitpunkt_lesen(text):
+    """
+    Wandelt die Query-Parameter `from`/`to` (YYYY-MM-DD oder ISO-Zeitpunkt) in einen
+    ISO-String um (ohne Zeitzone = lokale Zeit).
+    :param text: Der Parameter (None = offen).
+    :return: ISO-String oder None.
+    :raises ValueError: Bei ungültigen Werten.
+    """
+    if text is None:
+        return None
+    tag = datum_lesen(text)
+    if tag is not None:
+        return tag.isoformat()
+    return datetime.fromisoformat(text).isoformat()
+
+# Exportspalten je Stufe; Minuten- und Stundenwerte mit Zählerstand am Ende und mittlerer Leistung
+EXPORT_WERTE = {
+    "messwerte_v2": "bezug_mwh / 1e6, einspeisung_mwh / 1e6, leistung_w, leistung_min_w, leistung_max_w, "
+                    "leistung_avg_w, anzahl_telegramme",
+    "messwerte_minute": f"bezug_ende_mwh / 1e6, einspeisung_ende_mwh / 1e6, {MITTELWERT}, leistung_min_w, "
+                        f"leistung_max_w, {MITTELWERT}, anzahl_telegramme",
+}
+EXPORT_WERTE["messwerte_stunde"] = EXPORT_WERTE["messwerte_minute"]
+
+def export_zeilen(db_pfad, beginn, ende, dateiformat, grenzen=None):
+    """
+    Liest die Messwerte des Zeitraums blockweise (fetchmany) über eine eigene
+    Nur-Lese-Verbindung und liefert sie als fertig kodierte Blöcke, Zähler für Zähler
+    in der Reihenfolge des Primärschlüssels (ohne Sortieren). Der Speicherbedarf
+    hängt nur von EXPORT_BLOCK ab, nicht von der Länge des Zeitraums. Die Verbindung
+    kommt nicht aus dem Pool, damit langsame Downloads keine Anfragen blockieren.
+    Verdichtete Zeiträume kommen aus der feinsten vorhandenen Stufe (siehe stufen_waehlen()).
+    :param db_pfad: Pfad zur SQLite-Datenbank.
+    :param beginn: ISO-String oder None (inklusive).
+    :param ende: ISO-String oder None (exklusive).
+    :param dateiformat: `csv` oder `ndjson`.
+    :param grenzen: (roh, minute) von stufen_grenzen() oder None (selbst lesen).
+    :return: Generator über bytes.
+    """
+    von = sekunden(datetime.fromisoformat(beginn)) if beginn is not None else 0
+    bis = sekunden(datetime.fromisoformat(ende)) if ende is not None else 2 ** 62
+
+    conn = lese_verbindung_oeffnen(db_pfad)
+    try:
+        teile = stufen_waehlen(grenzen or stufen_grenzen(conn), von, bis)
+        zaehler = conn.execute("SELECT id, seriennummer FROM zaehler ORDER BY id").fetchall()
+
+        def bloecke():
+            # Je Zähler und Stufe eine Suche im Primärschlüssel, die Stufen liegen zeitlich hintereinander
+            for zaehler_id, seriennummer in zaehler:
+                for tabelle, teil_von, teil_bis in teile:
+                    cursor = conn.execute(f"""
+                        SELECT ?, {ZEITSTEMPEL}, {EXPORT_WERTE[tabelle]}
+                        FROM {tabelle}
+                        WHERE zaehler_id = ? AND ts >= ? AND ts < ?
+                        ORDER BY ts ASC
+                    """, (seriennummer, zaehler_id, teil_von, teil_bis))
+                    while True:
+                        zeilen = cursor.fetchmany(EXPORT_BLOCK)
+                        if not zeilen:
+                            break
+                        yield zeilen
+
+        puffer = io.StringIO()
+        schreiber = csv.writer(puffer, lineterminator="\n")
+        if dateiformat == "csv":
+            schreiber.writerow(EXPORT_SPALTEN)
+        for zeilen in bloecke():
+            if dateiformat == "csv":
+                schreiber.writerows(zeilen)
+            else:
+                for zeile in zeilen:
+                    puffer.write(json.dumps(dict(zip(EXPORT_SPALTEN, zeile)), ensure_ascii=False))
+                    puffer.write("\n")
+            yield puffer.getvalue().encode("utf-8")
+            puffer.seek(0)
+            puffer.truncate()
+        if dateiformat == "csv" and puffer.tell():
+            yield puffer.getvalue().encode("utf-8")  # nur die Kopfzeile (keine Messwerte)
     finally:
         conn.close()
-        logger.debug("🔒 Verbindung zur SQLite-Datenbank geschlossen.")
+
+def bytes_ausschneiden(bloecke, start, stopp):
+    """
+    Liefert aus einem Strom von Blöcken nur die Bytes [start, stopp).
+    :param bloecke: Iterator über bytes.
+    :param start: Erstes Byte.
+    :param stopp: Erstes Byte nach dem Ausschnitt.
+    :return: Generator über bytes.
+    """
+    position = 0
+    try:
+        for block in bloecke:
+            block_ende = position + len(block)
+            if block_ende > start:
+                yield block[max(start - position, 0):stopp - position]
+            position = block_ende
+            if position >= stopp:
+                break
+    finally:
+        bloecke.close()  # Verbindung sofort schließen, auch bei Abbruch durch den Client
+
+@app.route('/api/export', methods=['GET'])
+def get_export():
+    logger.debug("📊 API-Aufruf: /api/export")
+    dateiformat = request.args.get('format', 'csv')
+    if dateiformat not in EXPORT_FORMATE:
+        logger.error("❌ Ungültiges Format: %s", dateiformat)
+        return jsonify({"error": "Ungültiges Format (csv oder ndjson)"}), 400
+    try:
+        beginn = zeitpunkt_lesen(request.args.get('from'))
+        ende = zeitpunkt_lesen(request.args.get('to'))
+    except ValueError:
+        logger.error("❌ Ungültiger Zeitraum: %s - %s", request.args.get('from'), request.args.get('to'))
+        return jsonify({"error": "Ungültiger Zeitraum"}), 400
+
+    dateiname = "strom_%s_%s.%s" % ((beginn or "anfang")[:10], (ende or "jetzt")[:10], dateiformat)
+    kopfzeilen = {"Content-Disposition": f'attachment; filename="{dateiname}"'}
+
+    # Offener Zeitraum (bis jetzt oder vom Reader noch nicht vollständig geschrieben):
+    # nur streamen, Länge unbekannt
+    if ende is None or not abgeschlossen(sekunden(datetime.fromisoformat(ende))):
+        return Response(export_zeilen(DB_PATH, beginn, ende, dateiformat),
+                        mimetype=EXPORT_FORMATE[dateiformat], headers=kopfzeilen)
+
+    # Abgeschlossener Zeitraum: die Länge wird einmal durch einen Durchlauf ermittelt und
+    # gemerkt; damit sind Content-Length und Range-Anfragen (Fortsetzen abgebrochener
+    # Downloads) möglich. Sie gilt nur, solange sich die Messwerte im Zeitraum nicht ändern:
+    # Nachtragen (data-migration) und Verdichten (reader/aufbewahrung.py) ändern den
+    # Fingerabdruck des Zeitraums bzw. die Grenzen, die gemerkte Länge wird dann verworfen.
+    conn = get_db_connection()
+    try:
+        grenzen = stufen_grenzen(conn)
+        stand = (grenzen, bereichsstand(conn, sekunden(datetime.fromisoformat(beginn)) if beginn else 0,
+                                        sekunden(datetime.fromisoformat(ende))))
+    finally:
+        release_db_connection(conn)
+    schluessel = ("export-laenge", beginn, ende, dateiformat)
+    laenge = antwort_cache.holen(schluessel, stand)
+    if laenge is None:
+        try:
+            laenge = sum(len(block) for block in export_zeilen(DB_PATH, beginn, ende, dateiformat, grenzen))
+        except Exception as e:
+            logger.error("❌ Fehler beim Export: %s", str(e))
+            return jsonify({"error": "Fehler beim Export"}), 500
+        antwort_cache.ablegen(schluessel, stand, laenge)
+
+    kopfzeilen["Accept-Ranges"] = "bytes"
+    bereich = request.range.range_for_length(laenge) if request.range else None
+    if request.range and bereich is None:
+        kopfzeilen["Content-Range"] = f"bytes */{laenge}"
+        return Response(status=416, headers=kopfzeilen)
+    start, stopp = bereich or (0, laenge)
+    if bereich:
+        kopfzeilen["Content-Range"] = f"bytes {start}-{stopp - 1}/{laenge}"
+    kopfzeilen["Content-Length"] = str(stopp - start)
+    return Response(bytes_ausschneiden(export_zeilen(DB_PATH, beginn, ende, dateiformat, grenzen), start, stopp),
+                    status=206 if bereich else 200, mimetype=EXPORT_FORMATE[dateiformat], headers=kopfzeilen)
+
+LIVE_FELDER = ("id", "zaehlerId", "timestamp", "leistung", "bezug", "einspeisung")
+LIVE_ABFRAGE = f"""
+    SELECT ts, zaehler_id, {ZEITSTEMPEL}, leistung_w, bezug_mwh / 1e6, einspeisung_mwh / 1e6
+    FROM messwerte_v2
+    WHERE zaehler_id = ? {{bedingung}}
+"""
+
+class LiveVerteiler:
+    """
+    Verteilt neue Messwerte an alle verbundenen Live-Clients (/api/live). Ein einziger
+    Wächter-Thread fragt alle `intervall` Sekunden je Zähler mit `ts > letzter_ts` nach
+    neuen Zeilen (Suche über den Primärschlüssel), die Datenbanklast hängt also nicht von
+    der Anzahl der Clients ab. Der Thread läuft nur, solange Clients verbunden sind.
+    :param db_pfad: Pfad zur SQLite-Datenbank.
+    :param intervall: Sekunden zwischen zwei Abfragen.
+    :param max_wartend: Maximale Anzahl nicht abgeholter Messwerte je Client (älteste werden verworfen).
+    """
+    def __init__(self, db_pfad, intervall=1.0, max_wartend=100):
+        self.db_pfad = db_pfad
+        self.intervall = intervall
+        self.max_wartend = max_wartend
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.letzter = None  # zuletzt verteilter Messwert (für neue Clients)
+
+    def abonnieren(self):
+        """
+        :return: queue.Queue, in die ab jetzt alle neuen Messwerte gestellt werden.
+        """
+        client = queue.Queue(maxsize=self.max_wartend)
+        with self._lock:
+            self._clients.add(client)
+            if self.letzter is not None:
+                client.put_nowait(self.letzter)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._beobachten, name="live", daemon=True)
+                self._thread.start()
+        logger.debug("📡 Live-Client verbunden (%d).", len(self._clients))
+        return client
+
+    def abmelden(self, client):
+        with self._lock:
+            self._clients.discard(client)
+        logger.debug("📡 Live-Client getrennt (%d).", len(self._clients))
+
+    def _verteilen(self, messwert):
+        with self._lock:
+            self.letzter = messwert
+            for client in self._clients:
+                while True:
+                    try:
+                        client.put_nowait(messwert)
+                        break
+                    except queue.Full:
+                        # Client liest nicht schnell genug -> ältesten Messwert verwerfen
+                        try:
+                            client.get_nowait()
+                        except queue.Empty:
+                            pass
+
+    def _beobachten(self):
+        conn = None
+        staende = {}  # zaehler_id -> ts des zuletzt verteilten Messwerts
+        try:
+            while True:
+                with self._lock:
+                    if not self._clients:
+                        self._thread = None
+                        self.letzter = None
+                        return
+                try:
+                    if conn is None:
+                        conn = lese_verbindung_oeffnen(self.db_pfad)
+                    for (zaehler_id,) in conn.execute("SELECT id FROM zaehler").fetchall():
+                        if zaehler_id not in staende:
+                            # Neuer Zähler bzw. beim Start: nur der letzte Messwert
+                            zeilen = conn.execute(LIVE_ABFRAGE.format(bedingung="ORDER BY ts DESC LIMIT 1"),
+                                                  (zaehler_id,)).fetchall()
+                            staende[zaehler_id] = None
+                        else:
+                            zeilen = conn.execute(LIVE_ABFRAGE.format(bedingung="AND ts > ? ORDER BY ts ASC LIMIT 100"),
+                                                  (zaehler_id, staende[zaehler_id] or 0)).fetchall()
+                        for row in zeilen:
+                            staende[zaehler_id] = row[0]
+                            self._verteilen(dict(zip(LIVE_FELDER, row)))
+                except Exception as e:
+                    logger.error("❌ Fehler im Live-Wächter: %s", str(e))
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+                time.sleep(self.intervall)
+        finally:
+            if conn is not None:
+                conn.close()
+
+live_verteiler = LiveVerteiler(DB_PATH, intervall=float(os.getenv("LIVE_INTERVALL", 1)))
+LIVE_PING = float(os.getenv("LIVE_PING", 15))  # Sekunden ohne Daten bis zum Keep-Alive-Kommentar
+
+@app.route('/api/live', methods=['GET'])
+def get_live():
+    logger.debug("📊 API-Aufruf: /api/live")
+
+    def ereignisse():
+        client = live_verteiler.abonnieren()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    messwert = client.get(timeout=LIVE_PING)
+                except queue.Empty:
+                    # Hält Proxy-Verbindungen offen und erkennt getrennte Clients
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {messwert['id']}\ndata: {json.dumps(messwert)}\n\n"
+        finally:
+            live_verteiler.abmelden(client)
+
+    return Response(ereignisse(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/cache', methods=['GET'])
+def get_cache_statistik():
+    logger.debug("📊 API-Aufruf: /api/cache")
+    return jsonify(antwort_cache.statistik())
 
 if __name__ == '__main__':
     logger.debug("🚀 Starte Flask-Server auf Port 5000...")
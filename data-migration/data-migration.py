@@ -1,97 +1,344 @@
-import json
+import hashlib
+import os
 import sqlite3
+import time
+from collections import deque
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import logging
-import glob
+from historie import historie_dateien, historie_lesen
+import rollup
+import speicher
+
+# Zeitpunkte ohne Zeitzone (epoch()) und die tag/monat/jahr-Grenzen ('localtime') gelten in lokaler
+# Zeit; wie beim Reader Europe/Berlin, sonst liefe das Image in UTC und alle ts wären verschoben
+os.environ.setdefault("TZ", "Europe/Berlin")
+time.tzset()
 
 # === Konfiguration ===
 DB_PATH = Path("/app/data/strom.sqlite")
 HISTORY_PATH = Path("/app/data/history")
 LOG_PATH = Path("/app/data/sqlite_debug.log")
 ZAEHLER_ID = 1
+PROZESSE = int(os.getenv("MIGRATION_PROZESSE", os.cpu_count() or 1))  # Prozesse zum Einlesen der Dateien
+BLOCK = int(os.getenv("MIGRATION_BLOCK", 50000))  # Zeilen pro executemany()
+CHECKPOINT = int(os.getenv("MIGRATION_CHECKPOINT", 1000000))  # Zeilen pro Transaktion (Wiederaufsetzpunkt)
 
-# === Verzeichnisse anlegen ===
-LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-# === Logging einrichten ===
-logging.basicConfig(
-    filename=LOG_PATH,
-    level=logging.DEBUG,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+# Bereits vorhandene Messwerte (gleicher Zähler und Zeitpunkt, Primärschlüssel) werden übersprungen
+INSERT = """
+    INSERT OR IGNORE INTO messwerte_v2 (zaehler_id, ts, bezug_mwh, einspeisung_mwh, leistung_w)
+    VALUES (?, ?, ?, ?, ?)
+"""
 
-file_handler = logging.FileHandler(LOG_PATH)
-file_handler.setLevel(logging.DEBUG)
+SCHEMA = [
+    # Manifest: eine Zeile pro übernommener Historie-Datei
+    """
+    CREATE TABLE IF NOT EXISTS migration_dateien (
+        datei TEXT PRIMARY KEY,
+        groesse INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        eintraege INTEGER NOT NULL,
+        importiert TEXT NOT NULL,
+        von INTEGER,
+        bis INTEGER,
+        verdichtet INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+]
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
+MANIFEST_SPEICHERN = """
+    INSERT INTO migration_dateien (datei, groesse, mtime_ns, sha256, eintraege, importiert, von, bis, verdichtet)
+    VALUES (?, ?, ?, ?, ?, datetime('now'), ?, ?, ? IS NULL)
+    ON CONFLICT (datei) DO UPDATE SET
+        groesse = excluded.groesse, mtime_ns = excluded.mtime_ns, sha256 = excluded.sha256,
+        eintraege = excluded.eintraege, importiert = excluded.importiert,
+        von = excluded.von, bis = excluded.bis, verdichtet = excluded.verdichtet
+"""
 
 logger = logging.getLogger("data-migration")
-logger.setLevel(logging.DEBUG)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
-
-# === Verbindung zur SQLite-Datenbank herstellen ===
-try:
-    conn = sqlite3.connect(DB_PATH)
-    conn.set_trace_callback(lambda stmt: logger.debug("🟢 SQL: %s", stmt))
-    cursor = conn.cursor()
-except Exception as e:
-    logger.critical("❌ Fehler beim Verbinden mit der Datenbank: %s", str(e))
-    raise SystemExit(1)
-
-# === Alle JSON-Dateien im Ordner `history` abarbeiten ===
-json_files = glob.glob(str(HISTORY_PATH / "*.json"))
-logger.info("📂 Gefundene JSON-Dateien: %s", json_files)
-
-gesamtanzahl = 0
-
-for json_file in json_files:
-    logger.info("📄 Verarbeite Datei: %s", json_file)
-    try:
-        # JSON-Datei laden
-        with open(json_file, "r", encoding="utf-8") as f:
-            daten = json.load(f)
 
-        # Datensätze einfügen
-        anzahl = 0
-        for i, eintrag in enumerate(daten):
-            try:
-                timestamp = eintrag["timestamp"].replace("Z", "")
-                bezug = float(eintrag["bezug"])
-                einspeisung = float(eintrag["einspeisung"])
-                leistung = int(eintrag["leistung"])
 
-                # logger.info("🔁 Eintrag [%d]: %s", i, timestamp)
-                logger.debug("⚙️ Werte → Bezug: %.4f, Einspeisung: %.4f, Leistung: %d", bezug, einspeisung, leistung)
+def logging_einrichten():
+    """Debug-Log in LOG_PATH, Infos zusätzlich auf der Konsole."""
+    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        filename=LOG_PATH,
+        level=logging.DEBUG,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+    file_handler = logging.FileHandler(LOG_PATH)
+    file_handler.setLevel(logging.DEBUG)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
 
-                cursor.execute("""
-                    INSERT INTO messwerte (zaehler_id, timestamp, bezug_kwh, einspeisung_kwh, wirkleistung_watt)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (ZAEHLER_ID, timestamp, bezug, einspeisung, leistung))
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
 
-                anzahl += 1
-                logger.debug("✅ Gespeichert [%d]: %s", anzahl, timestamp)
 
+def pruefsumme(pfad):
+    """
+    :return: SHA-256 des Dateiinhalts (hex).
+    """
+    summe = hashlib.sha256()
+    with open(pfad, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            summe.update(block)
+    return summe.hexdigest()
+
+
+def datei_lesen(pfad, bekannte_summe=None):
+    """
+    Liest eine Historie-Datei und wandelt die Einträge in Zeilen für INSERT um.
+    Läuft in einem eigenen Prozess; ungültige Einträge werden nur gezählt.
+    :param pfad: Historie-Datei (*.json oder *.jsonl).
+    :param bekannte_summe: SHA-256 aus dem Manifest; ist der Inhalt gleich, wird nichts gelesen.
+    :return: (summe, zeilen, fehlerhaft, erster_fehler); zeilen ist None, wenn der Inhalt unverändert ist.
+    """
+    summe = pruefsumme(pfad)
+    if summe == bekannte_summe:
+        return summe, None, 0, None
+    zeilen = []
+    fehlerhaft = 0
+    erster_fehler = None
+    try:
+        for i, eintrag in enumerate(historie_lesen(pfad)):
+            try:
+                # Das "Z" der Historie wurde schon immer entfernt (Zeitpunkt gilt als lokale Zeit),
+                # sonst würden bereits übernommene Messwerte ein zweites Mal eingefügt
+                zeilen.append((
+                    ZAEHLER_ID,
+                    speicher.epoch(eintrag["timestamp"].replace("Z", "")),
+                    speicher.ganzzahl(float(eintrag["bezug"]), 1000000),
+                    speicher.ganzzahl(float(eintrag["einspeisung"]), 1000000),
+                    speicher.ganzzahl(float(eintrag["leistung"])),
+                ))
             except Exception as e:
-                logger.error("❌ Fehler beim Einfügen [%d] (%s): %s", i, timestamp, str(e))
+                fehlerhaft += 1
+                if erster_fehler is None:
+                    erster_fehler = f"Eintrag [{i}]: {e!r}"
+    except Exception as e:
+        # Datei nicht lesbar oder abgebrochen: die Einträge bis dahin werden übernommen
+        fehlerhaft += 1
+        erster_fehler = erster_fehler or f"Datei: {e!r}"
+    return summe, zeilen, fehlerhaft, erster_fehler
+
+
+def dateien_einlesen(auftraege, prozesse):
+    """
+    Liest die Dateien parallel in einem Prozess-Pool. Es sind höchstens 2 * prozesse
+    Dateien gleichzeitig unterwegs, damit der Speicherbedarf begrenzt bleibt, wenn
+    das Einfügen langsamer ist als das Einlesen.
+    :param auftraege: Liste von (pfad, stat, bekannte_summe).
+    :return: Generator über (pfad, stat, summe, zeilen, fehlerhaft, erster_fehler) in der Reihenfolge der Dateien.
+    """
+    with ProcessPoolExecutor(max_workers=prozesse) as pool:
+        unterwegs = deque()
+        auftraege = iter(auftraege)
+        for pfad, stat, summe in auftraege:
+            unterwegs.append((pfad, stat, pool.submit(datei_lesen, pfad, summe)))
+            if len(unterwegs) >= 2 * prozesse:
+                break
+        while unterwegs:
+            pfad, stat, zukunft = unterwegs.popleft()
+            naechster = next(auftraege, None)
+            if naechster is not None:
+                n_pfad, n_stat, n_summe = naechster
+                unterwegs.append((n_pfad, n_stat, pool.submit(datei_lesen, n_pfad, n_summe)))
+            yield (pfad, stat, *zukunft.result())
+
+
+def schema_anlegen(conn):
+    """
+    Legt messwerte_v2, den Zähler ZAEHLER_ID und das Manifest an. Doppelte Messwerte
+    verhindert der Primärschlüssel (zaehler_id, ts) von messwerte_v2.
+    """
+    if speicher.schema_anlegen(conn):
+        logger.warning("⚠️ Alte Tabelle messwerte vorhanden, übernommen wird nach messwerte_v2. "
+                       "Bitte migration_v2.py ausführen.")
+    rollup.schema_anlegen(conn)
+    conn.execute("INSERT OR IGNORE INTO zaehler (id) VALUES (?)", (ZAEHLER_ID,))
+    for sql in SCHEMA:
+        conn.execute(sql)
+    # Manifest früherer Versionen: von/bis als ISO-Text (lokale Zeit)
+    conn.execute("""
+        UPDATE migration_dateien
+        SET von = CAST(strftime('%s', von, 'utc') AS INTEGER), bis = CAST(strftime('%s', bis, 'utc') AS INTEGER)
+        WHERE von LIKE '____-__-__%'
+    """)
+
+
+def manifest_pruefen(conn, dateien):
+    """
+    Vergleicht die Dateien mit dem Manifest. Stimmen Größe und Änderungszeit überein,
+    wird die Datei ohne Lesen übersprungen.
+    :return: (auftraege, unveraendert); auftraege ist eine Liste von (pfad, stat, bekannte_summe).
+    """
+    bekannt = {datei: (groesse, mtime_ns, summe) for datei, groesse, mtime_ns, summe
+               in conn.execute("SELECT datei, groesse, mtime_ns, sha256 FROM migration_dateien")}
+    auftraege = []
+    unveraendert = 0
+    for pfad in dateien:
+        stat = pfad.stat()
+        eintrag = bekannt.get(pfad.name)
+        if eintrag and eintrag[:2] == (stat.st_size, stat.st_mtime_ns):
+            unveraendert += 1
+        else:
+            auftraege.append((pfad, stat, eintrag[2] if eintrag else None))
+    return auftraege, unveraendert
+
+
+class Ergebnis:
+    """Zähler eines Migrationslaufs."""
+    def __init__(self):
+        self.dateien = 0
+        self.beruehrt = 0    # Änderungszeit neu, Inhalt gleich
+        self.gelesen = 0     # Einträge in den gelesenen Dateien
+        self.eingefuegt = 0  # davon neu in messwerte_v2
+        self.verdichtet = 0  # davon vor der Grenze der Rohdaten (aufbewahrung.py), übersprungen
+
+
+def migrieren(conn, auftraege, prozesse=PROZESSE, block=BLOCK, checkpoint=CHECKPOINT):
+    """
+    Übernimmt die Dateien mit INSERT OR IGNORE und trägt jede Datei ins Manifest ein,
+    in derselben Transaktion wie ihre Messwerte. Nach `checkpoint` Zeilen wird
+    committet; bricht der Lauf ab, setzt der nächste nach der letzten übernommenen
+    Datei wieder auf. messwerte_v2 hat außer dem Primärschlüssel keine Indizes, die
+    beim Einfügen mitgepflegt werden müssten. Einträge vor der Grenze der Rohdaten sind
+    bereits in messwerte_minute/messwerte_stunde verdichtet und werden übersprungen
+    (sonst würden sie dort ein zweites Mal eingerechnet).
+    :param auftraege: Liste von (pfad, stat, bekannte_summe) aus manifest_pruefen().
+    :return: Ergebnis
+    """
+    ergebnis = Ergebnis()
+    wartend = []
+    seit_commit = 0
+    grenze = rollup.grenze(conn, "roh")
+
+    def schreiben():
+        if wartend:
+            if grenze is not None:
+                anzahl = len(wartend)
+                wartend[:] = [zeile for zeile in wartend if zeile[1] >= grenze]
+                ergebnis.verdichtet += anzahl - len(wartend)
+            vorher = conn.total_changes
+            conn.executemany(INSERT, wartend)
+            ergebnis.eingefuegt += conn.total_changes - vorher
+            wartend.clear()
 
-        gesamtanzahl += anzahl
-        logger.info("📄 Datei abgeschlossen: %s (%d Einträge)", json_file, anzahl)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for pfad, stat, summe, zeilen, fehlerhaft, erster_fehler in dateien_einlesen(auftraege, prozesse):
+            ergebnis.dateien += 1
+            if zeilen is None:
+                ergebnis.beruehrt += 1
+                conn.execute("UPDATE migration_dateien SET groesse = ?, mtime_ns = ? WHERE datei = ?",
+                             (stat.st_size, stat.st_mtime_ns, pfad.name))
+                logger.info("📄 %s: Inhalt unverändert", pfad.name)
+                continue
+
+            wartend.extend(zeilen)
+            if len(wartend) >= block:
+                schreiben()
+            von = min(z[1] for z in zeilen) if zeilen else None
+            bis = max(z[1] for z in zeilen) if zeilen else None
+            conn.execute(MANIFEST_SPEICHERN, (pfad.name, stat.st_size, stat.st_mtime_ns, summe, len(zeilen),
+                                              von, bis, von))
+            ergebnis.gelesen += len(zeilen)
+            if fehlerhaft:
+                logger.warning("⚠️ %s: %d Einträge, %d fehlerhaft (erster: %s)",
+                               pfad.name, len(zeilen), fehlerhaft, erster_fehler)
+            else:
+                logger.info("📄 %s: %d Einträge", pfad.name, len(zeilen))
+
+            seit_commit += len(zeilen)
+            if seit_commit >= checkpoint:
+                schreiben()
+                conn.execute("COMMIT")
+                conn.execute("BEGIN IMMEDIATE")
+                seit_commit = 0
+                logger.info("💾 Zwischenstand gespeichert: %d von %d Dateien", ergebnis.dateien, len(auftraege))
+
+        schreiben()
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return ergebnis
+
+
+def verdichten(conn):
+    """
+    Berechnet tag/monat/jahr für den Zeitraum aller übernommenen, noch nicht verdichteten
+    Dateien neu (auch die eines abgebrochenen früheren Laufs) und markiert sie im Manifest.
+    """
+    rollup.schema_anlegen(conn)
+    von, bis = conn.execute("""
+        SELECT MIN(CAST(von AS INTEGER)), MAX(CAST(bis AS INTEGER)) FROM migration_dateien WHERE NOT verdichtet
+    """).fetchone()
+    if von is None:
+        return
+    rollup.bereich_neu_aufbauen(conn, von, bis)
+    conn.execute("UPDATE migration_dateien SET verdichtet = 1 WHERE NOT verdichtet")
+    logger.info("🧮 Tabellen tag/monat/jahr von %s bis %s aktualisiert",
+                datetime.fromtimestamp(von).date(), datetime.fromtimestamp(bis).date())
+
+
+def main():
+    logging_einrichten()
+
+    # === Verbindung zur SQLite-Datenbank herstellen ===
+    try:
+        conn = sqlite3.connect(DB_PATH, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA cache_size=-65536")  # 64 MB für das Einfügen in den Primärschlüssel
+    except Exception as e:
+        logger.critical("❌ Fehler beim Verbinden mit der Datenbank: %s", str(e))
+        raise SystemExit(1)
 
+    # === Tabellen und Manifest anlegen ===
+    try:
+        schema_anlegen(conn)
+    except Exception as e:
+        logger.critical("❌ Fehler beim Anlegen von Tabellen/Manifest: %s", str(e))
+        conn.close()
+        raise SystemExit(1)
+
+    # === Neue und geänderte Historie-Dateien im Ordner `history` abarbeiten (*.json und *.jsonl) ===
+    start = time.perf_counter()
+    auftraege, unveraendert = manifest_pruefen(conn, historie_dateien(HISTORY_PATH))
+    logger.info("📂 %d Historie-Dateien unverändert, %d neu oder geändert, %d Prozesse zum Einlesen",
+                unveraendert, len(auftraege), PROZESSE)
+
+    try:
+        ergebnis = migrieren(conn, auftraege)
     except Exception as e:
-        logger.error("❌ Fehler beim Verarbeiten der Datei %s: %s", json_file, str(e))
-
-# === Abschluss ===
-try:
-    conn.commit()
-    logger.info("💾 Änderungen gespeichert (%d Einträge insgesamt)", gesamtanzahl)
-except Exception as e:
-    logger.error("❌ Commit-Fehler: %s", str(e))
-finally:
-    conn.close()
-    logger.info("🔒 Verbindung zur Datenbank geschlossen.")
-
-print(f"✅ Fertig. {gesamtanzahl} Messwerte erfolgreich in die Datenbank übernommen.")
\ No newline at end of file
+        logger.critical("❌ Migration abgebrochen, übernommen bis zum letzten Zwischenstand: %s", str(e))
+        conn.close()
+        raise SystemExit(1)
+    dauer = time.perf_counter() - start
+    logger.info("💾 Änderungen gespeichert (%d Einträge gelesen, %d neu, %d bereits vorhanden, "
+                "%d bereits verdichtet)", ergebnis.gelesen, ergebnis.eingefuegt,
+                ergebnis.gelesen - ergebnis.eingefuegt - ergebnis.verdichtet, ergebnis.verdichtet)
+
+    # === Verdichtete Tabellen (tag/monat/jahr) der betroffenen Zeiträume neu berechnen ===
+    try:
+        verdichten(conn)
+    except Exception as e:
+        logger.error("❌ Fehler beim Aufbau von tag/monat/jahr: %s", str(e))
+    finally:
+        conn.close()
+        logger.info("🔒 Verbindung zur Datenbank geschlossen.")
+
+    print(f"✅ Fertig. {ergebnis.eingefuegt} neue Messwerte aus {ergebnis.dateien} Dateien "
+          f"({unveraendert} unverändert übersprungen) in {dauer:.1f} s "
+          f"({ergebnis.gelesen / dauer if dauer else 0:.0f} Zeilen/s).")
+
+
+if __name__ == "__main__":
+    main()
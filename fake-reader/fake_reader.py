@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# Fake-Reader: virtueller serieller Port (pty), auf den synthetische SML-Telegramme eines
+# EMH-Zählers geschrieben werden (OBIS-Codes wie in strom_reader.py, gültige CRC).
+# Optional mit Störungen: Rauschen zwischen den Telegrammen, abgeschnittene Telegramme,
+# CRC-Fehler. Damit lässt sich strom_reader.py ohne Zähler testen und sein Durchsatz messen.
+#
+#   python3 fake-reader/fake_reader.py --link /tmp/ttyFAKE --rate 1
+#   PORT=/tmp/ttyFAKE DATA_PATH=/tmp/strom python3 reader/strom_reader.py
+import argparse
+import fcntl
+import logging
+import os
+import pty
+import random
+import signal
+import struct
+import termios
+import time
+import tty
+
+from sml_beispiel import SERVER_ID, server_id, telegramm
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+
+
+class Zaehlerwerte:
+    """
+    Simulierter Zähler: Wirkleistung als Zufallsbewegung, die Zählerstände laufen
+    pro Telegramm um eine Zählersekunde weiter (unabhängig von der Senderate).
+    :param zufall: random.Random
+    :param geraet: Geräte-ID im Telegramm (siehe sml_beispiel.server_id()).
+    """
+    def __init__(self, zufall, geraet=SERVER_ID):
+        self.zufall = zufall
+        self.geraet = geraet
+        self.sekunde = 0
+        self.bezug = 123456780     # 0,1 Wh
+        self.einspeisung = 2345670  # 0,1 Wh
+        self.leistung = 400         # W, negativ = Einspeisung
+
+    def naechstes(self):
+        """
+        :return: Das nächste gültige Telegramm (bytes).
+        """
+        self.sekunde += 1
+        self.leistung = max(-3000, min(8000, self.leistung + self.zufall.randint(-50, 50)))
+        if self.zufall.random() < 0.01:
+            self.leistung += self.zufall.choice((-1500, 1500, 2500))  # Verbraucher an/aus
+        if self.leistung >= 0:
+            self.bezug += round(self.leistung * 10 / 3600)
+        else:
+            self.einspeisung += round(-self.leistung * 10 / 3600)
+        return telegramm(self.bezug, self.einspeisung, self.leistung, self.sekunde, self.geraet)
+
+
+class Stoerungen:
+    """
+    Verändert Telegramme zufällig. Die Wahrscheinlichkeiten gelten pro Telegramm.
+    :param zufall: random.Random
+    :param rauschen: Zufällige Bytes vor dem Telegramm.
+    :param abgeschnitten: Telegramm bricht mittendrin ab.
+    :param crc_fehler: Ein Byte im Telegramm ist verfälscht.
+    """
+    def __init__(self, zufall, rauschen=0.0, abgeschnitten=0.0, crc_fehler=0.0):
+        self.zufall = zufall
+        self.rauschen = rauschen
+        self.abgeschnitten = abgeschnitten
+        self.crc_fehler = crc_fehler
+        self.anzahl = {"rauschen": 0, "abgeschnitten": 0, "crc_fehler": 0}
+
+    def anwenden(self, daten):
+        """
+        :param daten: Ein gültiges Telegramm.
+        :return: Die zu sendenden Bytes.
+        """
+        zufall = self.zufall
+        if zufall.random() < self.crc_fehler:
+            daten = bytearray(daten)
+            position = zufall.randrange(8, len(daten) - 2)  # nach dem Start-Escape, vor der CRC
+            daten[position] ^= 1 << zufall.randrange(8)
+            daten = bytes(daten)
+            self.anzahl["crc_fehler"] += 1
+        if zufall.random() < self.abgeschnitten:
+            daten = daten[:zufall.randrange(8, len(daten) - 1)]
+            self.anzahl["abgeschnitten"] += 1
+        if zufall.random() < self.rauschen:
+            daten = zufall.randbytes(zufall.randint(1, 64)) + daten
+            self.anzahl["rauschen"] += 1
+        return daten
+
+
+def pty_oeffnen(link=None):
+    """
+    Öffnet ein pty-Paar im Raw-Modus (keine Zeilenumwandlung, 0x0d/0x03 usw. bleiben erhalten).
+    :param link: Optionaler Pfad für einen symbolischen Link auf die Slave-Seite.
+    :return: (master_fd, slave_fd, slave_name)
+    """
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    name = os.ttyname(slave)
+    if link:
+        if os.path.islink(link):
+            os.unlink(link)
+        os.symlink(name, link)
+    return master, slave, name
+
+
+def alles_schreiben(fd, daten):
+    """Schreibt alle Bytes; blockiert, solange der Leser den pty-Puffer nicht leert."""
+    ansicht = memoryview(daten)
+    while ansicht:
+        ansicht = ansicht[os.write(fd, ansicht):]
+
+
+def ungelesen(slave):
+    """
+    :return: Anzahl Bytes, die der Leser noch nicht abgeholt hat.
+    """
+    return struct.unpack("i", fcntl.ioctl(slave, termios.TIOCINQ, b"\0\0\0\0"))[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetische SML-Telegramme auf einen virtuellen seriellen Port")
+    parser.add_argument("--link", help="symbolischer Link auf den Port, z. B. /tmp/ttyFAKE")
+    parser.add_argument("--rate", type=float, default=1.0, help="Telegramme pro Sekunde, 0 = so schnell wie gelesen wird")
+    parser.add_argument("--anzahl", type=int, default=0, help="nach so vielen Telegrammen aufhören, 0 = endlos")
+    parser.add_argument("--rauschen", type=float, default=0.0, help="Wahrscheinlichkeit für Rauschen vor einem Telegramm")
+    parser.add_argument("--abgeschnitten", type=float, default=0.0, help="Wahrscheinlichkeit für ein abgeschnittenes Telegramm")
+    parser.add_argument("--crc-fehler", type=float, default=0.0, help="Wahrscheinlichkeit für ein verfälschtes Byte")
+    parser.add_argument("--seed", type=int, default=1, help="Startwert des Zufallsgenerators (reproduzierbar)")
+    parser.add_argument("--seriennummer", type=lambda text: int(text, 0),
+                        help="Seriennummer des simulierten Zählers, z. B. 0x123457 (für mehrere Fake-Reader)")
+    parser.add_argument("--warten", action="store_true", help="erst senden, wenn Enter gedrückt wurde (Reader vorher starten)")
+    parser.add_argument("--statistik", type=float, default=10, help="Sekunden zwischen zwei Statistik-Ausgaben")
+    args = parser.parse_args()
+
+    zufall = random.Random(args.seed)
+    zaehler = Zaehlerwerte(zufall, server_id(args.seriennummer) if args.seriennummer is not None else SERVER_ID)
+    stoerungen = Stoerungen(zufall, args.rauschen, args.abgeschnitten, args.crc_fehler)
+    master, slave, name = pty_oeffnen(args.link)
+    logging.info("🔌 Virtueller Port: %s%s", name, f" (Link: {args.link})" if args.link else "")
+
+    beenden = []
+    signal.signal(signal.SIGTERM, lambda *_: beenden.append(True))
+    if args.warten:
+        input("Reader mit PORT=%s starten, dann Enter drücken ... " % (args.link or name))
+
+    gesendet = 0
+    bytes_gesendet = 0
+    start = time.monotonic()
+    naechstes = start
+    letzte_statistik = start
+    cpu_start = time.process_time()
+    try:
+        while not beenden and (not args.anzahl or gesendet < args.anzahl):
+            if args.rate > 0:
+                naechstes += 1 / args.rate
+                pause = naechstes - time.monotonic()
+                if pause > 0:
+                    time.sleep(pause)
+            daten = stoerungen.anwenden(zaehler.naechstes())
+            alles_schreiben(master, daten)
+            gesendet += 1
+            bytes_gesendet += len(daten)
+
+            jetzt = time.monotonic()
+            if jetzt - letzte_statistik >= args.statistik:
+                letzte_statistik = jetzt
+                logging.info("📤 %d Telegramme (%.0f/s), %d Bytes, Störungen: %s",
+                             gesendet, gesendet / (jetzt - start), bytes_gesendet, stoerungen.anzahl)
+
+        # Warten, bis der Reader alles abgeholt hat: die Zeit bis dahin ergibt seinen Durchsatz
+        while not beenden and ungelesen(slave):
+            time.sleep(0.01)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dauer = time.monotonic() - start
+        logging.info("🏁 %d Telegramme in %.1f s (%.0f/s), %d Bytes, Störungen: %s, eigene CPU %.1f s",
+                     gesendet, dauer, gesendet / dauer if dauer else 0, bytes_gesendet, stoerungen.anzahl,
+                     time.process_time() - cpu_start)
+        if args.link and os.path.islink(args.link):
+            os.unlink(args.link)
+        os.close(master)
+        os.close(slave)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# Erzeugt synthetische SML-Telegramme im Aufbau eines EMH-Zählers (ED300L),
+# passend zu den OBIS-Codes und Offsets aus strom_reader.py.
+
+START = b"\x1b\x1b\x1b\x1b\x01\x01\x01\x01"
+ESCAPE = b"\x1b\x1b\x1b\x1b"
+
+_CRC_TABELLE = []
+for _i in range(256):
+    _crc = _i
+    for _ in range(8):
+        _crc = (_crc >> 1) ^ 0x8408 if _crc & 1 else _crc >> 1
+    _CRC_TABELLE.append(_crc)
+
+
+def crc16_x25(daten):
+    """
+    CRC-16/X-25 wie im SML-Transportprotokoll (entspricht crcmod.mkCrcFun(0x11021, initCrc=0, xorOut=0xFFFF, rev=True)).
+    :param daten: Die Bytes.
+    :return: Die Prüfsumme (int).
+    """
+    crc = 0xFFFF
+    for b in daten:
+        crc = (crc >> 8) ^ _CRC_TABELLE[(crc ^ b) & 0xFF]
+    return crc ^ 0xFFFF
+
+
+def octet(wert):
+    """Octet-String mit TL-Feld."""
+    return bytes([len(wert) + 1]) + wert
+
+
+def unsigned(wert, laenge):
+    """Unsigned mit TL-Feld."""
+    return bytes([0x60 | (laenge + 1)]) + wert.to_bytes(laenge, "big")
+
+
+def signed(wert, laenge):
+    """Integer mit TL-Feld."""
+    return bytes([0x50 | (laenge + 1)]) + wert.to_bytes(laenge, "big", signed=True)
+
+
+def liste(*elemente):
+    """Liste mit TL-Feld."""
+    return bytes([0x70 | len(elemente)]) + b"".join(elemente)
+
+
+LEER = b"\x01"
+SERVER_ID = b"\x0a\x01EMH\x00\x00\x12\x34\x56"
+
+
+def nachricht(transaktion, tag, koerper):
+    """
+    Baut eine SML-Nachricht inkl. Nachrichten-CRC.
+    :param transaktion: Transaktions-ID (Bytes).
+    :param tag: Nachrichtentyp (z. B. 0x0701 für GetList.Res).
+    :param koerper: Der bereits kodierte Nachrichtenkörper.
+    """
+    inhalt = (b"\x76" + octet(transaktion) + unsigned(0, 1) + unsigned(0, 1)
+              + liste(unsigned(tag, 2), koerper))
+    return inhalt + unsigned(crc16_x25(inhalt), 2) + b"\x00"
+
+
+def server_id(seriennummer):
+    """
+    :param seriennummer: Seriennummer als Zahl (5 Bytes).
+    :return: Geräte-ID im Aufbau von SERVER_ID, z. B. für mehrere simulierte Zähler.
+    """
+    return SERVER_ID[:5] + seriennummer.to_bytes(5, "big")
+
+
+def telegramm(bezug_wh=12345678, einspeisung_wh=2345678, leistung_w=512, sekunde=0, geraet=SERVER_ID):
+    """
+    Baut ein vollständiges SML-Telegramm (Start-Escape bis CRC).
+    :param bezug_wh: Zählerstand Bezug in 0,1 Wh.
+    :param einspeisung_wh: Zählerstand Einspeisung in 0,1 Wh.
+    :param leistung_w: Wirkleistung in W.
+    :param sekunde: Sekundenindex des Zählers (ändert sich pro Telegramm).
+    :param geraet: Geräte-ID (10 Bytes, siehe server_id()).
+    :return: Das Telegramm als Bytes.
+    """
+    zeit = liste(unsigned(1, 1), unsigned(sekunde & 0xFFFFFFFF, 4))
+    eintraege = [
+        # Hersteller (1-0:96.50.1*1)
+        liste(octet(b"\x01\x00\x60\x32\x01\x01"), LEER, LEER, LEER, LEER, octet(b"EMH"), LEER),
+        # Geräte-ID (1-0:96.1.0*255)
+        liste(octet(b"\x01\x00\x60\x01\x00\xff"), LEER, LEER, LEER, LEER, octet(geraet), LEER),
+        # Bezug gesamt (1-0:1.8.0*255)
+        liste(octet(b"\x01\x00\x01\x08\x00\xff"), unsigned(0x1c0104, 4), liste(unsigned(1, 1), unsigned(sekunde & 0xFFFFFF, 3)),
+              unsigned(0x1e, 1), signed(-1, 1), signed(bezug_wh, 8), LEER),
+        # Einspeisung gesamt (1-0:2.8.0*255)
+        liste(octet(b"\x01\x00\x02\x08\x00\xff"), LEER, zeit, unsigned(0x1e, 1), signed(-1, 1), signed(einspeisung_wh, 8), LEER),
+        # Wirkleistung (1-0:16.7.0*255)
+        liste(octet(b"\x01\x00\x10\x07\x00\xff"), LEER, zeit, unsigned(0x1b, 1), signed(0, 1), signed(leistung_w, 4), LEER),
+    ]
+    transaktion = sekunde.to_bytes(4, "big")
+    daten = START
+    daten += nachricht(transaktion + b"\x01", 0x0101,
+                       liste(LEER, LEER, octet(transaktion), octet(geraet), LEER, LEER))
+    daten += nachricht(transaktion + b"\x02", 0x0701,
+                       liste(LEER, octet(geraet), octet(b"\x01\x00\x62\x0a\xff\xff"), zeit,
+                             liste(*eintraege), LEER, LEER))
+    daten += nachricht(transaktion + b"\x03", 0x0201, liste(LEER))
+    fuell = (4 - len(daten) % 4) % 4
+    daten += b"\x00" * fuell + ESCAPE + b"\x1a" + bytes([fuell])
+    return daten + crc16_x25(daten).to_bytes(2, "little")
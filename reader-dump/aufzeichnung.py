@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# Aufnahmeformat für die Rohdaten vom seriellen Port (reader-raw-dump.py).
+#
+#   Kopf:  Kennung "SMLRAW\r\n", Version, Baudrate, Startzeit (Unix), Startzeit (time.monotonic_ns),
+#          Länge und Name des Ports (UTF-8)
+#   Block: Zeitpunkt (time.monotonic_ns), Länge, Rohdaten; beliebig viele hintereinander
+#
+# Alle Zahlen little-endian. Die Uhrzeit eines Blocks ist Startzeit + (Zeitpunkt - Startzeit monotonic),
+# sie springt also nicht, wenn die Systemuhr gestellt wird (NTP). Jede Stunde beginnt eine neue Datei
+# strom_raw_JJJJMMTT_HH.sml (komprimiert: .sml.gz) mit eigenem Kopf. Daneben liegt der Index
+# <datei>.idx: pro Minute die Minute (Unix) und die Byte-Position des ersten Blocks dieser Minute.
+# In komprimierten Dateien ist es die Position in der gzip-Datei; dort wird der Datenstrom jede
+# Minute vollständig geleert (Z_FULL_FLUSH), sodass das Entpacken an dieser Stelle beginnen kann.
+#
+#   python3 aufzeichnung.py info data/dump/strom_raw_*.sml*
+#   python3 aufzeichnung.py hex data/dump/strom_raw_20261018_14.sml --von "2026-10-18 14:05" --bis "2026-10-18 14:06"
+#   python3 aufzeichnung.py roh data/dump/strom_raw_20261018_*.sml.gz > roh.bin
+import argparse
+import bisect
+import gzip
+import os
+import struct
+import sys
+import time
+import zlib
+from contextlib import ExitStack
+from datetime import datetime
+
+KENNUNG = b"SMLRAW\r\n"
+VERSION = 1
+KOPF = struct.Struct("<8sBIdqH")  # Kennung, Version, Baudrate, Startzeit, Startzeit monotonic (ns), Länge Port
+BLOCK = struct.Struct("<qI")      # Zeitpunkt monotonic (ns), Länge
+INDEX = struct.Struct("<qQ")      # Minute (Unix), Byte-Position
+
+
+class Kopf:
+    """
+    Kopf einer Aufnahmedatei.
+    :param port: Name des seriellen Ports.
+    :param baudrate: Baudrate.
+    :param startzeit: Unix-Zeit beim Öffnen der Datei.
+    :param start_ns: time.monotonic_ns() zum selben Zeitpunkt.
+    """
+    def __init__(self, port, baudrate, startzeit, start_ns):
+        self.port = port
+        self.baudrate = baudrate
+        self.startzeit = startzeit
+        self.start_ns = start_ns
+
+    def zeit(self, zeitpunkt_ns):
+        """
+        :param zeitpunkt_ns: Zeitpunkt eines Blocks (time.monotonic_ns).
+        :return: Unix-Zeit des Blocks.
+        """
+        return self.startzeit + (zeitpunkt_ns - self.start_ns) / 1e9
+
+    def packen(self):
+        port = self.port.encode("utf-8")
+        return KOPF.pack(KENNUNG, VERSION, self.baudrate, self.startzeit, self.start_ns, len(port)) + port
+
+
+def kopf_lesen(strom):
+    """
+    :param strom: Datei (bzw. entpackter Strom) am Dateianfang.
+    :return: Kopf
+    :raises ValueError: Wenn die Datei keine Aufnahme in diesem Format ist.
+    """
+    daten = strom.read(KOPF.size)
+    if len(daten) < KOPF.size or not daten.startswith(KENNUNG):
+        raise ValueError("keine Aufnahme (Kennung fehlt)")
+    _, version, baudrate, startzeit, start_ns, laenge = KOPF.unpack(daten)
+    if version != VERSION:
+        raise ValueError(f"unbekannte Version {version}")
+    return Kopf(strom.read(laenge).decode("utf-8"), baudrate, startzeit, start_ns)
+
+
+class Aufzeichner:
+    """
+    Schreibt Blöcke gepuffert in stündliche Aufnahmedateien samt Minutenindex.
+    Auf die Karte geschrieben wird erst, wenn der Puffer voll ist, bei leeren() und beim
+    Wechsel der Minute (nur komprimiert); bei einem Absturz fehlen höchstens die Blöcke seit
+    dem letzten leeren(), ein angefangener Block am Dateiende wird beim Lesen ignoriert.
+    :param verzeichnis: Zielverzeichnis (wird angelegt).
+    :param port: Name des seriellen Ports (für den Kopf).
+    :param baudrate: Baudrate (für den Kopf).
+    :param komprimieren: gzip-Dateien (.sml.gz) schreiben.
+    :param puffer: Größe des Schreibpuffers in Bytes.
+    """
+    def __init__(self, verzeichnis, port, baudrate, komprimieren=False, puffer=65536):
+        self.verzeichnis = verzeichnis
+        self.port = port
+        self.baudrate = baudrate
+        self.komprimieren = komprimieren
+        self.puffer = puffer
+        os.makedirs(verzeichnis, exist_ok=True)
+        self.pfad = None
+        self.kopf = None
+        self._datei = None   # Datei auf der Karte
+        self._strom = None   # _datei oder gzip darüber
+        self._index = None
+        self._stunde = None
+        self._minute = None
+        # Zähler für das Log
+        self.dateien = 0
+        self.bloecke = 0
+        self.bytes = 0
+
+    def _dateiname(self, stunde):
+        """
+        :return: Freier Pfad für die Stunde; nach einem Neustart innerhalb der Stunde mit Nummer.
+        """
+        endung = ".sml.gz" if self.komprimieren else ".sml"
+        name = f"strom_raw_{stunde:%Y%m%d_%H}"
+        pfad = os.path.join(self.verzeichnis, name + endung)
+        nummer = 1
+        while os.path.exists(pfad):
+            nummer += 1
+            pfad = os.path.join(self.verzeichnis, f"{name}-{nummer}{endung}")
+        return pfad
+
+    def _oeffnen(self, zeitpunkt_ns):
+        startzeit = time.time() - (time.monotonic_ns() - zeitpunkt_ns) / 1e9
+        self._stunde = datetime.fromtimestamp(startzeit).replace(minute=0, second=0, microsecond=0)
+        self.pfad = self._dateiname(self._stunde)
+        self.kopf = Kopf(self.port, self.baudrate, startzeit, zeitpunkt_ns)
+        self._datei = open(self.pfad, "wb", buffering=self.puffer)
+        self._strom = gzip.GzipFile(fileobj=self._datei, mode="wb", filename="") if self.komprimieren else self._datei
+        self._index = open(self.pfad + ".idx", "wb")
+        self._strom.write(self.kopf.packen())
+        self._minute = None
+        self.dateien += 1
+
+    def _schliessen(self):
+        if self._strom is not self._datei:
+            self._strom.close()  # schreibt das Ende der gzip-Datei, _datei bleibt offen
+        self._datei.close()
+        self._index.close()
+        self._datei = self._strom = self._index = None
+
+    def schreiben(self, daten, zeitpunkt_ns=None):
+        """
+        Hängt einen Block an, beginnt bei Bedarf eine neue Datei (Stunde) bzw. einen neuen Indexeintrag (Minute).
+        :param daten: Rohdaten, wie vom Port gelesen.
+        :param zeitpunkt_ns: Empfangszeitpunkt (time.monotonic_ns), Standard: jetzt.
+        """
+        zeitpunkt_ns = time.monotonic_ns() if zeitpunkt_ns is None else zeitpunkt_ns
+        if self._datei is None:
+            self._oeffnen(zeitpunkt_ns)
+        zeit = self.kopf.zeit(zeitpunkt_ns)
+        if datetime.fromtimestamp(zeit).replace(minute=0, second=0, microsecond=0) != self._stunde:
+            self._schliessen()
+            self._oeffnen(zeitpunkt_ns)
+            zeit = self.kopf.startzeit
+        minute = int(zeit) // 60 * 60
+        if minute != self._minute:
+            if self._strom is not self._datei:
+                self._strom.flush(zlib.Z_FULL_FLUSH)
+            self._index.write(INDEX.pack(minute, self._datei.tell()))
+            self._minute = minute
+        self._strom.write(BLOCK.pack(zeitpunkt_ns, len(daten)))
+        self._strom.write(daten)
+        self.bloecke += 1
+        self.bytes += len(daten)
+
+    def leeren(self):
+        """
+        Schreibt den Puffer in die Datei (ohne fsync). Komprimiert ist danach alles bis hier entpackbar.
+        """
+        if self._datei is not None:
+            self._strom.flush()
+            self._datei.flush()
+            self._index.flush()
+
+    def schliessen(self):
+        if self._datei is not None:
+            self._schliessen()
+
+
+class _Entpacken:
+    """
+    Entpackt eine gzip-Aufnahme ab einer Stelle mit Z_FULL_FLUSH (Position aus dem Index).
+    Liest nur, was gebraucht wird; ein abgeschnittenes Dateiende ist kein Fehler.
+    :param datei: Binär geöffnete Datei, auf die Position gesetzt.
+    """
+    def __init__(self, datei):
+        self.datei = datei
+        self.entpacker = zlib.decompressobj(-zlib.MAX_WBITS)  # roher Deflate-Strom ohne gzip-Kopf
+        self.puffer = bytearray()
+
+    def read(self, anzahl):
+        while len(self.puffer) < anzahl and not self.entpacker.eof:
+            gepackt = self.datei.read(65536)
+            if not gepackt:
+                break
+            self.puffer += self.entpacker.decompress(gepackt)
+        daten = bytes(self.puffer[:anzahl])
+        del self.puffer[:anzahl]
+        return daten
+
+
+def index_lesen(pfad):
+    """
+    :param pfad: Aufnahmedatei (ohne .idx).
+    :return: Liste (Minute, Byte-Position), leer ohne Index.
+    """
+    try:
+        with open(pfad + ".idx", "rb") as f:
+            daten = f.read()
+    except FileNotFoundError:
+        return []
+    return list(INDEX.iter_unpack(daten[:len(daten) - len(daten) % INDEX.size]))
+
+
+def bloecke_lesen(pfad, von=None, bis=None):
+    """
+    Liest die Blöcke einer Aufnahmedatei. Mit `von` wird über den Index direkt zur Minute gesprungen.
+    :param pfad: Aufnahmedatei (.sml oder .sml.gz).
+    :param von: Unix-Zeit, ältere Blöcke werden übersprungen.
+    :param bis: Unix-Zeit, ab hier wird aufgehört.
+    :return: Generator über (Unix-Zeit, Zeitpunkt monotonic in ns, Rohdaten).
+    """
+    komprimiert = pfad.endswith(".gz")
+    with ExitStack() as stapel:
+        strom = stapel.enter_context(gzip.open(pfad, "rb") if komprimiert else open(pfad, "rb"))
+        kopf = kopf_lesen(strom)
+        index = index_lesen(pfad)
+        stelle = bisect.bisect_right(index, (von, float("inf"))) - 1 if von is not None else -1
+        if stelle >= 0:
+            if komprimiert:
+                datei = stapel.enter_context(open(pfad, "rb"))
+                datei.seek(index[stelle][1])
+                strom = _Entpacken(datei)
+            else:
+                strom.seek(index[stelle][1])
+        while True:
+            try:
+                daten = strom.read(BLOCK.size)
+                if len(daten) < BLOCK.size:
+                    return
+                zeitpunkt_ns, laenge = BLOCK.unpack(daten)
+                daten = strom.read(laenge)
+            except EOFError:  # gzip ohne Ende (Absturz): bis hier lesen
+                return
+            if len(daten) < laenge:
+                return
+            zeit = kopf.zeit(zeitpunkt_ns)
+            if von is not None and zeit < von:
+                continue
+            if bis is not None and zeit >= bis:
+                return
+            yield zeit, zeitpunkt_ns, daten
+
+
+def zeitpunkt(text):
+    """:return: Unix-Zeit aus "JJJJ-MM-TT HH:MM[:SS]" (Ortszeit)."""
+    return datetime.fromisoformat(text).timestamp()
+
+
+def info(pfade, von, bis, ausgabe):
+    for pfad in pfade:
+        with gzip.open(pfad, "rb") if pfad.endswith(".gz") else open(pfad, "rb") as f:
+            kopf = kopf_lesen(f)
+        anzahl, groesse, erster, letzter = 0, 0, None, None
+        for zeit, _, daten in bloecke_lesen(pfad, von, bis):
+            anzahl += 1
+            groesse += len(daten)
+            erster = zeit if erster is None else erster
+            letzter = zeit
+        datei = os.path.getsize(pfad)
+        print(f"{pfad}: {kopf.port} @ {kopf.baudrate} Baud, {anzahl} Blöcke, {groesse} Bytes Rohdaten, "
+              f"{datei} Bytes Datei ({datei / max(groesse, 1) * 100:.0f} %), {len(index_lesen(pfad))} Minuten im Index",
+              file=ausgabe)
+        if erster is not None:
+            print(f"  {datetime.fromtimestamp(erster)} bis {datetime.fromtimestamp(letzter)}", file=ausgabe)
+
+
+def hex_ausgeben(pfade, von, bis, ausgabe):
+    for pfad in pfade:
+        for zeit, _, daten in bloecke_lesen(pfad, von, bis):
+            print(f"{datetime.fromtimestamp(zeit):%Y-%m-%d %H:%M:%S.%f} {len(daten):5d} {daten.hex()}", file=ausgabe)
+
+
+def roh_ausgeben(pfade, von, bis, ausgabe):
+    for pfad in pfade:
+        for _, _, daten in bloecke_lesen(pfad, von, bis):
+            ausgabe.buffer.write(daten)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aufnahmen von reader-raw-dump.py auswerten")
+    parser.add_argument("befehl", choices=("info", "hex", "roh"),
+                        help="info: Überblick, hex: ein Block pro Zeile, roh: Rohdaten hintereinander (stdout)")
+    parser.add_argument("pfade", nargs="+", help="Aufnahmedateien (.sml/.sml.gz), zeitlich sortiert")
+    parser.add_argument("--von", type=zeitpunkt, help="ab Zeitpunkt (JJJJ-MM-TT HH:MM[:SS], Ortszeit)")
+    parser.add_argument("--bis", type=zeitpunkt, help="bis Zeitpunkt (ausschließlich)")
+    args = parser.parse_args()
+    befehle = {"info": info, "hex": hex_ausgeben, "roh": roh_ausgeben}
+    try:
+        befehle[args.befehl](args.pfade, args.von, args.bis, sys.stdout)
+    except ValueError as e:
+        parser.error(str(e))
+    except BrokenPipeError:  # z. B. | head
+        sys.stderr.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,25 @@
 import serial
+import signal
 import time
 import os
 import logging
 
-PORT = "/dev/ttyUSB0"      # ggf. anpassen
-BAUDRATE = 9600
-LOGFILE = "/app/data/logs/strom_raw_dump.log"
+from aufzeichnung import Aufzeichner
 
-# Logging konfigurieren
+PORT = os.getenv("PORT", "/dev/ttyUSB0")      # ggf. anpassen
+BAUDRATE = int(os.getenv("BAUDRATE", 9600))
+DATA_PATH = os.getenv("DATA_PATH", "/app/data/dump")  # Aufnahmedateien (Format: aufzeichnung.py)
+LOGFILE = os.getenv("LOGFILE", "/app/data/logs/strom_raw_dump.log")
+KOMPRIMIEREN = os.getenv("KOMPRIMIEREN", "0").lower() in ("1", "true", "yes")
+FLUSH_SEKUNDEN = float(os.getenv("FLUSH_SEKUNDEN", 10))  # so viele Sekunden gehen bei einem Absturz höchstens verloren
+# Ein Block endet, wenn so lange kein Byte mehr kommt: ein Telegramm kommt am Stück, danach ist Pause.
+# Zeitstempel eines Blocks ist der Empfang des ersten Bytes.
+LUECKE_SEKUNDEN = float(os.getenv("LUECKE_SEKUNDEN", 0.05))
+MAX_BLOCK = 4096  # längere Blöcke werden geteilt (Port sendet ohne Pause)
+STATISTIK_SEKUNDEN = int(os.getenv("STATISTIK_SEKUNDEN", 3600))
+
+# Logging konfigurieren (nur Meldungen, die Rohdaten stehen in den Aufnahmedateien)
+os.makedirs(os.path.dirname(LOGFILE), exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
@@ -17,23 +29,50 @@ logging.basicConfig(
     ]
 )
 
+def beenden(signum, frame):
+    raise KeyboardInterrupt
+
 def dump_serial():
+    # docker stop: wie Strg+C beenden, damit Puffer und gzip-Ende noch geschrieben werden
+    signal.signal(signal.SIGTERM, beenden)
+    aufzeichner = Aufzeichner(DATA_PATH, PORT, BAUDRATE, komprimieren=KOMPRIMIEREN)
+    block = bytearray()
+    zeitpunkt_ns = None
     try:
-        with serial.Serial(PORT, BAUDRATE, timeout=3) as ser:
-            logging.info(f"Verbunden mit {PORT} @ {BAUDRATE} Baud")
+        with serial.Serial(PORT, BAUDRATE, timeout=LUECKE_SEKUNDEN) as ser:
+            logging.info(f"Verbunden mit {PORT} @ {BAUDRATE} Baud, Aufnahme nach {DATA_PATH}"
+                         f"{' (gzip)' if KOMPRIMIEREN else ''}")
+            letztes_leeren = letzte_statistik = time.monotonic()
+            pfad = None
             while True:
-                data = ser.read(512)
+                # Alles lesen, was da ist; kommt LUECKE_SEKUNDEN lang nichts, ist der Block fertig
+                data = ser.read(ser.in_waiting or 1)
                 if data:
-                    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                    hex_data = data.hex()
-                    ascii_data = data.decode('latin1', errors='replace')
-
-                    logging.info(f"[{timestamp}] HEX: {hex_data}")
-                    logging.info(f"[{timestamp}] ASCII: {ascii_data}")
+                    if not block:
+                        zeitpunkt_ns = time.monotonic_ns()  # Zeitpunkt des ersten Bytes
+                    block += data
+                if block and (not data or len(block) >= MAX_BLOCK):
+                    aufzeichner.schreiben(block, zeitpunkt_ns)
+                    block.clear()
+                    if aufzeichner.pfad != pfad:
+                        pfad = aufzeichner.pfad
+                        logging.info(f"📁 Neue Aufnahmedatei {pfad}")
+                jetzt = time.monotonic()
+                if jetzt - letztes_leeren >= FLUSH_SEKUNDEN:
+                    aufzeichner.leeren()
+                    letztes_leeren = jetzt
+                if jetzt - letzte_statistik >= STATISTIK_SEKUNDEN:
+                    logging.info(f"📊 {aufzeichner.bloecke} Blöcke, {aufzeichner.bytes} Bytes in {aufzeichner.dateien} Dateien")
+                    letzte_statistik = jetzt
     except serial.SerialException as e:
         logging.error("Serieller Zugriff fehlgeschlagen: %s", e)
     except KeyboardInterrupt:
         logging.info("Beendet durch Benutzer")
+    finally:
+        if block:
+            aufzeichner.schreiben(block, zeitpunkt_ns)
+        aufzeichner.schliessen()
+        logging.info(f"📊 {aufzeichner.bloecke} Blöcke, {aufzeichner.bytes} Bytes in {aufzeichner.dateien} Dateien")
 
 if __name__ == "__main__":
     dump_serial()
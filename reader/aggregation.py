@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+
+class IntervallAggregat:
+    """
+    Fasst alle Telegramme eines Schreibintervalls (WAIT_TIMER) zusammen.
+    Jede Messung wird sofort eingerechnet (laufendes Minimum, Maximum und Summe),
+    der Speicherbedarf ist daher unabhängig von der Anzahl der Telegramme.
+    """
+    def __init__(self):
+        self.zuruecksetzen()
+
+    def zuruecksetzen(self):
+        """
+        Beginnt ein neues Intervall.
+        """
+        self.anzahl = 0
+        self.leistung_min = None
+        self.leistung_max = None
+        self.leistung_summe = 0.0
+        self.leistung = None
+        self.bezug = None
+        self.einspeisung = None
+
+    def hinzufuegen(self, leistung, bezug, einspeisung):
+        """
+        Rechnet ein dekodiertes Telegramm in das Intervall ein.
+        :param leistung: Die Wirkleistung in Watt.
+        :param bezug: Der Zählerstand Bezug in kWh.
+        :param einspeisung: Der Zählerstand Einspeisung in kWh.
+        """
+        if self.anzahl == 0:
+            self.leistung_min = self.leistung_max = leistung
+        elif leistung < self.leistung_min:
+            self.leistung_min = leistung
+        elif leistung > self.leistung_max:
+            self.leistung_max = leistung
+        self.leistung_summe += leistung
+        self.anzahl += 1
+        self.leistung = leistung
+        self.bezug = bezug
+        self.einspeisung = einspeisung
+
+    @property
+    def leistung_avg(self):
+        """
+        :return: Mittlere Wirkleistung im Intervall (gerundet auf 2 Stellen) oder None.
+        """
+        if self.anzahl == 0:
+            return None
+        return round(self.leistung_summe / self.anzahl, 2)
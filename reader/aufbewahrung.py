@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# Aufbewahrung der Rohdaten: Messwerte in messwerte_v2, die älter als --roh-tage sind, werden
+# zu Minuten- und Stundenwerten verdichtet (messwerte_minute, messwerte_stunde, siehe rollup.py)
+# und gelöscht. Minutenwerte älter als --minuten-tage werden gelöscht, die Stundenwerte bleiben.
+# Läuft in kleinen Transaktionen neben Reader und Dashboard, z. B. einmal pro Nacht:
+#
+#   docker exec strom-reader python3 /app/aufbewahrung.py [--roh-tage 30] [--minuten-tage 365]
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import rollup
+
+# Rohdaten eines Zeitraums in eine Stufe einrechnen; ?1/?2 = [von, bis) als Unix-Zeit.
+# Gibt es den Minuten-/Stundenwert schon (Rohdaten nachgetragen), wird zusammengefasst wie in tag.
+VERDICHTEN = """
+INSERT INTO {tabelle} (zaehler_id, ts, bezug_anfang_mwh, bezug_ende_mwh, einspeisung_anfang_mwh,
+                       einspeisung_ende_mwh, leistung_min_w, leistung_max_w, leistung_summe_w, anzahl,
+                       anzahl_telegramme)
+SELECT zaehler_id, {eimer},
+       MIN(bezug_mwh), MAX(bezug_mwh), MIN(einspeisung_mwh), MAX(einspeisung_mwh),
+       MIN(COALESCE(leistung_min_w, leistung_w)),
+       MAX(COALESCE(leistung_max_w, leistung_w)),
+       SUM(COALESCE(leistung_avg_w, leistung_w)),
+       COUNT(COALESCE(leistung_avg_w, leistung_w)),
+       SUM(anzahl_telegramme)
+FROM messwerte_v2
+WHERE zaehler_id IN (SELECT id FROM zaehler) AND ts >= ?1 AND ts < ?2
+GROUP BY zaehler_id, {eimer}
+ON CONFLICT (zaehler_id, ts) DO UPDATE SET
+    bezug_anfang_mwh = MIN(COALESCE(bezug_anfang_mwh, excluded.bezug_anfang_mwh),
+                           COALESCE(excluded.bezug_anfang_mwh, bezug_anfang_mwh)),
+    bezug_ende_mwh = MAX(COALESCE(bezug_ende_mwh, excluded.bezug_ende_mwh),
+                         COALESCE(excluded.bezug_ende_mwh, bezug_ende_mwh)),
+    einspeisung_anfang_mwh = MIN(COALESCE(einspeisung_anfang_mwh, excluded.einspeisung_anfang_mwh),
+                                 COALESCE(excluded.einspeisung_anfang_mwh, einspeisung_anfang_mwh)),
+    einspeisung_ende_mwh = MAX(COALESCE(einspeisung_ende_mwh, excluded.einspeisung_ende_mwh),
+                               COALESCE(excluded.einspeisung_ende_mwh, einspeisung_ende_mwh)),
+    leistung_min_w = MIN(COALESCE(leistung_min_w, excluded.leistung_min_w),
+                         COALESCE(excluded.leistung_min_w, leistung_min_w)),
+    leistung_max_w = MAX(COALESCE(leistung_max_w, excluded.leistung_max_w),
+                         COALESCE(excluded.leistung_max_w, leistung_max_w)),
+    leistung_summe_w = COALESCE(leistung_summe_w, 0) + COALESCE(excluded.leistung_summe_w, 0),
+    anzahl = anzahl + excluded.anzahl,
+    anzahl_telegramme = COALESCE(anzahl_telegramme, 0) + COALESCE(excluded.anzahl_telegramme, 0)
+"""
+
+GRENZE_SETZEN = """
+INSERT INTO aufbewahrung (stufe, grenze) VALUES (?, ?)
+ON CONFLICT (stufe) DO UPDATE SET grenze = MAX(grenze, excluded.grenze)
+"""
+
+
+def stunde_anfang(ts):
+    """
+    :param ts: Unix-Zeit.
+    :return: Beginn der lokalen Stunde (Unix-Zeit), wie rollup.STUFEN["messwerte_stunde"].
+    """
+    return int(datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0).timestamp())
+
+
+def grenze_berechnen(tage, jetzt=None):
+    """
+    :param tage: Aufbewahrung in Tagen.
+    :param jetzt: Unix-Zeit (Standard: jetzt).
+    :return: Beginn der lokalen Stunde vor `tage` Tagen (Unix-Zeit).
+    """
+    jetzt = time.time() if jetzt is None else jetzt
+    return stunde_anfang(int((datetime.fromtimestamp(jetzt) - timedelta(days=tage)).timestamp()))
+
+
+class Aufbewahrung:
+    """
+    Verdichtet und löscht blockweise, eine kurze Transaktion pro Block. Die Grenzen in der
+    Tabelle aufbewahrung werden in derselben Transaktion fortgeschrieben, ein abgebrochener
+    Lauf setzt beim nächsten Start einfach fort.
+    :param conn: SQLite-Verbindung (isolation_level=None).
+    :param block: Ungefähre Zeilen pro Transaktion (es werden immer ganze Stunden verarbeitet).
+    :param pause: Sekunden zwischen zwei Transaktionen (Zeit für den Reader).
+    """
+    def __init__(self, conn, block=20000, pause=0.05):
+        self.conn = conn
+        self.block = block
+        self.pause = pause
+        self.verdichtet = 0
+        self.geloescht = 0
+
+    def _blockende(self, tabelle, grenze):
+        """
+        :return: (von, bis) des nächsten Blocks vor `grenze` in `tabelle` oder None, wenn nichts mehr da ist.
+        """
+        zaehler_id, von = self.conn.execute(f"""
+            SELECT id, (SELECT MIN(ts) FROM {tabelle} WHERE zaehler_id = id) AS von
+            FROM zaehler WHERE von < ? ORDER BY von LIMIT 1
+        """, (grenze,)).fetchone() or (None, None)
+        if von is None:
+            return None
+        zeile = self.conn.execute(f"""
+            SELECT ts FROM {tabelle} WHERE zaehler_id = ? AND ts >= ? ORDER BY ts LIMIT 1 OFFSET ?
+        """, (zaehler_id, von, self.block)).fetchone()
+        bis = grenze if zeile is None else min(grenze, stunde_anfang(zeile[0]) + 3600)
+        return von, bis
+
+    def _transaktion(self, schritt):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            schritt()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        time.sleep(self.pause)
+
+    def rohdaten_verdichten(self, grenze):
+        """
+        Rechnet alle Rohdaten vor `grenze` in messwerte_minute und messwerte_stunde ein und
+        löscht sie aus messwerte_v2.
+        :param grenze: Unix-Zeit, Beginn einer lokalen Stunde.
+        """
+        while True:
+            block = self._blockende("messwerte_v2", grenze)
+            if block is None:
+                break
+
+            def schritt():
+                for tabelle, eimer in rollup.STUFEN.items():
+                    self.conn.execute(VERDICHTEN.format(tabelle=tabelle, eimer=eimer), block)
+                self.verdichtet += self.conn.execute(
+                    "DELETE FROM messwerte_v2 WHERE zaehler_id IN (SELECT id FROM zaehler) AND ts >= ? AND ts < ?",
+                    block).rowcount
+                self.conn.execute(GRENZE_SETZEN, ("roh", block[1]))
+            self._transaktion(schritt)
+        self._transaktion(lambda: self.conn.execute(GRENZE_SETZEN, ("roh", grenze)))
+
+    def minuten_loeschen(self, grenze):
+        """
+        Löscht alle Minutenwerte vor `grenze` (sie stecken in messwerte_stunde).
+        :param grenze: Unix-Zeit, Beginn einer lokalen Stunde.
+        """
+        while True:
+            block = self._blockende("messwerte_minute", grenze)
+            if block is None:
+                break
+
+            def schritt():
+                self.geloescht += self.conn.execute(
+                    "DELETE FROM messwerte_minute WHERE zaehler_id IN (SELECT id FROM zaehler) AND ts >= ? AND ts < ?",
+                    block).rowcount
+                self.conn.execute(GRENZE_SETZEN, ("minute", block[1]))
+            self._transaktion(schritt)
+        self._transaktion(lambda: self.conn.execute(GRENZE_SETZEN, ("minute", grenze)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alte Rohdaten zu Minuten-/Stundenwerten verdichten")
+    parser.add_argument("--db", default="/app/data/strom.sqlite", help="Pfad zur SQLite-Datenbank")
+    parser.add_argument("--roh-tage", type=int, default=int(os.getenv("AUFBEWAHRUNG_ROH_TAGE", 30)),
+                        help="Rohdaten so viele Tage behalten (mindestens 2, für heute/gestern im Dashboard)")
+    parser.add_argument("--minuten-tage", type=int, default=int(os.getenv("AUFBEWAHRUNG_MINUTEN_TAGE", 365)),
+                        help="Minutenwerte so viele Tage behalten (0 = unbegrenzt)")
+    parser.add_argument("--block", type=int, default=20000, help="Ungefähre Zeilen pro Transaktion")
+    parser.add_argument("--pause", type=float, default=0.05, help="Sekunden zwischen zwei Transaktionen")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    if args.roh_tage < 2:
+        parser.error("--roh-tage muss mindestens 2 sein")
+    if args.minuten_tage and args.minuten_tage < args.roh_tage:
+        parser.error("--minuten-tage muss 0 oder mindestens --roh-tage sein")
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    try:
+        rollup.schema_anlegen(conn)
+        aufbewahrung = Aufbewahrung(conn, args.block, args.pause)
+        start = time.perf_counter()
+        grenze = grenze_berechnen(args.roh_tage)
+        aufbewahrung.rohdaten_verdichten(grenze)
+        logging.info("🗜️ %d Rohdaten vor %s verdichtet in %.1f s", aufbewahrung.verdichtet,
+                     datetime.fromtimestamp(grenze), time.perf_counter() - start)
+        if args.minuten_tage:
+            start = time.perf_counter()
+            grenze = grenze_berechnen(args.minuten_tage)
+            aufbewahrung.minuten_loeschen(grenze)
+            logging.info("🧹 %d Minutenwerte vor %s gelöscht in %.1f s", aufbewahrung.geloescht,
+                         datetime.fromtimestamp(grenze), time.perf_counter() - start)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+
+def json_atomar_schreiben(pfad, daten):
+    """
+    Schreibt eine JSON-Datei atomar (temporäre Datei + rename).
+    Leser sehen immer entweder die alte oder die neue, nie eine halbe Datei.
+    :param pfad: Zieldatei.
+    :param daten: Die zu schreibenden Daten.
+    """
+    pfad = Path(pfad)
+    tmp = pfad.with_name(pfad.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(daten, f, indent=2)
+    os.replace(tmp, pfad)
+
+
+class JsonHistorie:
+    """
+    Schreibt die Historie als JSON-Lines (eine kompakte JSON-Zeile pro Messwert)
+    nach `<verzeichnis>/<datum>.jsonl`. Es wird nur angehängt, die Datei wird nie
+    neu eingelesen. Die Datei bleibt offen und wird gepuffert geschrieben;
+    geleert wird spätestens nach `flush_sekunden`, beim Tageswechsel und beim Schließen.
+    :param verzeichnis: Verzeichnis für die Tagesdateien.
+    :param flush_sekunden: Maximale Zeit in Sekunden, bis gepufferte Zeilen auf die Platte gehen.
+    """
+    def __init__(self, verzeichnis, flush_sekunden=60):
+        self.verzeichnis = Path(verzeichnis)
+        self.verzeichnis.mkdir(parents=True, exist_ok=True)
+        self.flush_sekunden = flush_sekunden
+        self._datei = None
+        self._datum = None
+        self._letzter_flush = time.monotonic()
+
+    def schreiben(self, eintrag, datum):
+        """
+        Hängt einen Messwert an die Tagesdatei an.
+        :param eintrag: Der Messwert (dict).
+        :param datum: Das Datum im Format YYYY-MM-DD (bestimmt die Datei).
+        """
+        if datum != self._datum:
+            self._oeffnen(datum)
+        self._datei.write(json.dumps(eintrag, separators=(",", ":")) + "\n")
+        if time.monotonic() - self._letzter_flush >= self.flush_sekunden:
+            self.flush()
+
+    def _oeffnen(self, datum):
+        """
+        Schließt die bisherige Tagesdatei und öffnet die Datei für `datum` zum Anhängen.
+        """
+        self.schliessen()
+        self._datum = datum
+        self._datei = open(self.verzeichnis / f"{datum}.jsonl", "a", encoding="utf-8")
+        logging.debug("📂 Historie-Datei geöffnet: %s", self._datei.name)
+
+    def flush(self):
+        """
+        Schreibt gepufferte Zeilen in die Datei.
+        """
+        if self._datei is not None:
+            self._datei.flush()
+        self._letzter_flush = time.monotonic()
+
+    def schliessen(self):
+        """
+        Leert den Puffer und schließt die aktuelle Tagesdatei.
+        """
+        if self._datei is not None:
+            self._datei.close()
+            self._datei = None
+            self._datum = None
+
+
+def historie_dateien(verzeichnis):
+    """
+    Liefert alle Historie-Dateien (alt: *.json, neu: *.jsonl), nach Namen sortiert.
+    :param verzeichnis: Das Historie-Verzeichnis.
+    :return: Liste von Path-Objekten.
+    """
+    verzeichnis = Path(verzeichnis)
+    return sorted(list(verzeichnis.glob("*.json")) + list(verzeichnis.glob("*.jsonl")))
+
+
+def json_liste_lesen(f, blockgroesse=65536):
+    """
+    Liest eine JSON-Liste von Objekten Element für Element, ohne die ganze Datei zu laden.
+    Endet die Datei ohne "]" (abgebrochen), endet der Generator nach dem letzten
+    vollständigen Element.
+    :param f: Geöffnete Textdatei.
+    :param blockgroesse: Zeichen pro read().
+    :return: Generator über die Elemente.
+    :raises ValueError: Wenn die Datei keine Liste enthält oder ein Element ungültig ist.
+    """
+    decoder = json.JSONDecoder()
+    puffer = ""
+    position = 0
+    angefangen = False
+    dateiende = False
+    while True:
+        # Leerraum und Kommas zwischen den Elementen überspringen
+        while position < len(puffer) and puffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(puffer):
+            if not angefangen:
+                if puffer[position] != "[":
+                    raise ValueError("Keine JSON-Liste")
+                angefangen = True
+                position += 1
+                continue
+            if puffer[position] == "]":
+                return
+            try:
+                eintrag, position = decoder.raw_decode(puffer, position)
+            except json.JSONDecodeError:
+                if dateiende:
+                    raise
+            else:
+                yield eintrag
+                continue
+        elif dateiende:
+            return
+        # Element unvollständig oder Puffer leer -> nächsten Block anhängen
+        block = f.read(blockgroesse)
+        dateiende = not block
+        puffer, position = puffer[position:] + block, 0
+
+
+def historie_lesen(pfad):
+    """
+    Liest eine Historie-Datei Eintrag für Eintrag.
+    JSON-Lines-Dateien (*.jsonl) werden zeilenweise gestreamt, alte Tagesdateien
+    (*.json mit einer Liste) elementweise (json_liste_lesen).
+    Eine unvollständige letzte Zeile (z. B. nach einem Stromausfall) wird übersprungen.
+    :param pfad: Pfad zur Datei.
+    :return: Generator über die Einträge (dict).
+    """
+    pfad = Path(pfad)
+    if pfad.suffix == ".json":
+        with open(pfad, "r", encoding="utf-8") as f:
+            yield from json_liste_lesen(f)
+        return
+
+    with open(pfad, "r", encoding="utf-8") as f:
+        for nummer, zeile in enumerate(f, 1):
+            zeile = zeile.strip()
+            if not zeile:
+                continue
+            try:
+                yield json.loads(zeile)
+            except json.JSONDecodeError:
+                logging.warning("⚠️ Ungültige Zeile %d in %s übersprungen", nummer, pfad)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# Migriert die alte Tabelle messwerte (ISO-Text-Zeitstempel, REAL kWh, AUTOINCREMENT-rowid)
+# nach messwerte_v2 (siehe speicher.py) und ersetzt sie durch die Sicht messwerte.
+# Läuft online: kopiert in kleinen Transaktionen, Reader und Dashboard arbeiten weiter.
+# Ein abgebrochener Lauf setzt beim nächsten Start dort fort, wo er aufgehört hat.
+#
+#   docker exec strom-reader python3 /app/migration_v2.py [--vacuum]
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import rollup
+import speicher
+
+# Spalten der alten Tabelle; ältere Datenbanken haben die Intervall-Spalten noch nicht
+ALTE_SPALTEN = ("zaehler_id", "timestamp", "bezug_kwh", "einspeisung_kwh", "wirkleistung_watt",
+                "wirkleistung_min", "wirkleistung_max", "wirkleistung_avg", "anzahl_telegramme")
+
+
+def alte_tabelle(conn):
+    """
+    :return: True, wenn messwerte noch eine Tabelle ist (nicht die Sicht).
+    """
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messwerte'").fetchone() is not None
+
+
+def belegt(conn):
+    """
+    :return: Belegter Platz in der Datenbank (Bytes, ohne freie Seiten).
+    """
+    seiten = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return seiten * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+class Migration:
+    """
+    Kopiert messwerte blockweise (nach id) nach messwerte_v2. Der Fortschritt steht in
+    migration_v2_stand, in derselben Transaktion wie die kopierten Zeilen.
+    :param conn: SQLite-Verbindung (isolation_level=None).
+    :param zeitzone: Zeitzone für Zeitstempel ohne Angabe (None = lokale Zeit des Prozesses).
+    :param block: Zeilen pro Transaktion.
+    :param pause: Sekunden zwischen zwei Transaktionen (Zeit für den Reader).
+    """
+    def __init__(self, conn, zeitzone=None, block=20000, pause=0.05):
+        self.conn = conn
+        self.zeitzone = ZoneInfo(zeitzone) if zeitzone else None
+        self.block = block
+        self.pause = pause
+        self.gelesen = 0
+        self.kopiert = 0
+        self.ungueltig = 0
+        vorhanden = {row[1] for row in conn.execute("PRAGMA table_info(messwerte)")}
+        auswahl = ", ".join(spalte if spalte in vorhanden else "NULL" for spalte in ALTE_SPALTEN)
+        self._abfrage = f"SELECT id, {auswahl} FROM messwerte WHERE id > ? ORDER BY id LIMIT ?"
+
+    def epoch(self, zeitpunkt):
+        if self.zeitzone is None:
+            return speicher.epoch(zeitpunkt)
+        if zeitpunkt.endswith("Z"):
+            zeitpunkt = zeitpunkt[:-1] + "+00:00"
+        wert = datetime.fromisoformat(zeitpunkt)
+        if wert.tzinfo is None:
+            wert = wert.replace(tzinfo=self.zeitzone)
+        return int(wert.timestamp())
+
+    def umwandeln(self, zeile):
+        """
+        :param zeile: (id, *ALTE_SPALTEN)
+        :return: Zeile für messwerte_v2 oder None bei ungültigem Zeitstempel;
+                 zaehler_id NULL (sehr alte Zeilen) wird Zähler 1.
+        """
+        _, zaehler_id, timestamp, bezug, einspeisung, watt, watt_min, watt_max, watt_avg, anzahl = zeile
+        try:
+            ts = self.epoch(timestamp)
+        except (TypeError, ValueError):
+            self.ungueltig += 1
+            return None
+        return (zaehler_id or 1, ts, speicher.ganzzahl(bezug, 1000000), speicher.ganzzahl(einspeisung, 1000000),
+                speicher.ganzzahl(watt), speicher.ganzzahl(watt_min), speicher.ganzzahl(watt_max),
+                speicher.ganzzahl(watt_avg), anzahl)
+
+    def schritt(self):
+        """
+        Kopiert einen Block (innerhalb einer offenen Transaktion).
+        :return: Anzahl gelesener Zeilen (0 = fertig).
+        """
+        letzte_id = self.conn.execute("SELECT letzte_id FROM migration_v2_stand").fetchone()[0]
+        zeilen = self.conn.execute(self._abfrage, (letzte_id, self.block)).fetchall()
+        if not zeilen:
+            return 0
+        vorher = self.conn.total_changes
+        self.conn.executemany(speicher.SqliteSchreiber.INSERT_MESSWERT, filter(None, map(self.umwandeln, zeilen)))
+        self.kopiert += self.conn.total_changes - vorher
+        self.gelesen += len(zeilen)
+        self.conn.execute("UPDATE migration_v2_stand SET letzte_id = ?", (zeilen[-1][0],))
+        return len(zeilen)
+
+    def ausfuehren(self):
+        """
+        Kopiert alle Zeilen und ersetzt die Tabelle messwerte zum Schluss durch die Sicht.
+        """
+        conn = self.conn
+        speicher.schema_anlegen(conn)
+        conn.execute("CREATE TABLE IF NOT EXISTS migration_v2_stand (letzte_id INTEGER NOT NULL)")
+        if conn.execute("SELECT 1 FROM migration_v2_stand").fetchone() is None:
+            conn.execute("INSERT INTO migration_v2_stand VALUES (0)")
+        else:
+            logging.info("↪️ Setze fort nach id %d", conn.execute("SELECT letzte_id FROM migration_v2_stand").fetchone()[0])
+        # Zeilen ohne Eintrag in zaehler wären über den Primärschlüssel nicht mehr erreichbar
+        conn.execute("INSERT OR IGNORE INTO zaehler (id) SELECT DISTINCT COALESCE(zaehler_id, 1) FROM messwerte")
+
+        start = time.perf_counter()
+        letzte_meldung = start
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                gelesen = self.schritt()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if not gelesen:
+                break
+            if time.perf_counter() - letzte_meldung >= 10:
+                letzte_meldung = time.perf_counter()
+                logging.info("🔁 %d Zeilen kopiert (%.0f/s)", self.gelesen, self.gelesen / (letzte_meldung - start))
+            time.sleep(self.pause)
+
+        # Umschalten: was inzwischen noch in die alte Tabelle geschrieben wurde, in derselben
+        # Transaktion übernehmen, dann Tabelle (samt Indizes) durch die Sicht ersetzen
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while self.schritt():
+                pass
+            conn.execute("DROP TABLE messwerte")
+            conn.execute("DROP TABLE migration_v2_stand")
+            speicher.schema_anlegen(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="messwerte nach messwerte_v2 migrieren (online)")
+    parser.add_argument("--db", default="/app/data/strom.sqlite", help="Pfad zur SQLite-Datenbank")
+    parser.add_argument("--zeitzone", default=os.getenv("MIGRATION_ZEITZONE"),
+                        help="Zeitzone für Zeitstempel ohne Angabe, z. B. Europe/Berlin (Standard: lokale Zeit)")
+    parser.add_argument("--block", type=int, default=20000, help="Zeilen pro Transaktion")
+    parser.add_argument("--pause", type=float, default=0.05, help="Sekunden zwischen zwei Transaktionen")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Datei danach verkleinern (sperrt die Datenbank für die Dauer, braucht freien Platz)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    try:
+        vorher = belegt(conn)
+        if alte_tabelle(conn):
+            migration = Migration(conn, args.zeitzone, args.block, args.pause)
+            dauer = migration.ausfuehren()
+            logging.info("✅ %d Zeilen in %.1f s migriert (%.0f/s), %d doppelte Zeitpunkte zusammengefasst, "
+                         "%d ungültige Zeitstempel übersprungen", migration.gelesen, dauer,
+                         migration.gelesen / dauer if dauer else 0,
+                         migration.gelesen - migration.kopiert - migration.ungueltig, migration.ungueltig)
+            # Tage neu berechnen: lokale Tage aus ts statt aus dem Text (Zeitstempel mit Zeitzone)
+            rollup.schema_anlegen(conn)
+            rollup.neu_aufbauen(conn)
+        else:
+            speicher.schema_anlegen(conn)
+            logging.info("✅ messwerte ist bereits die Sicht auf messwerte_v2")
+        if args.vacuum:
+            start = time.perf_counter()
+            conn.execute("VACUUM")
+            logging.info("🧹 VACUUM in %.1f s", time.perf_counter() - start)
+        logging.info("📦 Belegt: %.1f MB -> %.1f MB, Datei: %.1f MB", vorher / 1e6, belegt(conn) / 1e6,
+                     os.path.getsize(args.db) / 1e6)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+import logging
+import queue
+import selectors
+import threading
+import time
+
+from sml_puffer import RingPuffer
+from sml_scanner import SmlScanner
+
+
+class Warteschlange:
+    """
+    Begrenzte Warteschlange zwischen zwei Stufen mit Gegendruck-Statistik.
+    :param name: Name für das Logging.
+    :param max_groesse: Maximale Anzahl Einträge.
+    """
+    def __init__(self, name, max_groesse):
+        self.name = name
+        self.max_groesse = max_groesse
+        self._queue = queue.Queue(maxsize=max_groesse)
+        # Statistik
+        self.eingestellt = 0
+        self.verworfen = 0
+        self.blockiert = 0
+        self.blockiert_sekunden = 0.0
+        self.max_fuellstand = 0
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def _gezaehlt(self):
+        self.eingestellt += 1
+        fuellstand = self._queue.qsize()
+        if fuellstand > self.max_fuellstand:
+            self.max_fuellstand = fuellstand
+
+    def anbieten(self, eintrag):
+        """
+        Stellt einen Eintrag ein, ohne zu blockieren. Ist die Warteschlange voll,
+        wird der älteste Eintrag verworfen (gezählt in `verworfen`).
+        :param eintrag: Der Eintrag.
+        """
+        while True:
+            try:
+                self._queue.put_nowait(eintrag)
+                break
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.verworfen += 1
+                except queue.Empty:
+                    pass
+        self._gezaehlt()
+
+    def einstellen(self, eintrag):
+        """
+        Stellt einen Eintrag ein und wartet, falls die Warteschlange voll ist
+        (Wartezeit wird in `blockiert`/`blockiert_sekunden` gezählt).
+        :param eintrag: Der Eintrag.
+        """
+        try:
+            self._queue.put_nowait(eintrag)
+        except queue.Full:
+            start = time.monotonic()
+            self._queue.put(eintrag)
+            self.blockiert += 1
+            self.blockiert_sekunden += time.monotonic() - start
+        self._gezaehlt()
+
+    def holen(self, timeout=None):
+        """
+        :param timeout: Maximale Wartezeit in Sekunden.
+        :return: Der nächste Eintrag oder None, wenn in `timeout` nichts kam.
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def statistik(self):
+        """
+        :return: Statistik als Text für das Logging.
+        """
+        return (f"{self.name}: {len(self)}/{self.max_groesse} (max. {self.max_fuellstand}), "
+                f"{self.eingestellt} eingestellt, {self.verworfen} verworfen, "
+                f"{self.blockiert}x blockiert ({self.blockiert_sekunden:.1f} s)")
+
+
+class Quelle:
+    """
+    Ein serieller Port (ein Zähler) mit eigenem Empfangspuffer und Scanner.
+    :param nummer: Nummer des Zählers in der Konfiguration; geht mit jedem Telegramm in die Warteschlange.
+    :param ser: Der geöffnete serielle Port, nicht blockierend (timeout=0).
+    :param crc_pruefung: Funktion (crc_bytes, daten) -> bool.
+    """
+    def __init__(self, nummer, ser, crc_pruefung):
+        self.nummer = nummer
+        self.ser = ser
+        self.puffer = RingPuffer(kapazitaet=4096)
+        self.scanner = SmlScanner(self.puffer, crc_pruefung=crc_pruefung)
+
+
+class SeriellerLeser(threading.Thread):
+    """
+    Liest alle seriellen Ports in einem einzigen Thread: ein Selektor (selectors) wartet
+    auf die Dateideskriptoren, gelesen wird nur der Port, an dem Daten anliegen. Jeder
+    Port schneidet seine Telegramme mit eigenem RingPuffer + SmlScanner (inkl. CRC-Prüfung)
+    aus; sie gehen als (nummer, Kopie) in die gemeinsame Warteschlange. Der Thread
+    wartet nie auf die nachfolgenden Stufen.
+    :param quellen: Liste von Quelle.
+    :param ausgang: Warteschlange für die Telegramme ((nummer, bytes)).
+    :param stopp: threading.Event zum Beenden.
+    """
+    def __init__(self, quellen, ausgang, stopp):
+        super().__init__(name="seriell", daemon=True)
+        self.quellen = quellen
+        self.ausgang = ausgang
+        self.stopp = stopp
+
+    def run(self):
+        selektor = selectors.DefaultSelector()
+        quelle = None
+        try:
+            for quelle in self.quellen:
+                selektor.register(quelle.ser.fileno(), selectors.EVENT_READ, quelle)
+            while not self.stopp.is_set():
+                # Höchstens 1 s warten, damit `stopp` geprüft wird
+                for schluessel, _ in selektor.select(timeout=1):
+                    quelle = schluessel.data
+                    # Lese alle wartenden Bytes (bzw. einen Block) vom seriellen Port
+                    if not quelle.puffer.einlesen(quelle.ser):
+                        continue
+                    for telegramm in quelle.scanner.telegramme_lesen():
+                        # Die Ansicht ist nur bis zum nächsten Lesen gültig -> kopieren
+                        self.ausgang.anbieten((quelle.nummer, bytes(telegramm)))
+        except Exception as e:
+            logging.error("❌ Fehler beim Lesen des seriellen Ports %s: %s",
+                          getattr(quelle.ser, "port", "?") if quelle else "?", e)
+        finally:
+            selektor.close()
+            # Ohne seriellen Port hat der Reader nichts mehr zu tun (Neustart über Docker öffnet alle Ports neu)
+            self.stopp.set()
+
+
+class SchreibThread(threading.Thread):
+    """
+    Führt die Schreibaufträge (SQLite/JSON) in einem eigenen Thread aus, damit
+    langsame Speicherzugriffe weder das Lesen noch das Dekodieren aufhalten.
+    :param eingang: Warteschlange mit den Schreibaufträgen.
+    :param schreiben: Funktion, die einen Auftrag ausführt.
+    :param leerlauf: Funktion, die regelmäßig aufgerufen wird (z. B. fällige Commits).
+    :param beenden: Funktion, die nach dem letzten Auftrag aufgerufen wird (z. B. schließen).
+    """
+    ENDE = object()
+
+    def __init__(self, eingang, schreiben, leerlauf=None, beenden=None):
+        super().__init__(name="schreiben")
+        self.eingang = eingang
+        self.schreiben = schreiben
+        self.leerlauf = leerlauf
+        self.beenden = beenden
+
+    def run(self):
+        try:
+            while True:
+                auftrag = self.eingang.holen(timeout=1)
+                if auftrag is self.ENDE:
+                    break
+                try:
+                    if auftrag is not None:
+                        self.schreiben(auftrag)
+                    if self.leerlauf is not None:
+                        self.leerlauf()
+                except Exception as e:
+                    logging.error("❌ Fehler beim Schreiben: %s", e)
+        finally:
+            if self.beenden is not None:
+                self.beenden()
+
+    def stoppen(self):
+        """
+        Lässt den Thread alle bereits eingestellten Aufträge abarbeiten und dann enden.
+        """
+        self.eingang.einstellen(self.ENDE)
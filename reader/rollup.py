@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# Verdichtete Tabellen tag, monat und jahr (pro Zähler und Zeitraum).
+# Der Reader aktualisiert sie bei jedem Schreiben (SqliteSchreiber.flush),
+# das Dashboard liest daraus statt aus messwerte.
+# Dazu die Stufen messwerte_minute und messwerte_stunde für ältere Rohdaten,
+# gefüllt von aufbewahrung.py.
+#
+# Neu aufbauen aus den vorhandenen Messwerten (z. B. nach einer Migration):
+#   python3 rollup.py [--db /app/data/strom.sqlite]
+import argparse
+import logging
+import sqlite3
+import time
+
+# Tabelle -> SQL-Ausdruck für den Zeitraum (wie bisher im Dashboard: DATE()/strftime())
+ZEITRAEUME = {
+    "tag": "DATE({ts})",
+    "monat": "strftime('%Y-%m', {ts})",
+    "jahr": "strftime('%Y', {ts})",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {tabelle} (
+    zaehler_id INTEGER NOT NULL,
+    zeitraum TEXT NOT NULL,
+    bezug_anfang REAL,
+    bezug_ende REAL,
+    einspeisung_anfang REAL,
+    einspeisung_ende REAL,
+    verbrauch_kwh REAL,
+    einspeisung_kwh REAL,
+    leistung_min REAL,
+    leistung_max REAL,
+    leistung_summe REAL,
+    anzahl INTEGER,
+    PRIMARY KEY (zaehler_id, zeitraum)
+)
+"""
+
+# Minuten- und Stundenwerte: Zählerstände am Anfang/Ende (kleinster/größter Wert, die Zähler
+# laufen nur vorwärts), Leistung min/max und Summe/Anzahl für den Mittelwert wie in tag.
+# ts ist der Beginn der Minute bzw. der lokalen Stunde, damit kein Wert über eine Tagesgrenze reicht.
+SCHEMA_STUFE = """
+CREATE TABLE IF NOT EXISTS {tabelle} (
+    zaehler_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    bezug_anfang_mwh INTEGER,
+    bezug_ende_mwh INTEGER,
+    einspeisung_anfang_mwh INTEGER,
+    einspeisung_ende_mwh INTEGER,
+    leistung_min_w INTEGER,
+    leistung_max_w INTEGER,
+    leistung_summe_w INTEGER,
+    anzahl INTEGER NOT NULL,
+    anzahl_telegramme INTEGER,
+    PRIMARY KEY (zaehler_id, ts)
+) WITHOUT ROWID
+"""
+
+# Tabelle -> SQL-Ausdruck für den Beginn des Zeitraums eines Messwerts mit Zeitpunkt ts
+STUFEN = {
+    "messwerte_minute": "ts - ts % 60",
+    "messwerte_stunde": "ts - CAST(strftime('%s', ts, 'unixepoch', 'localtime') AS INTEGER) % 3600",
+}
+
+# Grenzen der Stufen (Unix-Zeit): 'roh' = Rohdaten davor sind verdichtet und gelöscht,
+# 'minute' = Minutenwerte davor sind gelöscht (die Stundenwerte bleiben)
+SCHEMA_AUFBEWAHRUNG = """
+CREATE TABLE IF NOT EXISTS aufbewahrung (
+    stufe TEXT PRIMARY KEY,
+    grenze INTEGER NOT NULL
+)
+"""
+
+# Ein Messwert als Parameter, wie SqliteSchreiber.speichern() ihn sammelt (siehe speicher.zeile_v2()):
+# ?1 zaehler_id, ?2 timestamp, ?3 bezug_kwh, ?4 einspeisung_kwh, ?5 wirkleistung_watt,
+# ?6 wirkleistung_min, ?7 wirkleistung_max, ?8 wirkleistung_avg (anzahl_telegramme wird nicht benötigt)
+UPSERT = """
+INSERT INTO {tabelle} (zaehler_id, zeitraum, bezug_anfang, bezug_ende, einspeisung_anfang, einspeisung_ende,
+                       verbrauch_kwh, einspeisung_kwh, leistung_min, leistung_max, leistung_summe, anzahl)
+VALUES (?1, {zeitraum}, ?3, ?3, ?4, ?4, 0, 0, COALESCE(?6, ?5), COALESCE(?7, ?5), COALESCE(?8, ?5),
+        COALESCE(?8, ?5) IS NOT NULL)
+ON CONFLICT (zaehler_id, zeitraum) DO UPDATE SET
+    bezug_anfang = MIN(bezug_anfang, excluded.bezug_anfang),
+    bezug_ende = MAX(bezug_ende, excluded.bezug_ende),
+    einspeisung_anfang = MIN(einspeisung_anfang, excluded.einspeisung_anfang),
+    einspeisung_ende = MAX(einspeisung_ende, excluded.einspeisung_ende),
+    verbrauch_kwh = MAX(bezug_ende, excluded.bezug_ende) - MIN(bezug_anfang, excluded.bezug_anfang),
+    einspeisung_kwh = MAX(einspeisung_ende, excluded.einspeisung_ende)
+                      - MIN(einspeisung_anfang, excluded.einspeisung_anfang),
+    leistung_min = MIN(COALESCE(leistung_min, excluded.leistung_min), COALESCE(excluded.leistung_min, leistung_min)),
+    leistung_max = MAX(COALESCE(leistung_max, excluded.leistung_max), COALESCE(excluded.leistung_max, leistung_max)),
+    leistung_summe = COALESCE(leistung_summe, 0) + COALESCE(excluded.leistung_summe, 0),
+    anzahl = anzahl + excluded.anzahl
+"""
+
+# Lokale Zeit eines Messwerts in messwerte_v2, für die Ausdrücke in ZEITRAEUME
+LOKALZEIT = "ts, 'unixepoch', 'localtime'"
+
+# Rohdaten und Stundenwerte (verdichtete Rohdaten) zusammen; Stundenwerte reichen nie über
+# eine lokale Tagesgrenze, die Tage bleiben damit exakt
+NEU_AUFBAUEN = """
+INSERT INTO {tabelle} (zaehler_id, zeitraum, bezug_anfang, bezug_ende, einspeisung_anfang, einspeisung_ende,
+                       verbrauch_kwh, einspeisung_kwh, leistung_min, leistung_max, leistung_summe, anzahl)
+SELECT zaehler_id, {zeitraum},
+       MIN(bezug_anfang) / 1e6, MAX(bezug_ende) / 1e6, MIN(einspeisung_anfang) / 1e6, MAX(einspeisung_ende) / 1e6,
+       (MAX(bezug_ende) - MIN(bezug_anfang)) / 1e6, (MAX(einspeisung_ende) - MIN(einspeisung_anfang)) / 1e6,
+       MIN(leistung_min), MAX(leistung_max), SUM(leistung_summe), SUM(anzahl)
+FROM (
+    SELECT zaehler_id, ts, bezug_mwh AS bezug_anfang, bezug_mwh AS bezug_ende,
+           einspeisung_mwh AS einspeisung_anfang, einspeisung_mwh AS einspeisung_ende,
+           COALESCE(leistung_min_w, leistung_w) AS leistung_min, COALESCE(leistung_max_w, leistung_w) AS leistung_max,
+           COALESCE(leistung_avg_w, leistung_w) AS leistung_summe,
+           COALESCE(leistung_avg_w, leistung_w) IS NOT NULL AS anzahl
+    FROM messwerte_v2 {bedingung}
+    UNION ALL
+    SELECT zaehler_id, ts, bezug_anfang_mwh, bezug_ende_mwh, einspeisung_anfang_mwh, einspeisung_ende_mwh,
+           leistung_min_w, leistung_max_w, leistung_summe_w, anzahl
+    FROM messwerte_stunde {bedingung}
+)
+GROUP BY zaehler_id, {zeitraum}
+"""
+
+# Messwerte der lokalen Tage ?1 bis ?2 (YYYY-MM-DD); über den Primärschlüssel je Zähler
+BEREICH = """
+WHERE zaehler_id IN (SELECT id FROM zaehler)
+  AND ts >= CAST(strftime('%s', ?1, 'utc') AS INTEGER)
+  AND ts < CAST(strftime('%s', ?2, '+1 day', 'utc') AS INTEGER)
+"""
+
+# monat aus tag bzw. jahr aus monat zusammenfassen (statt erneut über messwerte)
+ZUSAMMENFASSEN = """
+INSERT INTO {tabelle} (zaehler_id, zeitraum, bezug_anfang, bezug_ende, einspeisung_anfang, einspeisung_ende,
+                       verbrauch_kwh, einspeisung_kwh, leistung_min, leistung_max, leistung_summe, anzahl)
+SELECT zaehler_id, substr(zeitraum, 1, {laenge}),
+       MIN(bezug_anfang), MAX(bezug_ende), MIN(einspeisung_anfang), MAX(einspeisung_ende),
+       MAX(bezug_ende) - MIN(bezug_anfang), MAX(einspeisung_ende) - MIN(einspeisung_anfang),
+       MIN(leistung_min), MAX(leistung_max), SUM(leistung_summe), SUM(anzahl)
+FROM {quelle}
+WHERE zeitraum >= ?1 AND zeitraum < ?2 || '~'
+GROUP BY zaehler_id, substr(zeitraum, 1, {laenge})
+"""
+ZUSAMMENFASSEN_AUS = {"monat": ("tag", 7), "jahr": ("monat", 4)}
+
+UPSERTS = [UPSERT.format(tabelle=t, zeitraum=z.format(ts="?2")) for t, z in ZEITRAEUME.items()]
+
+
+def schema_anlegen(conn):
+    """
+    Legt die Tabellen tag, monat und jahr sowie die Stufen messwerte_minute und
+    messwerte_stunde an, falls sie nicht existieren.
+    :param conn: Offene SQLite-Verbindung.
+    """
+    for tabelle in ZEITRAEUME:
+        conn.execute(SCHEMA.format(tabelle=tabelle))
+    for tabelle in STUFEN:
+        conn.execute(SCHEMA_STUFE.format(tabelle=tabelle))
+    conn.execute(SCHEMA_AUFBEWAHRUNG)
+
+
+def grenze(conn, stufe):
+    """
+    :param conn: Offene SQLite-Verbindung.
+    :param stufe: 'roh' oder 'minute'.
+    :return: Grenze der Stufe (Unix-Zeit) oder None, solange nichts verdichtet bzw. gelöscht wurde.
+    """
+    zeile = conn.execute("SELECT grenze FROM aufbewahrung WHERE stufe = ?", (stufe,)).fetchone()
+    return zeile[0] if zeile else None
+
+
+def ist_leer(conn):
+    """
+    :param conn: Offene SQLite-Verbindung.
+    :return: True, wenn messwerte_v2 oder messwerte_stunde Zeilen enthält, die Tabelle tag aber nicht.
+    """
+    if conn.execute("SELECT 1 FROM tag LIMIT 1").fetchone():
+        return False
+    return conn.execute("SELECT EXISTS (SELECT 1 FROM messwerte_v2) OR EXISTS (SELECT 1 FROM messwerte_stunde)"
+                        ).fetchone()[0] == 1
+
+
+def aktualisieren(conn, zeilen):
+    """
+    Rechnet neue Messwerte in tag, monat und jahr ein. Muss in derselben
+    Transaktion laufen wie das Einfügen in messwerte_v2.
+    :param conn: Offene SQLite-Verbindung.
+    :param zeilen: Messwerte als Tupel, wie SqliteSchreiber.speichern() sie sammelt (siehe speicher.zeile_v2()).
+    """
+    zeilen = [zeile[:8] for zeile in zeilen]
+    for upsert in UPSERTS:
+        conn.executemany(upsert, zeilen)
+
+
+def neu_aufbauen(conn):
+    """
+    Berechnet tag, monat und jahr vollständig aus messwerte_v2 und messwerte_stunde (eine Transaktion).
+    :param conn: Offene SQLite-Verbindung.
+    """
+    start = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for tabelle, zeitraum in ZEITRAEUME.items():
+            conn.execute(f"DELETE FROM {tabelle}")
+            conn.execute(NEU_AUFBAUEN.format(tabelle=tabelle, zeitraum=zeitraum.format(ts=LOKALZEIT),
+                                             bedingung=""))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    anzahl = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ZEITRAEUME}
+    logging.info("🧮 Verdichtete Tabellen neu aufgebaut in %.1f s: %s", time.perf_counter() - start, anzahl)
+
+
+def bereich_neu_aufbauen(conn, von, bis):
+    """
+    Berechnet nur die Tage, Monate und Jahre neu, die Messwerte zwischen `von` und `bis`
+    enthalten (eine Transaktion), z. B. nach dem Nachtragen von Messwerten. Nur tag wird
+    aus messwerte_v2 und messwerte_stunde gelesen, monat und jahr werden aus tag bzw. monat zusammengefasst.
+    :param conn: Offene SQLite-Verbindung.
+    :param von: Kleinster betroffener Zeitpunkt (Unix-Zeit).
+    :param bis: Größter betroffener Zeitpunkt (Unix-Zeit).
+    """
+    start = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        tage = conn.execute("SELECT DATE(?1, 'unixepoch', 'localtime'), DATE(?2, 'unixepoch', 'localtime')",
+                            (von, bis)).fetchone()
+        for tabelle, zeitraum in ZEITRAEUME.items():
+            unten, oben = conn.execute(f"SELECT {zeitraum.format(ts='?1')}, {zeitraum.format(ts='?2')}",
+                                       tage).fetchone()
+            conn.execute(f"DELETE FROM {tabelle} WHERE zeitraum BETWEEN ? AND ?", (unten, oben))
+            if tabelle in ZUSAMMENFASSEN_AUS:
+                quelle, laenge = ZUSAMMENFASSEN_AUS[tabelle]
+                conn.execute(ZUSAMMENFASSEN.format(tabelle=tabelle, quelle=quelle, laenge=laenge), (unten, oben))
+            else:
+                conn.execute(NEU_AUFBAUEN.format(tabelle=tabelle, zeitraum=zeitraum.format(ts=LOKALZEIT),
+                                                 bedingung=BEREICH), tage)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    logging.info("🧮 Verdichtete Tabellen von %s bis %s neu aufgebaut in %.1f s", tage[0], tage[1],
+                 time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tabellen tag/monat/jahr aus messwerte_v2 und messwerte_stunde neu aufbauen")
+    parser.add_argument("--db", default="/app/data/strom.sqlite", help="Pfad zur SQLite-Datenbank")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout=5000")
+    try:
+        schema_anlegen(conn)
+        neu_aufbauen(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# Dekodierung von SML-Telegrammen (Smart Message Language, BSI TR-03109-1).
+# Das Telegramm wird genau einmal von vorne nach hinten durchlaufen; alle Werte
+# werden direkt aus den Bytes gelesen (keine Umwege über .hex()/int(..., 16)).
+# LayoutCache merkt sich nach einer vollständigen Dekodierung die Positionen
+# der Werte und liest folgende Telegramme gleichen Aufbaus mit struct.
+import struct
+
+START_ESCAPE = b"\x1b\x1b\x1b\x1b\x01\x01\x01\x01"
+
+# TL-Feld: Typ im oberen Nibble (ohne Fortsetzungsbit), Länge im unteren Nibble
+TYP_OCTET = 0x00
+TYP_BOOLEAN = 0x40
+TYP_INTEGER = 0x50
+TYP_UNSIGNED = 0x60
+TYP_LISTE = 0x70
+
+# Nachrichtentypen
+GET_LIST_RES = 0x0701
+
+# Einheiten nach DLMS/IEC 62056-62 (Auswahl)
+EINHEITEN = {
+    27: "W",
+    28: "VA",
+    29: "var",
+    30: "Wh",
+    31: "VAh",
+    32: "varh",
+    33: "A",
+    35: "V",
+    44: "Hz",
+}
+
+
+class SmlFehler(ValueError):
+    """
+    Fehler beim Dekodieren eines SML-Telegramms.
+    """
+
+
+class ObisEintrag:
+    """
+    Ein Eintrag aus der Werteliste einer SML_GetList.Res.
+    :param obis: Der OBIS-Code (6 Bytes, z. B. b"\\x01\\x00\\x01\\x08\\x00\\xff").
+    :param einheit: Der DLMS-Einheitencode (int) oder None.
+    :param skala: Der Skalierungsexponent (int), 0 wenn nicht angegeben.
+    :param wert: Der Rohwert (int, bytes oder bool).
+    :param positionen: Positionen im Telegramm (objName, status, unit, value, Ende value) oder None.
+    """
+    __slots__ = ("obis", "einheit", "skala", "wert", "positionen")
+
+    def __init__(self, obis, einheit, skala, wert, positionen=None):
+        self.obis = obis
+        self.einheit = einheit
+        self.skala = skala
+        self.wert = wert
+        self.positionen = positionen
+
+    def __repr__(self):
+        return "ObisEintrag(%s, einheit=%s, skala=%s, wert=%r)" % (
+            obis_text(self.obis), self.einheit, self.skala, self.wert)
+
+
+def obis_text(obis):
+    """
+    Formatiert einen OBIS-Code lesbar.
+    :param obis: Der OBIS-Code (6 Bytes).
+    :return: String, z. B. '1-0:1.8.0*255'.
+    Beispiel: b"\\x01\\x00\\x01\\x08\\x00\\xff" wird zu '1-0:1.8.0*255'.
+    """
+    if len(obis) != 6:
+        return obis.hex()
+    return "%d-%d:%d.%d.%d*%d" % tuple(obis)
+
+
+def einheit_text(einheit):
+    """
+    Liefert die Einheit als String.
+    :param einheit: Der DLMS-Einheitencode (int) oder None.
+    :return: Die Einheit als String (z. B. "Wh").
+    """
+    if einheit is None:
+        return None
+    return EINHEITEN.get(einheit, "unbekannte Einheit")
+
+
+def _tl_lesen(daten, pos):
+    """
+    Liest ein (ggf. mehrbytiges) TL-Feld.
+    :param daten: Das Telegramm (bytes/memoryview).
+    :param pos: Position des TL-Felds.
+    :return: Tuple (typ, laenge, tl_bytes).
+    Bei Listen ist laenge die Anzahl der Elemente, sonst die Gesamtlänge inkl. TL-Feld.
+    """
+    b = daten[pos]
+    typ = b & 0x70
+    laenge = b & 0x0F
+    tl_bytes = 1
+    while b & 0x80:
+        b = daten[pos + tl_bytes]
+        laenge = (laenge << 4) | (b & 0x0F)
+        tl_bytes += 1
+    return typ, laenge, tl_bytes
+
+
+def _element_lesen(daten, pos):
+    """
+    Liest ein beliebiges SML-Element (rekursiv für Listen).
+    :param daten: Das Telegramm (bytes/memoryview).
+    :param pos: Position des TL-Felds.
+    :return: Tuple (wert, neue_position). Nicht belegte optionale Felder (0x01) liefern None.
+    """
+    typ, laenge, tl_bytes = _tl_lesen(daten, pos)
+    if typ == TYP_LISTE:
+        pos += tl_bytes
+        werte = []
+        for _ in range(laenge):
+            wert, pos = _element_lesen(daten, pos)
+            werte.append(wert)
+        return werte, pos
+
+    ende = pos + laenge
+    if laenge < tl_bytes or ende > len(daten):
+        raise SmlFehler("Ungültige Länge an Position %d" % pos)
+    start = pos + tl_bytes
+    if typ == TYP_OCTET:
+        if start == ende:
+            return None, ende  # optionales Feld nicht belegt
+        return bytes(daten[start:ende]), ende
+    if typ == TYP_INTEGER:
+        return int.from_bytes(daten[start:ende], "big", signed=True), ende
+    if typ == TYP_UNSIGNED:
+        return int.from_bytes(daten[start:ende], "big", signed=False), ende
+    if typ == TYP_BOOLEAN:
+        return daten[start] != 0, ende
+    raise SmlFehler("Unbekannter Typ 0x%02x an Position %d" % (typ, pos))
+
+
+def _element_ueberspringen(daten, pos):
+    """
+    Überspringt ein SML-Element, ohne den Wert zu erzeugen.
+    :param daten: Das Telegramm (bytes/memoryview).
+    :param pos: Position des TL-Felds.
+    :return: Position hinter dem Element.
+    """
+    b = daten[pos]
+    if b & 0x80:
+        typ, laenge, tl_bytes = _tl_lesen(daten, pos)
+    else:
+        typ, laenge, tl_bytes = b & 0x70, b & 0x0F, 1
+    if typ == TYP_LISTE:
+        pos += tl_bytes
+        for _ in range(laenge):
+            pos = _element_ueberspringen(daten, pos)
+        return pos
+    if laenge < tl_bytes:
+        raise SmlFehler("Ungültige Länge an Position %d" % pos)
+    return pos + laenge
+
+
+def _liste_erwarten(daten, pos, anzahl=None):
+    """
+    Prüft, dass an pos eine Liste beginnt.
+    :return: Tuple (anzahl_elemente, position_erstes_element).
+    """
+    typ, laenge, tl_bytes = _tl_lesen(daten, pos)
+    if typ != TYP_LISTE or (anzahl is not None and laenge != anzahl):
+        raise SmlFehler("Liste erwartet an Position %d" % pos)
+    return laenge, pos + tl_bytes
+
+
+def _get_list_res_lesen(daten, pos, eintraege):
+    """
+    Liest den Körper einer SML_GetList.Res und hängt die Werte an `eintraege` an.
+    :return: Position hinter dem Nachrichtenkörper.
+    """
+    _, pos = _liste_erwarten(daten, pos, 7)
+    for _ in range(4):  # clientId, serverId, listName, actSensorTime
+        pos = _element_ueberspringen(daten, pos)
+
+    anzahl, pos = _liste_erwarten(daten, pos)  # valList
+    for _ in range(anzahl):
+        _, obis_pos = _liste_erwarten(daten, pos, 7)
+        obis, status_pos = _element_lesen(daten, obis_pos)
+        pos = _element_ueberspringen(daten, status_pos)   # status
+        einheit_pos = _element_ueberspringen(daten, pos)  # valTime
+        einheit, pos = _element_lesen(daten, einheit_pos)
+        skala, wert_pos = _element_lesen(daten, pos)
+        wert, wert_ende = _element_lesen(daten, wert_pos)
+        pos = _element_ueberspringen(daten, wert_ende)    # valueSignature
+        eintraege.append(ObisEintrag(obis, einheit, skala or 0, wert,
+                                     (obis_pos, status_pos, einheit_pos, wert_pos, wert_ende)))
+
+    pos = _element_ueberspringen(daten, pos)  # listSignature
+    pos = _element_ueberspringen(daten, pos)  # actGatewayTime
+    return pos
+
+
+def sml_dekodieren(daten):
+    """
+    Dekodiert ein SML-Telegramm in einem Durchlauf und liefert alle OBIS-Werte
+    aller enthaltenen SML_GetList.Res-Nachrichten.
+    Akzeptiert das Telegramm mit oder ohne Start-Escape; Füllbytes und das
+    Ende-Escape werden ignoriert. Die CRC wird hier nicht geprüft.
+    :param daten: Das SML-Telegramm (bytes, bytearray oder memoryview).
+    :return: Liste von ObisEintrag in der Reihenfolge des Telegramms.
+    :raises SmlFehler: Wenn das Telegramm nicht dem SML-Aufbau entspricht.
+    Beispiel: {e.obis: e for e in sml_dekodieren(telegramm)}
+    """
+    eintraege = []
+    pos = len(START_ESCAPE) if daten[:len(START_ESCAPE)] == START_ESCAPE else 0
+    ende = len(daten)
+    try:
+        while pos < ende:
+            b = daten[pos]
+            if b == 0x00:       # Füllbyte
+                pos += 1
+                continue
+            if b == 0x1b:       # Ende-Escape
+                break
+
+            # SML-Nachricht: transactionId, groupNo, abortOnError, messageBody, crc16, endOfSmlMsg
+            _, pos = _liste_erwarten(daten, pos, 6)
+            for _ in range(3):  # transactionId, groupNo, abortOnError
+                pos = _element_ueberspringen(daten, pos)
+            _, pos = _liste_erwarten(daten, pos, 2)
+            tag, pos = _element_lesen(daten, pos)
+            if tag == GET_LIST_RES:
+                pos = _get_list_res_lesen(daten, pos, eintraege)
+            else:
+                pos = _element_ueberspringen(daten, pos)
+            pos = _element_ueberspringen(daten, pos)  # crc16
+            if daten[pos] != 0x00:
+                raise SmlFehler("endOfSmlMsg erwartet an Position %d" % pos)
+            pos += 1
+    except IndexError:
+        raise SmlFehler("Telegramm unvollständig") from None
+    return eintraege
+
+
+# struct-Formate für Ganzzahlen nach Länge in Bytes (big endian)
+_INT_FORMATE = {1: "b", 2: "h", 4: "i", 8: "q"}
+_UINT_FORMATE = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+
+def _format_bauen(abschnitte):
+    """
+    Baut ein struct-Format aus (position, format, groesse)-Abschnitten mit Füllbytes dazwischen.
+    :param abschnitte: Nach Position sortierte Liste von (position, format, groesse).
+    :return: Tuple (struct.Struct, startposition).
+    """
+    start = abschnitte[0][0]
+    fmt = ">"
+    aktuell = start
+    for position, code, groesse in abschnitte:
+        if position > aktuell:
+            fmt += "%dx" % (position - aktuell)
+        fmt += code
+        aktuell = position + groesse
+    return struct.Struct(fmt), start
+
+
+class TelegrammLayout:
+    """
+    Gelernter Aufbau eines Telegramms: Positionen und Formate aller OBIS-Werte.
+    :param laenge: Die Länge des Telegramms in Bytes.
+    :param pruefung: struct.Struct für die Prüfbytes (OBIS-Codes, Einheit, Skalierung, TL-Felder).
+    :param pruefung_start: Startposition der Prüfbytes.
+    :param erwartet: Die erwarteten Prüfbytes (Fingerabdruck) als Tuple.
+    :param werte: struct.Struct für alle Werte.
+    :param werte_start: Startposition der Werte.
+    :param felder: Liste von (obis, einheit, skala, umwandlung, positionen, konstante) je Eintrag.
+    """
+    __slots__ = ("laenge", "pruefung", "pruefung_start", "erwartet", "werte", "werte_start", "felder")
+
+    def __init__(self, laenge, pruefung, pruefung_start, erwartet, werte, werte_start, felder):
+        self.laenge = laenge
+        self.pruefung = pruefung
+        self.pruefung_start = pruefung_start
+        self.erwartet = erwartet
+        self.werte = werte
+        self.werte_start = werte_start
+        self.felder = felder
+
+    def passt(self, daten):
+        """
+        Prüft, ob das Telegramm denselben Aufbau hat.
+        :param daten: Das Telegramm.
+        :return: True, wenn alle Prüfbytes übereinstimmen.
+        """
+        return self.pruefung.unpack_from(daten, self.pruefung_start) == self.erwartet
+
+    def lesen(self, daten):
+        """
+        Liest alle Werte mit einem einzigen unpack_from().
+        :param daten: Das Telegramm (muss passt() erfüllen).
+        :return: Liste von ObisEintrag.
+        """
+        rohwerte = iter(self.werte.unpack_from(daten, self.werte_start)) if self.werte else iter(())
+        eintraege = []
+        for obis, einheit, skala, umwandlung, positionen, konstante in self.felder:
+            if umwandlung is None:
+                wert = konstante
+            else:
+                wert = next(rohwerte)
+                if umwandlung is not True:
+                    wert = umwandlung(wert)
+            eintraege.append(ObisEintrag(obis, einheit, skala, wert, positionen))
+        return eintraege
+
+
+def layout_lernen(daten, eintraege):
+    """
+    Erzeugt aus einem vollständig dekodierten Telegramm ein TelegrammLayout.
+    :param daten: Das Telegramm.
+    :param eintraege: Das Ergebnis von sml_dekodieren(daten).
+    :return: TelegrammLayout oder None, wenn der Aufbau nicht mit struct lesbar ist.
+    """
+    if not eintraege:
+        return None
+    pruef_abschnitte = []
+    wert_abschnitte = []
+    felder = []
+    for eintrag in eintraege:
+        if eintrag.positionen is None:
+            return None
+        obis_pos, status_pos, einheit_pos, wert_pos, wert_ende = eintrag.positionen
+        typ, _, tl_bytes = _tl_lesen(daten, wert_pos)
+        inhalt = wert_pos + tl_bytes
+        groesse = wert_ende - inhalt
+
+        # Prüfbytes: objName sowie unit, scaler und TL-Feld des Werts
+        pruef_abschnitte.append((obis_pos, "%ds" % (status_pos - obis_pos), status_pos - obis_pos))
+        pruef_abschnitte.append((einheit_pos, "%ds" % (inhalt - einheit_pos), inhalt - einheit_pos))
+
+        umwandlung = True
+        if typ == TYP_LISTE:
+            return None
+        if groesse == 0:
+            umwandlung = None  # leerer Octet-String, Wert ist konstant None
+        elif typ == TYP_OCTET:
+            wert_abschnitte.append((inhalt, "%ds" % groesse, groesse))
+        elif typ == TYP_BOOLEAN:
+            wert_abschnitte.append((inhalt, "?", 1))
+        elif groesse in _INT_FORMATE:
+            formate = _INT_FORMATE if typ == TYP_INTEGER else _UINT_FORMATE
+            wert_abschnitte.append((inhalt, formate[groesse], groesse))
+        else:
+            # z. B. 3 oder 5 Bytes lange Ganzzahlen
+            wert_abschnitte.append((inhalt, "%ds" % groesse, groesse))
+            vorzeichen = typ == TYP_INTEGER
+            umwandlung = lambda b, v=vorzeichen: int.from_bytes(b, "big", signed=v)  # noqa: E731
+        felder.append((eintrag.obis, eintrag.einheit, eintrag.skala, umwandlung, eintrag.positionen, eintrag.wert))
+
+    pruefung, pruefung_start = _format_bauen(pruef_abschnitte)
+    werte, werte_start = _format_bauen(wert_abschnitte) if wert_abschnitte else (None, 0)
+    erwartet = pruefung.unpack_from(daten, pruefung_start)
+    return TelegrammLayout(len(daten), pruefung, pruefung_start, erwartet, werte, werte_start, felder)
+
+
+class LayoutCache:
+    """
+    Cache für den Telegrammaufbau eines Zählers.
+    Ein Zähler sendet jede Sekunde ein Telegramm mit identischem Aufbau. Nach der
+    ersten vollständigen Dekodierung werden die Positionen aller Werte als
+    struct.Struct gespeichert (Schlüssel: Telegrammlänge, Fingerabdruck: OBIS-Codes,
+    Einheiten, Skalierungen und TL-Felder). Folgende Telegramme werden nur noch an
+    diesen Prüfbytes verglichen und mit einem unpack_from() gelesen. Passt der
+    Fingerabdruck nicht, wird vollständig dekodiert und neu gelernt.
+    Pro Zähler eine eigene Instanz verwenden.
+    :param max_layouts: Maximale Anzahl gespeicherter Layouts.
+    """
+    def __init__(self, max_layouts=4):
+        self.max_layouts = max_layouts
+        self._layouts = {}
+        self.treffer = 0
+        self.fehlschlaege = 0
+
+    def dekodieren(self, daten):
+        """
+        Dekodiert ein Telegramm, wenn möglich über das gelernte Layout.
+        :param daten: Das SML-Telegramm (bytes, bytearray oder memoryview).
+        :return: Liste von ObisEintrag (wie sml_dekodieren).
+        :raises SmlFehler: Wenn das Telegramm nicht dem SML-Aufbau entspricht.
+        """
+        layout = self._layouts.get(len(daten))
+        if layout is not None and layout.passt(daten):
+            self.treffer += 1
+            return layout.lesen(daten)
+
+        self.fehlschlaege += 1
+        eintraege = sml_dekodieren(daten)
+        layout = layout_lernen(daten, eintraege)
+        if layout is not None:
+            if len(daten) not in self._layouts and len(self._layouts) >= self.max_layouts:
+                self._layouts.pop(next(iter(self._layouts)))  # ältestes Layout verwerfen
+            self._layouts[len(daten)] = layout
+        return eintraege
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import logging
+
+
+class RingPuffer:
+    """
+    Vorallokierter Empfangspuffer für die seriellen Rohdaten.
+    Die Bytes werden blockweise direkt in ein bytearray gelesen (readinto),
+    Telegramme werden als memoryview-Ausschnitte ohne Kopie herausgegeben.
+    Erreicht der Schreibzeiger das Ende, werden nur die noch nicht
+    verbrauchten Bytes an den Anfang verschoben (das sind in der Regel
+    weniger als ein Telegramm).
+    Alle Positionen der öffentlichen Methoden sind relativ zum Lesezeiger.
+    :param kapazitaet: Größe des Puffers in Bytes.
+    :param blockgroesse: Maximale Anzahl Bytes pro Lesezugriff.
+    """
+    def __init__(self, kapazitaet=4096, blockgroesse=512):
+        self.kapazitaet = kapazitaet
+        self.blockgroesse = blockgroesse
+        self._puffer = bytearray(kapazitaet)
+        self._ansicht = memoryview(self._puffer)
+        self._lesen = 0       # erstes noch nicht verbrauchtes Byte
+        self._schreiben = 0   # erstes freies Byte
+        self.verworfen = 0    # Anzahl Bytes, die wegen Überlauf verworfen wurden
+
+    def __len__(self):
+        return self._schreiben - self._lesen
+
+    def _platz_schaffen(self, benoetigt):
+        """
+        Sorgt dafür, dass hinter dem Schreibzeiger mindestens `benoetigt` Bytes frei sind.
+        :param benoetigt: Anzahl der benötigten freien Bytes.
+        """
+        if self.kapazitaet - self._schreiben >= benoetigt:
+            return
+        belegt = self._schreiben - self._lesen
+        if belegt + benoetigt > self.kapazitaet:
+            # Kein vollständiges Telegramm in Sicht -> älteste Bytes verwerfen
+            zuviel = belegt + benoetigt - self.kapazitaet
+            logging.warning("⚠️ Empfangspuffer voll, verwerfe %d Bytes", zuviel)
+            self.verworfen += zuviel
+            self._lesen += zuviel
+            belegt -= zuviel
+        # Restdaten an den Anfang verschieben (gleich lange Slice-Zuweisung, kein Realloc).
+        # Quelle und Ziel können sich überlappen, daher über eine kurze Zwischenkopie.
+        self._puffer[0:belegt] = bytes(self._ansicht[self._lesen:self._schreiben])
+        self._lesen = 0
+        self._schreiben = belegt
+
+    def einlesen(self, ser):
+        """
+        Liest alle aktuell verfügbaren Bytes (in_waiting) vom seriellen Port,
+        oder, wenn noch nichts wartet, einen Block, und schreibt sie direkt in den Puffer.
+        Blockiert höchstens bis zum Timeout des Ports.
+        :param ser: Geöffneter serieller Port (serial.Serial oder kompatibel).
+        :return: Anzahl der gelesenen Bytes.
+        """
+        wartend = getattr(ser, "in_waiting", 0)
+        # Nie mehr lesen als frei ist, damit keine ungelesenen Bytes verworfen werden müssen
+        frei = self.kapazitaet - len(self)
+        anzahl = min(wartend or self.blockgroesse, frei) or self.blockgroesse
+        self._platz_schaffen(anzahl)
+        gelesen = ser.readinto(self._ansicht[self._schreiben:self._schreiben + anzahl])
+        if gelesen:
+            self._schreiben += gelesen
+        return gelesen or 0
+
+    def anhaengen(self, daten):
+        """
+        Hängt bereits gelesene Bytes an (z. B. aus einer Datei oder einem Test).
+        :param daten: Die Bytes (bytes-like).
+        """
+        laenge = len(daten)
+        self._platz_schaffen(laenge)
+        self._puffer[self._schreiben:self._schreiben + laenge] = daten
+        self._schreiben += laenge
+
+    def finden(self, muster, ab=0):
+        """
+        Sucht ein Bytemuster im belegten Bereich.
+        :param muster: Das gesuchte Bytemuster.
+        :param ab: Startposition der Suche (relativ zum Lesezeiger).
+        :return: Position relativ zum Lesezeiger oder -1.
+        """
+        idx = self._puffer.find(muster, self._lesen + ab, self._schreiben)
+        return idx - self._lesen if idx != -1 else -1
+
+    def ansicht(self, start, ende):
+        """
+        Gibt einen schreibgeschützten Ausschnitt ohne Kopie zurück.
+        Der Ausschnitt ist nur bis zum nächsten Aufruf von einlesen()/anhaengen() gültig.
+        :param start: Startposition (relativ zum Lesezeiger).
+        :param ende: Endposition (exklusiv, relativ zum Lesezeiger).
+        :return: memoryview auf die Bytes.
+        """
+        return self._ansicht[self._lesen + start:self._lesen + ende].toreadonly()
+
+    def verwerfen(self, anzahl):
+        """
+        Markiert die ersten `anzahl` Bytes als verbraucht.
+        :param anzahl: Anzahl der verbrauchten Bytes.
+        """
+        self._lesen = min(self._lesen + anzahl, self._schreiben)
+        if self._lesen == self._schreiben:
+            self._lesen = self._schreiben = 0
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+import logging
+
+ESCAPE = b"\x1b\x1b\x1b\x1b"
+START_KENNUNG = b"\x01\x01\x01\x01"
+
+# Zustände des Scanners
+SUCHE_START = 0    # warte auf 1b1b1b1b 01010101
+IM_TELEGRAMM = 1   # Start gefunden, warte auf 1b1b1b1b 1a xx crc crc
+
+
+class SmlScanner:
+    """
+    Zustandsautomat, der SML-Telegramme aus dem Empfangspuffer schneidet.
+    Der Scanner rastet auf die Startsequenz 1b1b1b1b 01010101 ein und liefert
+    vollständige Telegramme (Start-Escape bis einschließlich CRC) als memoryview.
+    Die Suchposition wird gemerkt, so dass jedes Byte nur einmal betrachtet wird.
+    Bei CRC-Fehlern, abgebrochenen Telegrammen oder einem halben Telegramm beim
+    Start wird ab der nächsten Startsequenz neu synchronisiert.
+    :param puffer: Der RingPuffer mit den empfangenen Bytes.
+    :param crc_pruefung: Funktion (crc_raw, daten) -> bool, None = keine Prüfung.
+    :param max_laenge: Maximale Telegrammlänge in Bytes, danach wird neu synchronisiert.
+    """
+    def __init__(self, puffer, crc_pruefung=None, max_laenge=2048):
+        self.puffer = puffer
+        self.crc_pruefung = crc_pruefung
+        self.max_laenge = min(max_laenge, puffer.kapazitaet // 2)
+        self._zustand = SUCHE_START
+        self._suchpos = 0
+        self._verworfen_puffer = puffer.verworfen
+        # Zähler für Diagnose/Logging
+        self.telegramme = 0
+        self.crc_fehler = 0
+        self.resyncs = 0
+        self.verworfen = 0
+
+    def _verwerfen(self, anzahl):
+        """
+        Verwirft Bytes am Anfang des Puffers und passt die Suchposition an.
+        :param anzahl: Anzahl der zu verwerfenden Bytes.
+        """
+        if anzahl <= 0:
+            return
+        self.puffer.verwerfen(anzahl)
+        self._suchpos = max(0, self._suchpos - anzahl)
+
+    def _neu_synchronisieren(self, grund):
+        """
+        Verwirft das aktuelle Telegramm ab seinem Start-Escape und sucht die nächste Startsequenz.
+        Bytes hinter dem Start-Escape bleiben erhalten, da dort bereits das nächste Telegramm beginnen kann.
+        :param grund: Text für das Debug-Log.
+        """
+        logging.debug("🔁 Neusynchronisation (%s)", grund)
+        self.resyncs += 1
+        self._verwerfen(len(ESCAPE))
+        self.verworfen += len(ESCAPE)
+        self._zustand = SUCHE_START
+        self._suchpos = 0
+
+    def telegramme_lesen(self):
+        """
+        Liefert alle vollständigen Telegramme, die aktuell im Puffer liegen.
+        Jedes Telegramm ist nur bis zum nächsten Schritt des Generators gültig
+        (danach wird es im Puffer freigegeben).
+        :return: Generator über memoryview-Objekte (Start-Escape bis CRC).
+        """
+        puffer = self.puffer
+        if puffer.verworfen != self._verworfen_puffer:
+            # Der Puffer ist übergelaufen -> Positionen stimmen nicht mehr
+            self._verworfen_puffer = puffer.verworfen
+            self._zustand = SUCHE_START
+            self._suchpos = 0
+
+        while True:
+            esc = puffer.finden(ESCAPE, self._suchpos)
+            if esc == -1:
+                # Die letzten 3 Bytes können der Anfang eines Escapes sein
+                rest = max(0, len(puffer) - len(ESCAPE) + 1)
+                if self._zustand == SUCHE_START:
+                    self.verworfen += rest
+                    self._verwerfen(rest)
+                    self._suchpos = 0
+                elif rest > self.max_laenge:
+                    self._neu_synchronisieren("Telegramm zu lang")
+                    continue
+                else:
+                    self._suchpos = rest
+                return
+
+            if len(puffer) < esc + 8:
+                # Escape-Sequenz noch nicht vollständig empfangen
+                if self._zustand == SUCHE_START:
+                    self.verworfen += esc
+                    self._verwerfen(esc)
+                    esc = 0
+                self._suchpos = esc
+                return
+
+            kennung = puffer.ansicht(esc + 4, esc + 8)
+            if kennung == START_KENNUNG:
+                if self._zustand == IM_TELEGRAMM:
+                    # Neuer Start mitten im Telegramm -> vorheriges war unvollständig
+                    logging.debug("🔁 Neusynchronisation (Telegramm abgebrochen)")
+                    self.resyncs += 1
+                self.verworfen += esc
+                self._verwerfen(esc)
+                self._zustand = IM_TELEGRAMM
+                self._suchpos = 8
+                continue
+
+            if self._zustand == SUCHE_START:
+                # Kein Start -> ein Byte weiter suchen (die Startsequenz kann überlappen)
+                self.verworfen += esc + 1
+                self._verwerfen(esc + 1)
+                self._suchpos = 0
+                continue
+
+            if kennung == ESCAPE:
+                # Maskierte 1b1b1b1b im Nutzdatenbereich
+                self._suchpos = esc + 8
+                continue
+
+            if kennung[0] != 0x1a:
+                self._neu_synchronisieren("unbekannte Escape-Sequenz %s" % bytes(kennung).hex())
+                continue
+
+            ende = esc + 8
+            telegramm = puffer.ansicht(0, ende)
+            if self.crc_pruefung is not None and not self.crc_pruefung(telegramm[ende - 2:ende], telegramm[:ende - 2]):
+                self.crc_fehler += 1
+                self._neu_synchronisieren("CRC-Fehler")
+                continue
+
+            self.telegramme += 1
+            yield telegramm
+            self._verwerfen(ende)
+            self._zustand = SUCHE_START
+            self._suchpos = 0
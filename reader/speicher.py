@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+import logging
+import sqlite3
+import time
+from datetime import datetime
+
+import rollup
+
+# Messwerte (v2): nach Zähler und Zeit geclustert (WITHOUT ROWID, kein zusätzlicher Index),
+# Zeit als Unix-Zeit in Sekunden (UTC), Zählerstände in mWh, Leistung in W, alles als Ganzzahl
+SCHEMA_MESSWERTE = """
+CREATE TABLE IF NOT EXISTS messwerte_v2 (
+    zaehler_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    bezug_mwh INTEGER,
+    einspeisung_mwh INTEGER,
+    leistung_w INTEGER,
+    leistung_min_w INTEGER,
+    leistung_max_w INTEGER,
+    leistung_avg_w INTEGER,
+    anzahl_telegramme INTEGER,
+    PRIMARY KEY (zaehler_id, ts)
+) WITHOUT ROWID
+"""
+
+# Kompatibilität: messwerte mit den alten Spalten (lokale Zeit als ISO-Text, kWh) für alte
+# Abfragen und Skripte. Abfragen über die Sicht können keinen Index nutzen; Zeiträume
+# daher direkt auf messwerte_v2 über ts abfragen.
+SCHEMA_KOMPATIBEL = [
+    """
+    CREATE VIEW IF NOT EXISTS messwerte AS
+    SELECT zaehler_id,
+           strftime('%Y-%m-%dT%H:%M:%S', ts, 'unixepoch', 'localtime') AS timestamp,
+           bezug_mwh / 1e6 AS bezug_kwh,
+           einspeisung_mwh / 1e6 AS einspeisung_kwh,
+           leistung_w AS wirkleistung_watt,
+           leistung_min_w AS wirkleistung_min,
+           leistung_max_w AS wirkleistung_max,
+           leistung_avg_w AS wirkleistung_avg,
+           anzahl_telegramme
+    FROM messwerte_v2
+    """,
+    # INSERT in die Sicht (alte Schreiber): Zeit ohne Zeitzone gilt als lokale Zeit; ein zweiter
+    # Messwert derselben Sekunde wird wie bei SqliteSchreiber.INSERT_MESSWERT verworfen
+    """
+    CREATE TRIGGER IF NOT EXISTS messwerte_einfuegen INSTEAD OF INSERT ON messwerte
+    BEGIN
+        INSERT OR IGNORE INTO messwerte_v2 (zaehler_id, ts, bezug_mwh, einspeisung_mwh, leistung_w,
+                                  leistung_min_w, leistung_max_w, leistung_avg_w, anzahl_telegramme)
+        VALUES (NEW.zaehler_id,
+                CAST(CASE WHEN NEW.timestamp GLOB '*Z' OR NEW.timestamp GLOB '*[+-][0-9][0-9]:[0-9][0-9]'
+                          THEN strftime('%s', NEW.timestamp)
+                          ELSE strftime('%s', NEW.timestamp, 'utc') END AS INTEGER),
+                CAST(round(NEW.bezug_kwh * 1e6) AS INTEGER), CAST(round(NEW.einspeisung_kwh * 1e6) AS INTEGER),
+                CAST(round(NEW.wirkleistung_watt) AS INTEGER), CAST(round(NEW.wirkleistung_min) AS INTEGER),
+                CAST(round(NEW.wirkleistung_max) AS INTEGER), CAST(round(NEW.wirkleistung_avg) AS INTEGER),
+                NEW.anzahl_telegramme);
+    END
+    """,
+]
+
+
+def epoch(zeitpunkt):
+    """
+    :param zeitpunkt: ISO-Zeitpunkt; ohne Zeitzone gilt er als lokale Zeit, "Z" als UTC.
+    :return: Unix-Zeit in ganzen Sekunden.
+    """
+    if zeitpunkt.endswith("Z"):
+        zeitpunkt = zeitpunkt[:-1] + "+00:00"
+    return int(datetime.fromisoformat(zeitpunkt).timestamp())
+
+
+def ganzzahl(wert, faktor=1):
+    """
+    :return: round(wert * faktor) oder None.
+    """
+    return None if wert is None else round(wert * faktor)
+
+
+def zeile_v2(zeile):
+    """
+    Wandelt einen Messwert im bisherigen Format (Reihenfolge der alten Spalten, kWh, ISO-Zeit)
+    in eine Zeile für messwerte_v2 um.
+    :param zeile: (zaehler_id, timestamp, bezug_kwh, einspeisung_kwh, wirkleistung_watt,
+                   wirkleistung_min, wirkleistung_max, wirkleistung_avg, anzahl_telegramme)
+    :return: Tupel in der Reihenfolge von SqliteSchreiber.INSERT_MESSWERT.
+    """
+    zaehler_id, timestamp, bezug, einspeisung, watt, watt_min, watt_max, watt_avg, anzahl = zeile
+    return (zaehler_id, epoch(timestamp), ganzzahl(bezug, 1000000), ganzzahl(einspeisung, 1000000),
+            ganzzahl(watt), ganzzahl(watt_min), ganzzahl(watt_max), ganzzahl(watt_avg), anzahl)
+
+
+def schema_anlegen(conn):
+    """
+    Legt zaehler, messwerte_v2 und die Sicht messwerte an, falls sie nicht existieren.
+    Solange noch die alte Tabelle messwerte existiert (vor migration_v2.py), gibt es keine Sicht.
+    :param conn: Offene SQLite-Verbindung.
+    :return: True, wenn die alte Tabelle messwerte noch existiert.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS zaehler (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        seriennummer TEXT UNIQUE,
+        hersteller TEXT,
+        name TEXT
+    )
+    """)
+    conn.execute(SCHEMA_MESSWERTE)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messwerte'").fetchone():
+        return True
+    for sql in SCHEMA_KOMPATIBEL:
+        conn.execute(sql)
+    return False
+
+
+class SqliteSchreiber:
+    """
+    Langlebiger Schreiber für die SQLite-Datenbank des Readers.
+    Hält eine Verbindung im WAL-Modus offen, merkt sich die Zähler-IDs je
+    Seriennummer und fasst mehrere Messwerte zu einer Transaktion zusammen.
+    Geschrieben wird, sobald `max_zeilen` Messwerte anstehen oder der älteste
+    wartende Messwert älter als `max_wartezeit` Sekunden ist, spätestens aber
+    beim Aufruf von schliessen().
+    :param db_pfad: Pfad zur SQLite-Datei.
+    :param max_wartezeit: Maximale Zeit in Sekunden, die ein Messwert im Speicher wartet.
+    :param max_zeilen: Maximale Anzahl Messwerte pro Transaktion.
+    :param synchronous: SQLite synchronous-Modus (NORMAL: kein fsync pro Commit im WAL-Modus).
+    """
+    # OR IGNORE: ein Messwert, den data-migration.py schon aus der Historie übernommen hat,
+    # lässt nicht den ganzen Batch scheitern
+    INSERT_MESSWERT = """
+        INSERT OR IGNORE INTO messwerte_v2 (zaehler_id, ts, bezug_mwh, einspeisung_mwh, leistung_w,
+                                            leistung_min_w, leistung_max_w, leistung_avg_w, anzahl_telegramme)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(self, db_pfad, max_wartezeit=60, max_zeilen=100, synchronous="NORMAL"):
+        self.db_pfad = db_pfad
+        self.max_wartezeit = max_wartezeit
+        self.max_zeilen = max_zeilen
+        self._zaehler_ids = {}
+        self._wartend = []
+        self._erster_wartend = None
+        # Statistik
+        self.commits = 0
+        self.zeilen = 0
+        self.letzte_dauer = 0.0
+
+        self.conn = sqlite3.connect(db_pfad, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=%s" % synchronous)
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.schema_anlegen()
+        logging.debug("💾 SQLite geöffnet (WAL, synchronous=%s): %s", synchronous, db_pfad)
+
+    def schema_anlegen(self):
+        """
+        Legt Tabellen und Sicht an, falls sie nicht existieren (siehe schema_anlegen()).
+        """
+        if schema_anlegen(self.conn):
+            logging.warning("⚠️ Alte Tabelle messwerte vorhanden, neue Messwerte gehen nach messwerte_v2. "
+                            "Bitte migration_v2.py ausführen.")
+
+        # Verdichtete Tabellen (tag/monat/jahr); bei bestehenden Daten einmalig aufbauen
+        rollup.schema_anlegen(self.conn)
+        if rollup.ist_leer(self.conn):
+            logging.info("🧮 Verdichtete Tabellen sind leer, baue sie aus messwerte auf...")
+            rollup.neu_aufbauen(self.conn)
+
+    def zaehler_id(self, seriennummer, hersteller):
+        """
+        Liefert die Zähler-ID zur Seriennummer (aus dem Cache, sonst aus der Datenbank).
+        Unbekannte Zähler werden angelegt.
+        :param seriennummer: Die Seriennummer des Zählers.
+        :param hersteller: Der Hersteller des Zählers.
+        :return: Die ID aus der Tabelle zaehler.
+        """
+        zaehler_id = self._zaehler_ids.get(seriennummer)
+        if zaehler_id is not None:
+            return zaehler_id
+
+        row = self.conn.execute("SELECT id FROM zaehler WHERE seriennummer = ?", (seriennummer,)).fetchone()
+        if row:
+            zaehler_id = row[0]
+            logging.debug("🔍 Zähler-ID gefunden: %s", zaehler_id)
+        else:
+            zaehler_id = self.conn.execute(
+                "INSERT INTO zaehler (seriennummer, hersteller) VALUES (?, ?)", (seriennummer, hersteller)
+            ).lastrowid
+            logging.debug("💾 Neuer Zähler in SQLite gespeichert: %s", (seriennummer, hersteller))
+        self._zaehler_ids[seriennummer] = zaehler_id
+        return zaehler_id
+
+    def speichern(self, seriennummer, hersteller, bezug_kwh, einspeisung_kwh, wirkleistung_watt, timestamp=None,
+                  wirkleistung_min=None, wirkleistung_max=None, wirkleistung_avg=None, anzahl_telegramme=None):
+        """
+        Nimmt einen Messwert entgegen; geschrieben wird gesammelt (siehe Klassenbeschreibung).
+        :param seriennummer: Die Seriennummer des Zählers.
+        :param hersteller: Der Hersteller des Zählers.
+        :param bezug_kwh: Der Bezug in kWh.
+        :param einspeisung_kwh: Die Einspeisung in kWh.
+        :param wirkleistung_watt: Die (letzte) Wirkleistung in Watt.
+        :param timestamp: Zeitpunkt (ISO-String), Standard: jetzt (lokale Zeit).
+        :param wirkleistung_min: Minimale Wirkleistung im Intervall.
+        :param wirkleistung_max: Maximale Wirkleistung im Intervall.
+        :param wirkleistung_avg: Mittlere Wirkleistung im Intervall.
+        :param anzahl_telegramme: Anzahl der Telegramme im Intervall.
+        """
+        if timestamp is None:
+            timestamp = datetime.now().isoformat()
+        zaehler_id = self.zaehler_id(seriennummer, hersteller)
+        self._wartend.append((zaehler_id, timestamp, bezug_kwh, einspeisung_kwh, wirkleistung_watt,
+                              wirkleistung_min, wirkleistung_max, wirkleistung_avg, anzahl_telegramme))
+        if self._erster_wartend is None:
+            self._erster_wartend = time.monotonic()
+        if self.faellig():
+            self.flush()
+
+    def faellig(self):
+        """
+        :return: True, wenn die wartenden Messwerte geschrieben werden sollen.
+        """
+        if not self._wartend:
+            return False
+        return (len(self._wartend) >= self.max_zeilen
+                or time.monotonic() - self._erster_wartend >= self.max_wartezeit)
+
+    def flush(self):
+        """
+        Schreibt alle wartenden Messwerte in einer Transaktion und rechnet die
+        eingefügten in die verdichteten Tabellen (tag/monat/jahr) ein.
+        """
+        if not self._wartend:
+            return
+        start = time.perf_counter()
+        zeilen = self._wartend
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            # Nur tatsächlich eingefügte Messwerte zählen in tag/monat/jahr; von OR IGNORE
+            # übersprungene (gleicher Zähler und Zeitpunkt, z. B. nach Neustart) sonst doppelt
+            eingefuegt = [zeile for zeile in zeilen
+                          if self.conn.execute(self.INSERT_MESSWERT, zeile_v2(zeile)).rowcount]
+            rollup.aktualisieren(self.conn, eingefuegt)
+            self.conn.execute("COMMIT")
+        except Exception:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+        self._wartend = []
+        self._erster_wartend = None
+        self.commits += 1
+        self.zeilen += len(zeilen)
+        self.letzte_dauer = time.perf_counter() - start
+        logging.debug("💾 %d Messwerte in SQLite gespeichert (%.1f ms)", len(zeilen), self.letzte_dauer * 1000)
+
+    def schliessen(self):
+        """
+        Schreibt die wartenden Messwerte und schließt die Verbindung.
+        """
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+            logging.info("🔒 SQLite geschlossen (%d Commits, %d Messwerte)", self.commits, self.zeilen)
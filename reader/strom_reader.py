@@ -6,11 +6,16 @@ import binascii
 import crcmod
 import argparse
 import os
-import json
-import sqlite3
+import signal
+import threading
 from pathlib import Path
 from zoneinfo import ZoneInfo
 from datetime import datetime
+from sml_decoder import LayoutCache, SmlFehler, einheit_text, obis_text
+from speicher import SqliteSchreiber
+from aggregation import IntervallAggregat
+from historie import JsonHistorie, json_atomar_schreiben
+from pipeline import Quelle, SchreibThread, SeriellerLeser, Warteschlange
 
 # Logging konfigurieren
 parser = argparse.ArgumentParser()
@@ -44,10 +49,8 @@ logging.info("📤 Ausgabemodi: %s", output_modes)
 
 
 # Zeitkontrolle für JSON-Speicherung 
-# Standardwert auf 0 setzen
-# und dann auf den Wert aus environment setzen
+# Wert aus environment setzen (der letzte Schreibzeitpunkt steht je Zähler in ZaehlerZustand)
 # wenn der Wert nicht gesetzt ist, wird der Standardwert 60 Sekunden verwendet
-last_json_write = 0
 wait_time = int(os.getenv("WAIT_TIMER", 60))  # Standardwert 60 Sekunden, kann aber in der .env-Datei überschrieben werden
 # entspricht der Zeit, die gewartet wird, bevor die JSON-Datei/Datenbank gespeichert wird
 logging.info("⏳ Wartezeit für JSON-Speicherung (wait_time): %d Sekunden", wait_time)
@@ -57,63 +60,51 @@ MANUFACTURER = os.getenv("MANUFACTURER", "1")  # Standardwert 1
 logging.info("🏭 Herstellerkennung eingestellt auf: %s", MANUFACTURER) 
 
 # Speicherpfade für JSON
-OUTPUT_PATH = Path("/app/data")
+OUTPUT_PATH = Path(os.getenv("DATA_PATH", "/app/data"))
 logging.debug("📂 Speicherpfad: %s", OUTPUT_PATH)
 HISTORY_PATH = OUTPUT_PATH / "history"
 HISTORY_PATH.mkdir(parents=True, exist_ok=True)
 logging.debug("📂 Historie-Pfad: %s", HISTORY_PATH)
 
 # SQLite-Datei definieren
-DB_PATH = Path("/app/data/strom.sqlite")
+DB_PATH = OUTPUT_PATH / "strom.sqlite"
 logging.debug("📂 SQLite-Pfad: %s", DB_PATH
               )
 # Sicherstellen, dass die Datenbank existiert
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 logging.debug("📂 SQLite-Datenbankverzeichnis erstellt: %s", DB_PATH.parent)
 
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
-
-# Tabellen erstellen, falls sie nicht existieren
-c.execute("""
-CREATE TABLE IF NOT EXISTS zaehler (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    seriennummer TEXT UNIQUE,
-    hersteller TEXT,
-    name TEXT
-)
-""")
-
-c.execute("""
-CREATE TABLE IF NOT EXISTS messwerte (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    zaehler_id INTEGER,
-    timestamp TEXT,
-    bezug_kwh REAL,
-    einspeisung_kwh REAL,
-    wirkleistung_watt REAL,
-    FOREIGN KEY (zaehler_id) REFERENCES zaehler(id)
-)
-""")
-
-# Prüfen, ob der Index existiert
-c.execute("""
-SELECT name 
-FROM sqlite_master 
-WHERE type='index' AND name='idx_timestamp';
-""")
-index_exists = c.fetchone()
-
-# Wenn nicht, erstelle ihn
-if not index_exists:
-    logging.debug("🔍 Index 'idx_timestamp' existiert nicht. Erstelle Index...")
-    c.execute("CREATE INDEX idx_timestamp ON messwerte(timestamp);")
-    logging.debug("✅ Index 'idx_timestamp' wurde erstellt.")
-else:
-    logging.debug("✅ Index 'idx_timestamp' existiert bereits.")
-
-conn.commit()
-conn.close()
+# Langlebiger SQLite-Schreiber (eine Verbindung, WAL-Modus, gesammelte Commits)
+# SQLITE_BATCH_SEKUNDEN: maximale Wartezeit eines Messwerts bis zum Commit
+# SQLITE_BATCH_ZEILEN: maximale Anzahl Messwerte pro Commit
+# SQLITE_SYNCHRONOUS: NORMAL (Standard, kein fsync pro Commit) oder FULL
+sqlite_schreiber = None
+if "sqlite" in output_modes:
+    sqlite_schreiber = SqliteSchreiber(
+        DB_PATH,
+        max_wartezeit=int(os.getenv("SQLITE_BATCH_SEKUNDEN", 60)),
+        max_zeilen=int(os.getenv("SQLITE_BATCH_ZEILEN", 100)),
+        synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+    )
+    logging.info("💾 SQLite-Schreiber: Commit spätestens nach %d s oder %d Messwerten",
+                 sqlite_schreiber.max_wartezeit, sqlite_schreiber.max_zeilen)
+
+# Historie als JSON-Lines (history/<datum>.jsonl), nur anhängen, gepuffert
+json_historie = None
+if "json" in output_modes:
+    json_historie = JsonHistorie(HISTORY_PATH, flush_sekunden=int(os.getenv("JSON_FLUSH_SEKUNDEN", 60)))
+
+# Warteschlangen zwischen den Stufen (serieller Port -> Dekodieren -> Schreiben)
+# WARTESCHLANGE_TELEGRAMME: Telegramme, die auf das Dekodieren warten dürfen (danach wird das älteste verworfen)
+# WARTESCHLANGE_SCHREIBEN: Messwerte, die auf das Schreiben warten dürfen (danach wartet das Dekodieren)
+# STATISTIK_SEKUNDEN: Abstand der Statistik-Ausgabe im Log
+telegramm_queue = Warteschlange("Telegramme", int(os.getenv("WARTESCHLANGE_TELEGRAMME", 100)))
+schreib_queue = Warteschlange("Schreiben", int(os.getenv("WARTESCHLANGE_SCHREIBEN", 1000)))
+statistik_sekunden = int(os.getenv("STATISTIK_SEKUNDEN", 600))
+
+# SIGTERM (docker stop) beendet die Schleifen; wartende Messwerte werden noch geschrieben
+stopp = threading.Event()
+signal.signal(signal.SIGTERM, lambda signum, frame: stopp.set())
 
 # Klassen für Messwerte und Zähler
 class LeserKonfiguration:
@@ -127,9 +118,8 @@ class LeserKonfiguration:
     :param leistung: OBIS-Code für die Wirkleistung.
     :param bezug: OBIS-Code für den Bezug.
     :param einspeisung: OBIS-Code für die Einspeisung.
-    :param sml_ende: Endezeichen für das SML-Telegramm.
     """
-    def __init__(self, port, baudrate, hersteller_env, hersteller, sn, leistung, bezug, einspeisung, sml_ende):
+    def __init__(self, port, baudrate, hersteller_env, hersteller, sn, leistung, bezug, einspeisung):
         self.port = port
         self.baudrate = baudrate
         self.hersteller_env = hersteller_env
@@ -138,7 +128,6 @@ class LeserKonfiguration:
         self.leistung = leistung
         self.bezug = bezug
         self.einspeisung = einspeisung
-        self.sml_ende = sml_ende
 
 #hier geht es dann weiter
 class Messwert:
@@ -153,6 +142,25 @@ class Messwert:
         self.einheit = einheit
         self.obis = obis
         
+class ZaehlerZustand:
+    """
+    Zustand eines Zählers (eines seriellen Ports) beim Dekodieren: gelerntes Layout,
+    aktuelles Intervall und Zeitpunkt des letzten Schreibens. Jeder Zähler hat seinen
+    eigenen, damit sich mehrere Zähler in einem Prozess nicht gegenseitig stören.
+    :param nummer: Nummer des Zählers in ZAEHLER (0 = erster).
+    :param konfiguration: LeserKonfiguration des Zählers.
+    """
+    def __init__(self, nummer, konfiguration):
+        self.nummer = nummer
+        self.konfiguration = konfiguration
+        # Der Zähler sendet jede Sekunde den gleichen Aufbau -> Positionen der Werte merken
+        self.layout_cache = LayoutCache()
+        # Alle Telegramme zwischen zwei Schreibvorgängen (WAIT_TIMER) werden hier zusammengefasst
+        self.intervall = IntervallAggregat()
+        self.letztes_schreiben = 0
+        # Aktueller Wert als JSON: der erste Zähler wie bisher in strom.json, weitere in strom_<n>.json
+        self.json_datei = "strom.json" if nummer == 0 else f"strom_{nummer + 1}.json"
+
 class Zaehler:
     """
     Klasse für Zähler.
@@ -169,110 +177,39 @@ class Zaehler:
         self.bezug = bezug
         self.einspeisung = einspeisung
 
-class OBIS_Object:
+def decode_manufacturer(wert):
     """
-    Klasse für OBIS-Objekte.
-    :param code: Der OBIS-Code des Objekts.
-    :param start: Die Startposition des Objekts im SML-Telegramm.
-    :param factor: Der Skalenfaktor des Objekts.
-    :param einheit: Die Einheit des Objekts.
-    :param wert: Der Wert des Objekts.
-    """
-    def __init__(self, code, start, factor, einheit, wert):
-        self.code = code
-        self.start = start
-        self.factor = factor
-        self.einheit = einheit
-        self.wert = wert
-
-class OBIS_Unterobject:
-    """
-    Klasse für OBIS-Unterobjekte.
-    :param offset: Der Offset des Unterobjekts im SML-Telegramm.
-    :param laenge: Die Länge des Unterobjekts im SML-Telegramm.
-    """
-    def __init__(self, offset, laenge):
-        self.offset = offset
-        self.laenge = laenge    
-
-# Funktion: Werte speichern
-def save_to_sqlite(seriennummer, hersteller, bezug_kwh, einspeisung_kwh, wirkleistung_watt):
-    """
-    Speichert die Messwerte in der SQLite-Datenbank.
-    :param seriennummer: Die Seriennummer des Zählers.
-    :param hersteller: Der Hersteller des Zählers.
-    :param bezug_kwh: Der Bezug in kWh.
-    :param einspeisung_kwh: Die Einspeisung in kWh.
-    :param wirkleistung_watt: Die Wirkleistung in Watt.
-    """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    # Zähler-ID abrufen oder einfügen
-    c.execute("SELECT id FROM zaehler WHERE seriennummer = ?", (seriennummer,))
-    row = c.fetchone()
-    if row:
-        zaehler_id = row[0]
-        logging.debug("🔍 Zähler-ID gefunden: %s", zaehler_id)
-    else:
-        c.execute("INSERT INTO zaehler (seriennummer, hersteller) VALUES (?, ?)", (seriennummer, hersteller))
-        zaehler_id = c.lastrowid
-        logging.debug("💾 Neuer Zähler in SQLite gespeichert: %s", (seriennummer, hersteller))
-
-    # Messwert einfügen
-    timestamp = datetime.now().isoformat()
-    c.execute("""
-        INSERT INTO messwerte (zaehler_id, timestamp, bezug_kwh, einspeisung_kwh, wirkleistung_watt)
-        VALUES (?, ?, ?, ?, ?)
-    """, (zaehler_id, timestamp, bezug_kwh, einspeisung_kwh, wirkleistung_watt))
-
-    conn.commit()
-    conn.close()
-    logging.debug("💾 Messwerte in SQLite gespeichert: %s", (seriennummer, bezug_kwh, einspeisung_kwh, wirkleistung_watt))
-
-def decode_manufacturer(hex_string):
-    """
-    Wandelt einen Hex-String wie '04454D48' in einen lesbaren Hersteller-Code (z. B. 'EMH') um.
-    Ignoriert das erste Byte (Längen-/Typkennzeichen).
-    :param hex_string: Der Hex-String, der den Hersteller-Code enthält.
+    Wandelt den Wert der Herstellerkennung (OBIS 1-0:96.50.1*1) in einen lesbaren Hersteller-Code um.
+    :param wert: Der Inhalt des Octet-Strings (Bytes, ohne TL-Feld).
     :return: Ein lesbarer Hersteller-Code.
-    Beispiel: '04454D48' wird zu 'EMH'.
+    Beispiel: b"EMH" wird zu 'EMH'.
     """
-    # Sicherstellen, dass der String eine gerade Anzahl von Zeichen hat
-    hex_string = hex_string.strip().lower()
-    if len(hex_string) < 8:
-        raise ValueError("Ungültiger Hersteller-Code: zu kurz")
-
-    # Die letzten 3 Bytes (6 Zeichen) nehmen
-    ascii_part = hex_string[-6:]
     try:
-        readable = bytes.fromhex(ascii_part).decode("ascii")
-        return readable
+        return bytes(wert).decode("ascii").strip()
     except Exception as e:
         return f"Fehler beim Decodieren: {e}"
 
-def parse_device_id(hex_string):
+def parse_device_id(wert):
     """
-    Extrahiert die Gerätekennung aus einem vollständigen Hex-String.
-    Erwartet mindestens 10 Bytes nach dem TL-Feld (z.B. '0b0a01454d4xxxxx'). 
-    Ignoriert das TL-Feld und gibt den Hersteller und die Seriennummer zurück.
+    Extrahiert die Gerätekennung aus dem Wert der Geräte-ID (OBIS 1-0:96.1.0*255).
+    Erwartet 10 Bytes ohne TL-Feld (z.B. 0a 01 45 4d 48 xx xx xx xx xx):
+    Kennung, Sparte, 3 Bytes Hersteller (ASCII), 5 Bytes Seriennummer.
     Beispiel: 'EMH-0000xxxxxxx'
-    :param hex_string: Der vollständige Hex-String.
+    :param wert: Der Inhalt des Octet-Strings (Bytes, ohne TL-Feld).
     :return: Ein String im Format 'Hersteller-Seriennummer'.
     """
     try:
-        # Nimmt nur den tatsächlichen Inhalt ohne das TL-Feld (z. B. nach '0b0a01')
-        payload = hex_string[6:]  # ab Index 6 → 454d48xxxx
-        ascii_part = payload[:6]  # 454xxx
-        serial_part = payload[6:] # 0000xxxx
-
-        hersteller = bytes.fromhex(ascii_part).decode("ascii")
-        seriennummer = serial_part.upper()
+        hersteller = bytes(wert[2:5]).decode("ascii")
+        seriennummer = wert[5:].hex().upper()
 
         return f"{hersteller}-{seriennummer}"
     except Exception as e:
         return f"Fehler beim Parsen: {e}"
         
+# CRC-16/X-25 des SML-Transportprotokolls; die Tabelle wird einmal beim Start gebaut,
+# nicht bei jedem Telegramm (crc_check läuft im Lese-Thread)
+crc_x25 = crcmod.mkCrcFun(0x11021, initCrc=0, xorOut=0xFFFF, rev=True)
+
 def crc_check(crc_raw,sml_telegram):
     """
     Prüft die CRC-Prüfziffer des SML-Telegramms.
@@ -280,27 +217,13 @@ def crc_check(crc_raw,sml_telegram):
     :param sml_telegram: Das gesamte SML-Telegramm (Bytes).
     :return: True, wenn die CRC-Prüfziffer gültig ist, sonst False.
     """
-    crc_func = crcmod.mkCrcFun(0x11021, initCrc=0, xorOut=0xFFFF, rev=True)
-    if crc_func(sml_telegram) == int.from_bytes(crc_raw, "little"):
+    if crc_x25(sml_telegram) == int.from_bytes(crc_raw, "little"):
         logging.debug("CRC Prüfung erfolgreich")
         return True
     else:
         logging.debug("CRC Prüfung fehlgeschlagen")
         return False
         
-def wert_suchen(sml_telegram,idx_position,idx_offset,idx_len):
-    """
-    Sucht den Wert im SML-Telegramm.
-    :param sml_telegram: Das SML-Telegramm (Bytes).
-    :param idx_position: Startposition im Telegramm.
-    :param idx_offset: Offset für den Wert.
-    :param idx_len: Länge des Wertes.
-    :return: Der gefundene Wert (Bytes).
-    """
-    logging.debug("Suchen nach Wert: Startposition %d, Offset %d, Länge %d", idx_position, idx_offset, idx_len)
-    logging.debug(sml_telegram[idx_position + idx_offset:idx_position + idx_offset + idx_len])
-    return sml_telegram[idx_position + idx_offset:idx_position + idx_offset + idx_len]
-
 def skalieren(wert, skala):
     """
     Skaliert den Wert mit dem angegebenen Skalenfaktor.
@@ -318,20 +241,6 @@ def skalieren(wert, skala):
     else:
         return wert * (10 ** skala)
 
-def einheit_suchen(einheit_raw):
-    """
-    Sucht die Einheit im SML-Telegramm.
-    :param einheit_raw: Die Rohdaten der Einheit (Bytes).
-    :return: Die Einheit als String.
-    """
-    if einheit_raw == b"\x62\x1e":  # Wh
-        return "Wh"
-    elif einheit_raw == b"\x62\x1b":  # W
-        return "W"
-    else:
-        logging.warning("⚠️ Unbekannte Einheit: %s", einheit_raw.hex())
-        return "unbekannte Einheit"
-
 def convert_wh_to_kwh(value, unit):
     """
     Konvertiert einen Wert von Wh in kWh und passt die Einheit an.
@@ -348,369 +257,272 @@ def convert_wh_to_kwh(value, unit):
 
     return converted_value, converted_unit
 
-# Hier wird die Konfiguration für den Leser gesetzt
-if MANUFACTURER == "1": # EMH
-    # Hier setzen wir die Konfiguration für den Leser
-    # Diese Konfiguration wird dann in der Klasse LeserKonfiguration gespeichert
-    # und später verwendet, um die Daten zu lesen
-    tech_konfiguration = LeserKonfiguration(
-        port="/dev/ttyUSB0" ,  # Port, ist immer gleich und kommt aus der Docker-Compose Datei
-        baudrate=int(os.getenv("BAUDRATE", 9600)), # Baudrate, kommt aus der Umgebungsvariable
-        hersteller_env=MANUFACTURER, # Herstellerkennung, kommt aus der Umgebungsvariable
-        hersteller=OBIS_Object (
-            code=b"\x07\x01\x00\x60\x32\x01\x01",  # OBIS-Code für den Hersteller
-            start=None,  # Startposition wird erst ermittelt
-            factor=None, # Herstellerkennung hat keinen Faktor
-            einheit=None, # Herstellerkennung hat keine Einheit
-            wert=OBIS_Unterobject (
-                offset=11,  # Offset nach der Startposition
-                laenge=4    # Länge nach dem Offset
-            )
-        ),
-        sn=OBIS_Object ( # Seriennummer
-            code=b"\x07\x01\x00\x60\x01\x00\xff",  # OBIS-Code für die Seriennummer, wird erst ermittelt
-            start=None,  # Startposition wird erst ermittelt
-            factor=None, # SN hat keinen Faktor
-            einheit=None, # SN hat keine Einheit
-            wert=OBIS_Unterobject (
-                offset=11,  # Offset nach der Startposition
-                laenge=11   # Länge nach dem Offset
-            )
-        ),
-        leistung=OBIS_Object (
-            code=b"\x07\x01\x00\x10\x07\x00\xff",  # OBIS-Code für die Wirkleistung
-            start=None,  # Startposition wird erst ermittelt
-            factor=OBIS_Unterobject (
-                offset=19,  # Offset nach der Startposition
-                laenge=1    # Länge nach dem Offset
-            ),
-            einheit=OBIS_Unterobject (
-                offset=16,  # Offset nach der Startposition
-                laenge=2    # Länge nach dem Offset
-            ),
-            wert=OBIS_Unterobject (
-                offset=21,  # Offset nach der Startposition
-                laenge=4    # Länge nach dem Offset
-            )
-        ),
-        bezug=OBIS_Object (
-            code=b"\x07\x01\x00\x01\x08\x00\xff",  # OBIS-Code für den Bezug
-            start=None,  # Startposition wird erst ermittelt
-            factor=OBIS_Unterobject (
-                offset=22,  # Offset nach der Startposition
-                laenge=1    # Länge nach dem Offset
-            ),
-            einheit=OBIS_Unterobject (
-                offset=19,  # Offset nach der Startposition
-                laenge=2    # Länge nach dem Offset
-            ),
-            wert=OBIS_Unterobject (
-                offset=24,  # Offset nach der Startposition
-                laenge=8    # Länge nach dem Offset
-            )
-        ),
-        einspeisung=OBIS_Object (
-            code=b"\x07\x01\x00\x02\x08\x00\xff",  # OBIS-Code für die Einspeisung
-            start=None,  # Startposition wird erst ermittelt
-            factor=OBIS_Unterobject (
-                offset=19,  # Offset nach der Startposition
-                laenge=1    # Länge nach dem Offset
-            ),
-            einheit=OBIS_Unterobject (
-                offset=16,  # Offset nach der Startposition
-                laenge=2    # Länge nach dem Offset
-            ),
-            wert=OBIS_Unterobject (
-                offset=21,  # Offset nach der Startposition
-                laenge=8    # Länge nach dem Offset
-            )
-        ),
-        sml_ende=b"\x1b\x1b\x1b\x1a"
-    )
-else: # Hier kann eine andere Konfiguration für andere Hersteller gesetzt werden
-    logging.error("❌ Herstellerkennung nicht unterstützt.")
-    exit(1)
-
-# Verbinde mit dem seriellen Port
-# und öffne den Port
-logging.debug("🔌 Verbinde mit %s @ %d Baud", 
-              tech_konfiguration.port, 
-              tech_konfiguration.baudrate)
+# OBIS-Profile: welche OBIS-Codes ein Zähler für die Werte verwendet.
+# Die OBIS-Codes sind herstellerunabhängig; die Positionen im Telegramm
+# ermittelt der SML-Decoder selbst (sml_decoder.py).
+PROFILE = {
+    "sml": {
+        "hersteller": b"\x01\x00\x60\x32\x01\x01",   # 1-0:96.50.1*1 Herstellerkennung
+        "sn": b"\x01\x00\x60\x01\x00\xff",           # 1-0:96.1.0*255 Geräte-ID / Seriennummer
+        "leistung": b"\x01\x00\x10\x07\x00\xff",     # 1-0:16.7.0*255 Wirkleistung
+        "bezug": b"\x01\x00\x01\x08\x00\xff",        # 1-0:1.8.0*255 Bezug gesamt
+        "einspeisung": b"\x01\x00\x02\x08\x00\xff",  # 1-0:2.8.0*255 Einspeisung gesamt
+    },
+}
+
+def konfigurationen_lesen(text):
+    """
+    Liest die Zähler aus ZAEHLER: kommagetrennte Einträge `port[:baudrate[:profil]]`,
+    z. B. `/dev/ttyUSB0,/dev/ttyUSB1:9600:sml`. Fehlende Angaben kommen aus BAUDRATE bzw. `sml`.
+    :param text: Inhalt von ZAEHLER.
+    :return: Liste von LeserKonfiguration (mindestens eine).
+    :raises ValueError: Bei leerer Liste, ungültiger Baudrate oder unbekanntem Profil.
+    """
+    konfigurationen = []
+    for eintrag in filter(None, (teil.strip() for teil in text.split(","))):
+        port, baudrate, profil = (eintrag.split(":") + [None, None])[:3]
+        if (profil or "sml") not in PROFILE:
+            raise ValueError(f"Unbekanntes Profil {profil!r} für {port} (bekannt: {', '.join(PROFILE)})")
+        konfigurationen.append(LeserKonfiguration(
+            port=port,
+            baudrate=int(baudrate or os.getenv("BAUDRATE", 9600)),
+            hersteller_env=MANUFACTURER,  # MANUFACTURER wird nur noch zur Information mitgeführt
+            **PROFILE[profil or "sml"]
+        ))
+    if not konfigurationen:
+        raise ValueError("Kein Zähler in ZAEHLER angegeben")
+    return konfigurationen
+
+# Hier wird die Konfiguration für die Leser gesetzt
+# ZAEHLER: mehrere Zähler in einem Prozess, sonst ein Zähler an PORT (im Container immer
+# gleich, Docker-Compose; lokal z. B. der Fake-Reader)
 try:
-    # Öffne den seriellen Port
-    ser = serial.Serial(
-        tech_konfiguration.port,
-        tech_konfiguration.baudrate, timeout=1)
-    logging.debug("🔌 Verbindung erfolgreich hergestellt.")
-except serial.SerialException as e:
-    logging.error("❌ Fehler beim Öffnen des seriellen Ports: %s", e)
+    konfigurationen = konfigurationen_lesen(os.getenv("ZAEHLER") or os.getenv("PORT", "/dev/ttyUSB0"))
+except ValueError as e:
+    logging.error("❌ Ungültige Zähler-Konfiguration: %s", e)
     exit(1)
+zustaende = [ZaehlerZustand(nummer, konfiguration) for nummer, konfiguration in enumerate(konfigurationen)]
 
-# Endlosschleife zum Lesen der Daten
-logging.debug("🔄 Starte Endlosschleife zum Lesen der Daten...")
-  
-buffer = b"" # Initialisiere den Buffer
-while True:
-    # Lese ein Byte vom seriellen Port 
-    raw = ser.read(1)
-    if not raw:
-        continue
-    # Füge das gelesene Byte zum Buffer hinzu
-    buffer += raw
-
-    # Suche nach Endezeichen
-    if tech_konfiguration.sml_ende in buffer:
-        idx = buffer.find(tech_konfiguration.sml_ende) # postion des Endezeichens
-        if idx == -1 or len(buffer) < idx + 4 + 3: #wenn kein Endezeichen gefunden wurde
-            continue  # noch nicht vollständig, mehr Daten lesen
-
-        # Lies genau 3 weitere Bytes (CRC + Füllbyte)
-        # da die CRC Prüfziffer immer 2 Bytes lang ist und das Füllbyte 1 Byte (weiterlesen)
-        # und das Endezeichen 4 Bytes lang ist
-        while len(buffer) < idx + 4 + 3:
-            buffer += ser.read(1)
-        logging.debug("🔢 komplettes Telegram: %s", buffer[:idx + 7].hex())
-        sml_data = buffer[:idx + 5]         # inkl. 1a + Füllbyte (1 Byte)
-
-        logging.debug("[%s]", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        logging.debug("📡 SML-Telegramm erkannt (Länge: %d Bytes)", len(sml_data))
-        
-        # prüfen ob crc passt
-        # CRC-Prüfziffer ist immer 2 Bytes lang
-        # und das Füllbyte ist 1 Byte lang
-        # nur dann ist das Telegramm vollständig und korrekt
-        if crc_check(buffer[idx + 5:idx + 7], sml_data) == True:   
-            
-            logging.debug("Verarbeitung SML Telegram starten!")
-            # Zaehler initialisieren
-            mein_zaehler = Zaehler(None, None, None, None, None)
-
-            # OBIS Herstellerkennung und Seriennummer suchen
-            # Herstellerkennung suchen
-            tech_konfiguration.hersteller.start = sml_data.find(tech_konfiguration.hersteller.code) # finde die Startposition des OBIS-Codes
-            if tech_konfiguration.hersteller.start == -1:
-                logging.error("❌ OBIS-Code für Hersteller nicht gefunden.")
-                continue  # Überspringt die Verarbeitung dieses Telegramms
-            mein_zaehler.vendor = decode_manufacturer(
-                wert_suchen(
-                    sml_data,
-                    tech_konfiguration.hersteller.start,
-                    tech_konfiguration.hersteller.wert.offset,
-                    tech_konfiguration.hersteller.wert.laenge
-                    ).hex())
-
-            # Seriennummer suchen 
-            tech_konfiguration.sn.start = sml_data.find(tech_konfiguration.sn.code) # finde die Startposition des OBIS-Codes
-            if tech_konfiguration.sn.start == -1:
-                logging.error("❌ OBIS-Code für Seriennummer nicht gefunden.")
-                continue
-
-            # Seriennummer parsen
-            mein_zaehler.sn = parse_device_id(
-                wert_suchen(
-                    sml_data,
-                    tech_konfiguration.sn.start,
-                    tech_konfiguration.sn.wert.offset,
-                    tech_konfiguration.sn.wert.laenge
-                    ).hex()) 
-            
-            logging.debug("Hersteller / SN : %s / %s", mein_zaehler.vendor, mein_zaehler.sn)
-            
-            # Bezug gesamt suchen 
-            tech_konfiguration.bezug.start = sml_data.find(tech_konfiguration.bezug.code)
-            if tech_konfiguration.bezug.start == -1:  
-                logging.error("❌ OBIS-Code für Bezug nicht gefunden.")
-                continue
-            bezug = Messwert(None,None,tech_konfiguration.bezug.code) 
-            
-            bezug.wert = skalieren(
-                int(
-                    wert_suchen(
-                        sml_data,
-                        tech_konfiguration.bezug.start,
-                        tech_konfiguration.bezug.wert.offset,
-                        tech_konfiguration.bezug.wert.laenge
-                        ).hex(),16), # 
-                int.from_bytes(
-                    wert_suchen(
-                        sml_data,
-                        tech_konfiguration.bezug.start,
-                        tech_konfiguration.bezug.factor.offset,
-                        tech_konfiguration.bezug.factor.laenge 
-                    ), 
-                    byteorder="big", signed=True
-                )
-            )
+# Funktion: ein vollständiges, CRC-geprüftes Telegramm auswerten und speichern
+def telegramm_verarbeiten(zustand, sml_data):
+    """
+    Wertet ein SML-Telegramm aus und speichert die Werte (SQLite/JSON).
+    :param zustand: ZaehlerZustand des Ports, von dem das Telegramm kam.
+    :param sml_data: Das vollständige SML-Telegramm vom Start-Escape bis zur CRC (bytes oder memoryview).
+    """
+    tech_konfiguration = zustand.konfiguration
+    layout_cache = zustand.layout_cache
+    intervall = zustand.intervall
 
-            bezug.einheit = einheit_suchen(
-                wert_suchen(
-                    sml_data,
-                    tech_konfiguration.bezug.start,
-                    tech_konfiguration.bezug.einheit.offset,
-                    tech_konfiguration.bezug.einheit.laenge
-                )
-            )
-            
-            mein_zaehler.bezug = Messwert(
-                None,
-                None,
-                tech_konfiguration.bezug.code.hex()
-            )
+    logging.debug("Verarbeitung SML Telegram starten!")
+    # Telegramm dekodieren (bei bekanntem Aufbau über das gelernte Layout)
+    try:
+        werte = {eintrag.obis: eintrag for eintrag in layout_cache.dekodieren(sml_data)}
+    except SmlFehler as e:
+        logging.error("❌ SML-Telegramm konnte nicht dekodiert werden: %s", e)
+        return
+    logging.debug("🧩 Layout-Cache: %d Treffer / %d Fehlschläge", layout_cache.treffer, layout_cache.fehlschlaege)
+
+    # Zaehler initialisieren
+    mein_zaehler = Zaehler(None, None, None, None, None)
+
+    # Seriennummer suchen
+    sn = werte.get(tech_konfiguration.sn)
+    if sn is None or not isinstance(sn.wert, bytes):
+        logging.error("❌ OBIS-Code für Seriennummer nicht gefunden.")
+        return  # Überspringt die Verarbeitung dieses Telegramms
+    mein_zaehler.sn = parse_device_id(sn.wert)
+
+    # Herstellerkennung suchen, sonst aus der Geräte-ID übernehmen
+    hersteller = werte.get(tech_konfiguration.hersteller)
+    if hersteller is not None and isinstance(hersteller.wert, bytes):
+        mein_zaehler.vendor = decode_manufacturer(hersteller.wert)
+    else:
+        mein_zaehler.vendor = decode_manufacturer(sn.wert[2:5])
+
+    logging.debug("Hersteller / SN : %s / %s", mein_zaehler.vendor, mein_zaehler.sn)
+
+    # Bezug, Einspeisung und Wirkleistung übernehmen
+    for feld in ("bezug", "einspeisung", "leistung"):
+        obis = getattr(tech_konfiguration, feld)
+        eintrag = werte.get(obis)
+        if eintrag is None or not isinstance(eintrag.wert, int):
+            logging.error("❌ OBIS-Code für %s nicht gefunden.", feld)
+            return
+
+        messwert = Messwert(None, None, obis.hex())
+        wert = skalieren(eintrag.wert, eintrag.skala)
+        if feld == "leistung":
+            messwert.wert, messwert.einheit = wert, einheit_text(eintrag.einheit)
+        else:
+            messwert.wert, messwert.einheit = convert_wh_to_kwh(wert, einheit_text(eintrag.einheit))  # in kWh umrechnen
+        setattr(mein_zaehler, feld, messwert)
+        logging.debug("%s %s = %s %s", feld, obis_text(obis), messwert.wert, messwert.einheit)
 
-            mein_zaehler.bezug.wert, mein_zaehler.bezug.einheit = convert_wh_to_kwh(bezug.wert, bezug.einheit)  #in kWh umrechnen    
-            logging.debug("Bezug %s = %s %s", mein_zaehler.bezug.obis, mein_zaehler.bezug.wert, mein_zaehler.bezug.einheit)
-                    
-            # Einspeisung gesamt suchen 
-            tech_konfiguration.einspeisung.start = sml_data.find(tech_konfiguration.einspeisung.code)
-            if tech_konfiguration.einspeisung.start == -1:
-                logging.error("❌ OBIS-Code für Einspeisung nicht gefunden.")
-                continue   
-            
-            einspeisung = Messwert(None,None,tech_konfiguration.einspeisung.code.hex())
-            
-            # Einspeisung suchen und skalieren
-            einspeisung.wert = skalieren(
-                int(
-                    wert_suchen(
-                        sml_data,
-                        tech_konfiguration.einspeisung.start,
-                        tech_konfiguration.einspeisung.wert.offset,
-                        tech_konfiguration.einspeisung.wert.laenge
-                    ).hex(),16), 
-                int.from_bytes(
-                    wert_suchen(
-                        sml_data,
-                        tech_konfiguration.einspeisung.start,
-                        tech_konfiguration.einspeisung.factor.offset,
-                        tech_konfiguration.einspeisung.factor.laenge
-                    ), byteorder="big", signed=True) 
-             )
-            
-            einspeisung.einheit = einheit_suchen(
-                wert_suchen(
-                    sml_data,
-                    tech_konfiguration.einspeisung.start,
-                    tech_konfiguration.einspeisung.einheit.offset,
-                    tech_konfiguration.einspeisung.einheit.laenge
-                ))
-            
-            mein_zaehler.einspeisung = Messwert(None, None, einspeisung.obis)
-            mein_zaehler.einspeisung.wert, mein_zaehler.einspeisung.einheit = convert_wh_to_kwh(einspeisung.wert, einspeisung.einheit)
-            logging.debug("Einspeisung %s = %s %s", mein_zaehler.einspeisung.obis, mein_zaehler.einspeisung.wert, mein_zaehler.einspeisung.einheit)
-
-            # Wirkleistung suchen
-            tech_konfiguration.leistung.start = sml_data.find(tech_konfiguration.leistung.code)
-            if tech_konfiguration.leistung.start == -1:
-                logging.error("❌ OBIS-Code für Wirkleistung nicht gefunden.")
-                continue
-
-            wirk = Messwert(None,None,tech_konfiguration.leistung.code.hex())
-
-            # Wirkleistung suchen und skalieren
-            wirk.wert = skalieren(
-                int.from_bytes(
-                    wert_suchen(
-                        sml_data,
-                        tech_konfiguration.leistung.start,
-                        tech_konfiguration.leistung.wert.offset,
-                        tech_konfiguration.leistung.wert.laenge
-                    ), byteorder="big", signed=True), 
-                int.from_bytes(
-                    wert_suchen(
-                        sml_data,
-                        tech_konfiguration.leistung.start,
-                        tech_konfiguration.leistung.factor.offset,
-                        tech_konfiguration.leistung.factor.laenge
-                        ), byteorder="big", signed=True) 
-            )
+    # Jedes Telegramm fließt in das aktuelle Intervall ein
+    intervall.hinzufuegen(mein_zaehler.leistung.wert, mein_zaehler.bezug.wert, mein_zaehler.einspeisung.wert)
 
-            # Wirkleistung Einheit suchen
-            wirk.einheit = einheit_suchen(
-                wert_suchen(
-                    sml_data,
-                    tech_konfiguration.leistung.start,
-                    tech_konfiguration.leistung.einheit.offset,
-                    tech_konfiguration.leistung.einheit.laenge
-                    )) 
-            
-            mein_zaehler.leistung = Messwert(wirk.wert,wirk.einheit,wirk.obis)
-            logging.debug("Wirkleistung %s = %s %s", mein_zaehler.leistung.obis, mein_zaehler.leistung.wert, mein_zaehler.leistung.einheit)
-            
-            current_time = time.time()
-            if current_time - last_json_write >= wait_time:
-                now = datetime.now(ZoneInfo("Europe/Berlin"))
-                timestamp = now.isoformat()
-                date_str = now.strftime("%Y-%m-%d")
+    current_time = time.time()
+    if current_time - zustand.letztes_schreiben >= wait_time:
+        now = datetime.now(ZoneInfo("Europe/Berlin"))
+        timestamp = now.isoformat()
     
-                output_data = {
-                    "leistung": mein_zaehler.leistung.wert,
-                    "leistung_einheit": mein_zaehler.leistung.einheit, 
-                    "bezug": mein_zaehler.bezug.wert,
-                    "bezug_einheit": mein_zaehler.bezug.einheit,
-                    "einspeisung": mein_zaehler.einspeisung.wert, 
-                    "einspeisung_einheit": mein_zaehler.einspeisung.einheit,
-                    "seriennummer": mein_zaehler.sn,
-                    "timestamp": timestamp,
-                    "zaehlername": mein_zaehler.vendor
-                }
-                
-                # Prüfen, ob die Umgebungsvariable OUTPUT gesetzt ist
-                # und ob sie "sqlite" enthält
-                if "sqlite" in output_modes:
-                    logging.debug("💾 Daten in SQLite speichern")           
-                    # SQLite-Daten speichern
-                    try:
-                        save_to_sqlite(
-                            mein_zaehler.sn,
-                            mein_zaehler.vendor,
-                            mein_zaehler.bezug.wert,
-                            mein_zaehler.einspeisung.wert,
-                            mein_zaehler.leistung.wert
-                        )
-                        logging.debug("💾 Daten in SQLite gespeichert")   
-                    except Exception as e:
-                        logging.error("❌ Fehler beim Speichern in SQLite: %s", e)
-                    
-                # Prüfen, ob die Umgebungsvariable OUTPUT gesetzt ist
-                # und ob sie "json" enthält
-                if "json" in output_modes:
-                    logging.debug("💾 JSON-Daten speichern")
-                    # JSON-Daten speichern  
-                    try:
-                        # Aktuelle Datei speichern
-                        with open(OUTPUT_PATH / "strom.json", "w") as f:
-                            json.dump(output_data, f, indent=2)
-                        logging.debug("💾 JSON-Daten gespeichert (%s)", timestamp)
-                        
-                    # Historie laden oder leere Liste
-                        history_file = HISTORY_PATH / f"{date_str}.json"
-                        if history_file.exists():
-                            with open(history_file, "r") as f:
-                                history_data = json.load(f)                
-                        else:
-                            history_data = []
-                            
-                        history_data.append(output_data)  
-                        
-                        # Historie zurückschreiben
-                        with open(history_file, "w") as f:
-                            json.dump(history_data, f, indent=2)
-    
-                    except Exception as e:
-                        logging.error("❌ Fehler beim Schreiben der JSON-Dateien: %s", e)
-                                 
-                last_json_write = current_time             
-            else:
-                logging.debug("⏳ Warte auf nächsten Schreibzeitpunkt...")
-                 
-        else: 
-            crc_check_sml = False
-            logging.debug("Kein gültiges Telegram zum verarbeiten")    
+        output_data = {
+            "leistung": mein_zaehler.leistung.wert,
+            "leistung_einheit": mein_zaehler.leistung.einheit, 
+            "bezug": mein_zaehler.bezug.wert,
+            "bezug_einheit": mein_zaehler.bezug.einheit,
+            "einspeisung": mein_zaehler.einspeisung.wert, 
+            "einspeisung_einheit": mein_zaehler.einspeisung.einheit,
+            "seriennummer": mein_zaehler.sn,
+            "timestamp": timestamp,
+            "zaehlername": mein_zaehler.vendor,
+            "leistung_min": intervall.leistung_min,
+            "leistung_max": intervall.leistung_max,
+            "leistung_avg": intervall.leistung_avg,
+            "anzahl_telegramme": intervall.anzahl
+        }
         
-        # Buffer bereinigen
-        if idx + 7 <= len(buffer):
-            buffer = buffer[idx + 7:]
-        else:
-            buffer = b""
+        # Schreiben übernimmt der Schreib-Thread; der Zeitpunkt für SQLite wird hier festgehalten
+        schreib_queue.einstellen((output_data, datetime.now().isoformat(), zustand.json_datei))
 
-        logging.debug("🔄 Buffer zurückgesetzt")
\ No newline at end of file
+        zustand.letztes_schreiben = current_time
+        intervall.zuruecksetzen()
+    else:
+        logging.debug("⏳ Warte auf nächsten Schreibzeitpunkt...")
+
+
+# Funktion: einen Messwert speichern (läuft im Schreib-Thread)
+def messwert_schreiben(auftrag):
+    """
+    Speichert einen Messwert je nach OUTPUT in SQLite und/oder als JSON.
+    :param auftrag: Tuple (output_data, sqlite_timestamp, json_datei) aus telegramm_verarbeiten().
+    """
+    output_data, sqlite_timestamp, json_datei = auftrag
+    timestamp = output_data["timestamp"]
+    date_str = timestamp[:10]
+
+    # Prüfen, ob die Umgebungsvariable OUTPUT gesetzt ist
+    # und ob sie "sqlite" enthält
+    if "sqlite" in output_modes:
+        logging.debug("💾 Daten in SQLite speichern")           
+        # SQLite-Daten speichern (gesammelt, siehe SqliteSchreiber)
+        try:
+            sqlite_schreiber.speichern(
+                output_data["seriennummer"],
+                output_data["zaehlername"],
+                output_data["bezug"],
+                output_data["einspeisung"],
+                output_data["leistung"],
+                timestamp=sqlite_timestamp,
+                wirkleistung_min=output_data["leistung_min"],
+                wirkleistung_max=output_data["leistung_max"],
+                wirkleistung_avg=output_data["leistung_avg"],
+                anzahl_telegramme=output_data["anzahl_telegramme"]
+            )
+            logging.debug("💾 Messwert für SQLite übernommen")   
+        except Exception as e:
+            logging.error("❌ Fehler beim Speichern in SQLite: %s", e)
+        
+    # Prüfen, ob die Umgebungsvariable OUTPUT gesetzt ist
+    # und ob sie "json" enthält
+    if "json" in output_modes:
+        logging.debug("💾 JSON-Daten speichern")
+        # JSON-Daten speichern
+        try:
+            # Aktuelle Datei atomar ersetzen
+            json_atomar_schreiben(OUTPUT_PATH / json_datei, output_data)
+            logging.debug("💾 JSON-Daten gespeichert (%s)", timestamp)
+
+            # Historie: eine Zeile an die Tagesdatei anhängen
+            json_historie.schreiben(output_data, date_str)
+
+        except Exception as e:
+            logging.error("❌ Fehler beim Schreiben der JSON-Dateien: %s", e)
+
+def speicher_leerlauf():
+    """
+    Schreibt gesammelte Messwerte, sobald keine weiteren Aufträge warten (läuft im Schreib-Thread).
+    Jeder Messwert ist so gleich nach seinem Intervall für /api/live sichtbar; gesammelt wird
+    nur, solange sich Aufträge stauen, dann spätestens nach SQLITE_BATCH_SEKUNDEN/-ZEILEN.
+    """
+    if sqlite_schreiber is not None and (not len(schreib_queue) or sqlite_schreiber.faellig()):
+        sqlite_schreiber.flush()
+
+def speicher_schliessen():
+    """
+    Schreibt alle wartenden Messwerte und schließt SQLite und die JSON-Historie.
+    """
+    if sqlite_schreiber is not None:
+        try:
+            sqlite_schreiber.schliessen()
+        except Exception as e:
+            logging.error("❌ Fehler beim Speichern in SQLite: %s", e)
+    if json_historie is not None:
+        json_historie.schliessen()
+
+# Verbinde mit den seriellen Ports
+# und öffne sie nicht blockierend (timeout=0): gewartet wird im Selektor des Lese-Threads
+serielle_ports = []
+for konfiguration in konfigurationen:
+    logging.info("🔌 Verbinde mit %s @ %d Baud", konfiguration.port, konfiguration.baudrate)
+    try:
+        serielle_ports.append(serial.Serial(konfiguration.port, konfiguration.baudrate, timeout=0))
+        logging.debug("🔌 Verbindung erfolgreich hergestellt.")
+    except serial.SerialException as e:
+        logging.error("❌ Fehler beim Öffnen des seriellen Ports: %s", e)
+        for ser in serielle_ports:
+            ser.close()
+        exit(1)
+
+# Drei Stufen: der Lese-Thread leert alle seriellen Ports und schneidet die Telegramme aus
+# (RingPuffer + SmlScanner je Port), der Hauptthread dekodiert und fasst zusammen (Zustand
+# je Zähler), der Schreib-Thread speichert für alle Zähler gemeinsam. Langsame
+# Schreibzugriffe (SD-Karte, gesperrte Datenbank) halten so das Lesen nicht auf.
+quellen = [Quelle(nummer, ser, crc_pruefung=crc_check) for nummer, ser in enumerate(serielle_ports)]
+leser = SeriellerLeser(quellen, telegramm_queue, stopp)
+schreiber = SchreibThread(schreib_queue, messwert_schreiben, leerlauf=speicher_leerlauf, beenden=speicher_schliessen)
+leser.start()
+schreiber.start()
+
+def statistik_loggen():
+    """
+    Schreibt die Zähler von Scanner und Warteschlangen ins Log.
+    """
+    for quelle in quellen:
+        scanner = quelle.scanner
+        logging.info("📊 Scanner %s: %d Telegramme, %d CRC-Fehler, %d Resyncs, %d Bytes verworfen",
+                     quelle.ser.port, scanner.telegramme, scanner.crc_fehler, scanner.resyncs, scanner.verworfen)
+    logging.info("📊 Warteschlange %s", telegramm_queue.statistik())
+    logging.info("📊 Warteschlange %s", schreib_queue.statistik())
+
+logging.debug("🔄 Starte Schleife zum Dekodieren der Telegramme...")
+letzte_statistik = time.monotonic()
+try:
+    while not stopp.is_set():
+        eintrag = telegramm_queue.holen(timeout=1)
+        if eintrag is not None:
+            nummer, telegramm = eintrag
+            logging.debug("[%s]", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            logging.debug("📡 SML-Telegramm erkannt (Zähler %d, Länge: %d Bytes, in Warteschlange: %d)",
+                          nummer + 1, len(telegramm), len(telegramm_queue))
+            telegramm_verarbeiten(zustaende[nummer], telegramm)
+
+        if time.monotonic() - letzte_statistik >= statistik_sekunden:
+            statistik_loggen()
+            letzte_statistik = time.monotonic()
+except KeyboardInterrupt:
+    pass
+finally:
+    # Geordnet beenden: Lesen stoppen, restliche Telegramme dekodieren, alles schreiben
+    logging.info("🛑 Beende Reader...")
+    stopp.set()
+    leser.join(timeout=5)
+    while len(telegramm_queue):
+        nummer, telegramm = telegramm_queue.holen()
+        telegramm_verarbeiten(zustaende[nummer], telegramm)
+    schreiber.stoppen()
+    schreiber.join()
+    for ser in serielle_ports:
+        ser.close()
+    statistik_loggen()